@@ -13,9 +13,13 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+import os
 import ssl
+import time
+import threading
 
 from celery import Celery
+from flask import current_app
 
 from manager_rest import config
 
@@ -27,8 +31,24 @@ TASK_STATE_SUCCESS = 'SUCCESS'
 TASK_STATE_RETRY = 'RETRY'
 TASK_STATE_FAILURE = 'FAILURE'
 
+# Retry policy used when the connection to the broker is lost while
+# publishing a task
+PUBLISH_RETRY_POLICY = {
+    'max_retries': 3,
+    'interval_start': 0,
+    'interval_step': 0.5,
+    'interval_max': 2,
+}
+
 
 class CeleryClient(object):
+    """A client for sending tasks to the broker
+
+    The client is meant to be long-lived (see `get_client`): the celery app
+    keeps a pool of broker connections and producers, so tasks sent by the
+    same worker reuse connections instead of connecting (and doing the TLS
+    handshake) for every task.
+    """
 
     def __init__(self):
         ssl_settings = self._get_broker_ssl_settings(
@@ -47,10 +67,24 @@ class CeleryClient(object):
         self.celery = Celery(broker=amqp_uri, backend=amqp_uri)
         self.celery.conf.update(
             CELERY_TASK_SERIALIZER="json",
-            CELERY_TASK_RESULT_EXPIRES=600)
+            CELERY_TASK_RESULT_EXPIRES=600,
+            BROKER_POOL_LIMIT=config.instance.amqp_pool_limit)
         if config.instance.amqp_ssl_enabled:
             self.celery.conf.update(BROKER_USE_SSL=ssl_settings)
 
+        self._stats_lock = threading.Lock()
+        self.publish_count = 0
+        self.publish_time_total = 0
+        self.publish_time_max = 0
+
+    @property
+    def publish_time_avg(self):
+        """Average time (in seconds) it took to publish a task
+        """
+        if not self.publish_count:
+            return 0
+        return self.publish_time_total / self.publish_count
+
     def close(self):
         if self.celery:
             self.celery.close()
@@ -65,10 +99,27 @@ class CeleryClient(object):
             :return: the celery task async result
         """
 
-        return self.celery.send_task('cloudify.dispatch.dispatch',
-                                     queue=task_queue,
-                                     task_id=task_id,
-                                     kwargs=kwargs)
+        started_at = time.time()
+        async_result = self.celery.send_task(
+            'cloudify.dispatch.dispatch',
+            queue=task_queue,
+            task_id=task_id,
+            kwargs=kwargs,
+            retry=True,
+            retry_policy=PUBLISH_RETRY_POLICY)
+        self._record_publish(time.time() - started_at)
+        return async_result
+
+    def _record_publish(self, publish_time):
+        with self._stats_lock:
+            self.publish_count += 1
+            self.publish_time_total += publish_time
+            self.publish_time_max = max(self.publish_time_max, publish_time)
+        current_app.logger.debug(
+            'Published task in {0:.3f} seconds (average: {1:.3f}, '
+            'max: {2:.3f}, count: {3})'.format(
+                publish_time, self.publish_time_avg,
+                self.publish_time_max, self.publish_count))
 
     def get_task_status(self, task_id):
         """
@@ -113,9 +164,28 @@ class CeleryClient(object):
         return ssl_options
 
 
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
 def get_client():
+    """Return the celery client of the current process
+
+    A single client is shared by all the requests handled by a worker. It's
+    recreated after a fork (e.g. when gunicorn forks its workers), as broker
+    connections can't be shared between processes.
+    """
+    global _client, _client_pid
+
     if config.instance.test_mode:
         from test.mocks import MockCeleryClient
         return MockCeleryClient()
-    else:
-        return CeleryClient()
+
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = CeleryClient()
+                _client_pid = pid
+    return _client
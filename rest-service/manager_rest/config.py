@@ -32,6 +32,7 @@ class Config(object):
         self.amqp_password = 'guest'
         self.amqp_ssl_enabled = False
         self.amqp_ca_path = ''
+        self.amqp_pool_limit = 10
         self.ldap_server = None
         self.ldap_username = None
         self.ldap_password = None
@@ -53,7 +54,25 @@ class Config(object):
         self.test_mode = False
         self.insecure_endpoints_disabled = True
         self.max_results = 1000
+        # Page size of paginated requests that don't pass a size
+        self.default_page_size = 1000
         self.min_available_memory_mb = 256
+        self.last_login_deferred_updates = True
+        self.last_login_flush_interval = 10
+        self.last_login_update_granularity = 60
+        self.token_cache_size = 1000
+        self.token_cache_ttl = 60
+        self.blueprint_plan_cache_size = 64 * 1024 * 1024
+        self.deployment_outputs_cache_size = 1000
+        self.list_stream_batch_size = 100
+        self.events_tail_max_timeout = 30
+        self.events_tail_poll_interval = 1
+        self.events_bulk_max_batch_size = 10000
+        self.node_instances_bulk_max_batch_size = 1000
+        self.maintenance_executions_check_interval = 5
+        # Caps of concurrently running executions (0 means unlimited)
+        self.max_concurrent_executions = 0
+        self.max_concurrent_executions_per_tenant = 0
 
         self.security_hash_salt = None
         self.security_secret_key = None
@@ -18,6 +18,7 @@ import networkx as nx
 
 import manager_rest.resource_manager
 from manager_rest.storage import get_storage_manager, models
+from manager_rest.storage.plan_cache import plan_cache
 
 
 RELEVANT_DEPLOYMENT_FIELDS = ['blueprint_id', 'id', 'inputs', 'nodes',
@@ -135,7 +136,7 @@ class DeploymentPlan(dict):
         sm = get_storage_manager()
         # get deployment from storage
         deployment = sm.get(models.Deployment, deployment_id)
-        blueprint_plan = deployment.blueprint.plan
+        blueprint_plan = plan_cache.get(deployment.blueprint)
 
         deployment_plugins_to_install = \
             blueprint_plan['deployment_plugins_to_install']
@@ -15,15 +15,19 @@
 #
 
 import os
+import time
 import StringIO
+import threading
 import traceback
 
 from flask import jsonify, request
+from sqlalchemy import or_
 
 from manager_rest import config
 from manager_rest import utils
+from manager_rest.storage import db
+from manager_rest.storage.models import Deployment, Execution
 from manager_rest.storage.models_states import ExecutionState
-from manager_rest.resource_manager import get_resource_manager
 from manager_rest.constants import (MAINTENANCE_MODE_ACTIVATED,
                                     MAINTENANCE_MODE_STATUS_FILE,
                                     MAINTENANCE_MODE_ACTIVATING,
@@ -58,6 +62,75 @@ def prepare_maintenance_dict(status,
     return state
 
 
+class MaintenanceState(object):
+    """Holds the maintenance mode state, as stored in the status file
+
+    The parsed state is cached, keyed on the file's path, inode, mtime and
+    size, so requests only stat the file instead of reading and parsing it.
+    While maintenance mode is being activated, the running executions check
+    made on every request is throttled to once every
+    `maintenance_executions_check_interval` seconds.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file_key = None
+        self._state = None
+        self._running_executions = None
+        self._running_executions_checked_at = 0
+
+    def get(self):
+        """Return the current state, or None if maintenance mode is off
+        """
+        maintenance_file = get_maintenance_file_path()
+        try:
+            stat = os.stat(maintenance_file)
+        except OSError:
+            return None
+        file_key = (maintenance_file, stat.st_ino, stat.st_mtime,
+                    stat.st_size)
+        with self._lock:
+            if file_key != self._file_key:
+                self._state = utils.read_json_file(maintenance_file)
+                self._file_key = file_key
+            # Callers might modify the returned state
+            return dict(self._state)
+
+    def set(self, state):
+        utils.mkdirs(config.instance.maintenance_folder)
+        utils.write_dict_to_json_file(get_maintenance_file_path(), state)
+        self.clear()
+
+    def remove(self):
+        os.remove(get_maintenance_file_path())
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._file_key = None
+            self._state = None
+            self._running_executions = None
+            self._running_executions_checked_at = 0
+
+    def get_running_executions(self):
+        """Return the running executions, checking at most once in
+        `maintenance_executions_check_interval` seconds
+        """
+        interval = config.instance.maintenance_executions_check_interval
+        with self._lock:
+            if self._running_executions is not None and \
+                    time.time() - self._running_executions_checked_at < \
+                    interval:
+                return self._running_executions
+        running_executions = get_running_executions()
+        with self._lock:
+            self._running_executions = running_executions
+            self._running_executions_checked_at = time.time()
+        return running_executions
+
+
+maintenance_state = MaintenanceState()
+
+
 def maintenance_mode_handler():
 
     # failed to route the request - this is a 404. Abort early.
@@ -71,14 +144,11 @@ def maintenance_mode_handler():
     # Removing v*/ from the endpoint
     index = request.endpoint.find('/')
     request_endpoint = request.endpoint[index+1:]
-    maintenance_file = os.path.join(
-            config.instance.maintenance_folder,
-            MAINTENANCE_MODE_STATUS_FILE)
 
-    if os.path.isfile(maintenance_file):
-        state = utils.read_json_file(maintenance_file)
+    state = maintenance_state.get()
+    if state:
         if state['status'] == MAINTENANCE_MODE_ACTIVATING:
-            running_executions = get_running_executions()
+            running_executions = maintenance_state.get_running_executions()
             if not running_executions:
                 now = utils.get_formatted_timestamp()
                 state = prepare_maintenance_dict(
@@ -88,7 +158,7 @@ def maintenance_mode_handler():
                         requested_by=state['requested_by'],
                         activation_requested_at=state[
                             'activation_requested_at'])
-                utils.write_dict_to_json_file(maintenance_file, state)
+                maintenance_state.set(state)
             else:
                 return _handle_activating_mode(
                        state=state,
@@ -138,19 +208,29 @@ def _check_allowed_endpoint(request_endpoint):
 
 
 def get_running_executions():
-    executions = get_resource_manager().list_executions(
-            is_include_system_workflows=True).items
-    running_executions = []
-    for execution in executions:
-        if execution.status not in ExecutionState.END_STATES:
-            running_executions.append({
-                'id': execution.id,
-                'status': execution.status,
-                'deployment_id': execution.deployment_id,
-                'workflow_id': execution.workflow_id
-            })
-
-    return running_executions
+    """Return the executions that didn't end yet, of all tenants, as
+    maintenance mode applies to the whole manager
+
+    Queued executions aren't started while in maintenance mode, so they
+    don't need to end first
+    """
+    executions = (
+        db.session.query(Execution.id,
+                         Execution.status,
+                         Deployment.id.label('deployment_id'),
+                         Execution.workflow_id)
+        .outerjoin(Deployment,
+                   Execution._deployment_fk == Deployment._storage_id)
+        .filter(or_(Execution.status.is_(None),
+                    ~Execution.status.in_(
+                        ExecutionState.END_STATES + [ExecutionState.QUEUED])))
+    )
+    return [{
+        'id': execution.id,
+        'status': execution.status,
+        'deployment_id': execution.deployment_id,
+        'workflow_id': execution.workflow_id
+    } for execution in executions]
 
 
 def _is_internal_request():
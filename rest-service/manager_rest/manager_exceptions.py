@@ -244,6 +244,18 @@ class DeploymentEnvironmentCreationPendingError(ManagerException):
             *args, **kwargs)
 
 
+class DeploymentDeletionInProgressError(ManagerException):
+    DEPLOYMENT_DELETION_IN_PROGRESS_ERROR_CODE = \
+        'deployment_deletion_in_progress_error'
+
+    def __init__(self, *args, **kwargs):
+        super(DeploymentDeletionInProgressError, self).__init__(
+            400,
+            DeploymentDeletionInProgressError
+            .DEPLOYMENT_DELETION_IN_PROGRESS_ERROR_CODE,
+            *args, **kwargs)
+
+
 class IllegalActionError(ManagerException):
     ILLEGAL_ACTION_ERROR_CODE = 'illegal_action_error'
 
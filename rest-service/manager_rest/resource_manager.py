@@ -19,18 +19,22 @@ import shutil
 import traceback
 import itertools
 from copy import deepcopy
+from collections import OrderedDict, Counter
 from StringIO import StringIO
 
-import celery.exceptions
 from flask import current_app
 from flask_security import current_user
+from sqlalchemy import text
 
 from dsl_parser import constants, functions, tasks
 from dsl_parser import exceptions as parser_exceptions
 
 from manager_rest.constants import DEFAULT_TENANT_NAME
-from manager_rest.storage import get_storage_manager, models
+from manager_rest.storage import get_storage_manager, models, db
+from manager_rest.storage.plan_cache import plan_cache
+from manager_rest.storage.outputs_cache import outputs_cache
 from manager_rest.app_logging import raise_unauthorized_user_error
+from manager_rest.maintenance import maintenance_state
 from manager_rest.storage.models_states import (SnapshotState,
                                                 ExecutionState,
                                                 DeploymentModificationState)
@@ -41,6 +45,71 @@ from . import app_context
 from . import workflow_executor
 from . import manager_exceptions
 
+# Key of the PostgreSQL advisory lock that serializes the scheduling of
+# executions (see `ResourceManager._lock_execution_scheduling`)
+EXECUTION_SCHEDULING_LOCK = 20170401
+
+
+class FunctionsEvaluationStorage(object):
+    """The storage methods used by the DSL parser to evaluate intrinsic
+    functions (e.g. `get_attribute`) of a single deployment
+
+    The deployment's nodes and node instances are loaded on the first
+    lookup, with a query each, and all the lookups of the evaluation are
+    then served from memory, no matter how many functions are evaluated
+    """
+    def __init__(self, sm, deployment_id):
+        self.sm = sm
+        self.deployment_id = deployment_id
+        self._nodes = None
+        self._node_instances = None
+        self._node_instances_by_node = None
+
+    def _load(self):
+        if self._nodes is not None:
+            return
+        filters = {'deployment_id': self.deployment_id}
+        nodes = self.sm.list(models.Node,
+                             filters=filters,
+                             get_all_results=True).items
+        node_instances = self.sm.list(models.NodeInstance,
+                                      filters=filters,
+                                      get_all_results=True).items
+        # Index the instances by the storage ID of their node, rather than
+        # by their `node_id`, which would load each instance's node
+        node_ids = {node._storage_id: node.id for node in nodes}
+        self._nodes = {node.id: node for node in nodes}
+        self._node_instances = OrderedDict(
+            (instance.id, instance) for instance in node_instances)
+        self._node_instances_by_node = {node.id: [] for node in nodes}
+        for instance in node_instances:
+            node_id = node_ids[instance._node_fk]
+            self._node_instances_by_node[node_id].append(instance)
+
+    def get_node_instances(self, node_id=None):
+        self._load()
+        if node_id:
+            return list(self._node_instances_by_node.get(node_id, []))
+        return self._node_instances.values()
+
+    def get_node_instance(self, node_instance_id):
+        self._load()
+        instance = self._node_instances.get(node_instance_id)
+        if instance is None:
+            # Not an instance of this deployment
+            return self.sm.get(models.NodeInstance, node_instance_id)
+        return instance
+
+    def get_node(self, node_id):
+        self._load()
+        node = self._nodes.get(node_id)
+        if node is None:
+            raise manager_exceptions.NotFoundError(
+                'Requested Node with ID `{0}` on Deployment `{1}` '
+                'was not found'.format(node_id, self.deployment_id)
+            )
+        return node
+
 
 class ResourceManager(object):
 
@@ -48,7 +117,8 @@ class ResourceManager(object):
         self.sm = get_storage_manager()
 
     def list_executions(self, include=None, is_include_system_workflows=False,
-                        filters=None, pagination=None, sort=None):
+                        filters=None, pagination=None, sort=None,
+                        stream=False):
         filters = filters or {}
         is_system_workflow = filters.get('is_system_workflow')
         if is_system_workflow:
@@ -63,7 +133,8 @@ class ResourceManager(object):
             include=include,
             filters=filters,
             pagination=pagination,
-            sort=sort
+            sort=sort,
+            stream=stream
         )
 
     def update_execution_status(self, execution_id, status, error):
@@ -76,6 +147,47 @@ class ResourceManager(object):
         execution.error = error
         return self.sm.update(execution)
 
+    def handle_execution_end(self, execution):
+        """Run the steps that follow the end of `execution` (if it ended),
+        after its status was updated. These might delete the execution
+        (e.g. with its deployment), so the status update response is to be
+        built before they run
+        """
+        if execution.status in ExecutionState.END_STATES:
+            self._run_completion_action(execution)
+            self.start_queued_executions()
+
+    def _run_completion_action(self, execution):
+        """Run the step set to follow the system workflow of `execution`
+        (see `_execute_system_workflow`), now that the workflow has ended
+
+        Errors are only logged, as the status update itself already succeeded
+        """
+        actions = execution._completion_actions or {}
+        if execution.status == ExecutionState.TERMINATED:
+            action = actions.get('on_success')
+        else:
+            action = actions.get('on_failure')
+            if actions.get('on_success'):
+                current_app.logger.error(
+                    'The {0} system workflow (execution {1}) ended with '
+                    'status {2}, skipping {3}'.format(
+                        execution.workflow_id, execution.id,
+                        execution.status, actions['on_success'][0]))
+        if not action:
+            return
+        name, params = action
+        try:
+            getattr(self, '_complete_{0}'.format(name))(**params)
+        except Exception:
+            tb = StringIO()
+            traceback.print_exc(file=tb)
+            current_app.logger.error(
+                'Failed running {0} after the {1} system workflow '
+                '(execution {2}); traceback: {3}'.format(
+                    name, execution.workflow_id, execution.id,
+                    tb.getvalue()))
+
     def _validate_execution_update(self, current_status, future_status):
         if current_status in ExecutionState.END_STATES:
             return False
@@ -207,31 +319,47 @@ class ResourceManager(object):
                     }
                 },
                 verify_no_executions=False,
-                timeout=300)
+                on_failure=('plugin_installation_failure',
+                            {'plugin_id': plugin.id}))
+
+    def _complete_plugin_installation_failure(self, plugin_id):
+        plugin = self.sm.get(models.Plugin, plugin_id)
+        self._uninstall_plugin(plugin)
 
     def remove_plugin(self, plugin_id, force):
+        """Uninstall a plugin, and remove it once it's uninstalled
+
+        The plugin is removed from storage when the uninstall_plugin system
+        workflow terminates, so it may still exist when this returns.
+        """
         # Verify plugin exists.
         plugin = self.sm.get(models.Plugin, plugin_id)
         self.assert_user_has_modify_permissions(plugin)
 
-        # Uninstall (if applicable)
+        # Verify the plugin isn't in use (if applicable)
         if utils.plugin_installable_on_current_platform(plugin):
             if not force:
                 used_blueprints = list(set(
                     d.blueprint_id for d in
                     self.sm.list(models.Deployment, include=['blueprint_id'])))
-                plugins = [b.plan[constants.WORKFLOW_PLUGINS_TO_INSTALL] +
-                           b.plan[constants.DEPLOYMENT_PLUGINS_TO_INSTALL]
-                           for b in
-                           self.sm.list(models.Blueprint,
-                                        include=['plan'],
-                                        filters={'id': used_blueprints})]
+                plans = [plan_cache.get(b) for b in
+                         self.sm.list(models.Blueprint,
+                                      include=['_storage_id', 'updated_at'],
+                                      filters={'id': used_blueprints})]
+                plugins = [plan[constants.WORKFLOW_PLUGINS_TO_INSTALL] +
+                           plan[constants.DEPLOYMENT_PLUGINS_TO_INSTALL]
+                           for plan in plans]
                 plugins = set((p.get('package_name'), p.get('package_version'))
                               for sublist in plugins for p in sublist)
                 if (plugin.package_name, plugin.package_version) in plugins:
                     raise manager_exceptions.PluginInUseError(
                         'Plugin {} is currently in use. You can "force" '
                         'plugin removal.'.format(plugin.id))
+        return self._uninstall_plugin(plugin)
+
+    def _uninstall_plugin(self, plugin):
+        # Uninstall (if applicable), and remove once uninstalled
+        if utils.plugin_installable_on_current_platform(plugin):
             self._execute_system_workflow(
                 wf_id='uninstall_plugin',
                 task_mapping='cloudify_system_workflows.plugins.uninstall',
@@ -244,18 +372,21 @@ class ResourceManager(object):
                     }
                 },
                 verify_no_executions=False,
-                timeout=300)
+                on_success=('plugin_uninstallation', {'plugin_id': plugin.id}))
+        else:
+            self._complete_plugin_uninstallation(plugin.id)
+        return plugin
 
+    def _complete_plugin_uninstallation(self, plugin_id):
+        plugin = self.sm.get(models.Plugin, plugin_id)
+        archive_path = utils.get_plugin_archive_path(plugin_id,
+                                                     plugin.archive_name)
         # Remove from storage
         self.sm.delete(plugin)
 
         # Remove from file system
-        archive_path = utils.get_plugin_archive_path(plugin_id,
-                                                     plugin.archive_name)
         shutil.rmtree(os.path.dirname(archive_path), ignore_errors=True)
 
-        return plugin
-
     def publish_blueprint(self,
                           application_dir,
                           application_file_name,
@@ -294,12 +425,21 @@ class ResourceManager(object):
                         ','.join([dep.id for dep
                                   in blueprint.deployments])))
 
+        # The plan is deferred, and is returned along with the blueprint
+        blueprint.plan
+        plan_cache.remove(blueprint._storage_id)
         return self.sm.delete(blueprint)
 
     def delete_deployment(self,
                           deployment_id,
                           bypass_maintenance=None,
                           ignore_live_nodes=False):
+        """Delete the deployment's environment, and then its logs
+
+        The deployment is removed from storage (and from the file server)
+        when both system workflows terminate, so it may still exist when this
+        returns.
+        """
         # Verify deployment exists.
         deployment = self.sm.get(models.Deployment, deployment_id)
         self.assert_user_has_modify_permissions(deployment)
@@ -344,13 +484,21 @@ class ResourceManager(object):
                                      ('uninitialized', 'deleted')])))
 
         self._delete_deployment_environment(deployment_id, bypass_maintenance)
-        self._delete_deployment_logs(deployment_id, bypass_maintenance)
-        return self.sm.delete(deployment)
+        return deployment
 
     def execute_workflow(self, deployment_id, workflow_id,
                          parameters=None,
                          allow_custom_parameters=False,
-                         force=False, bypass_maintenance=None):
+                         force=False, bypass_maintenance=None,
+                         queue=False):
+        """Start a workflow execution on a deployment
+
+        :param queue: If set to True, an execution that can't be started
+        right away (because of other active executions, or because the caps
+        of running executions were reached) is created as queued, and is
+        started once it's no longer blocked (see `start_queued_executions`),
+        instead of being rejected
+        """
         deployment = self.sm.get(models.Deployment, deployment_id)
         blueprint = self.sm.get(models.Blueprint, deployment.blueprint_id)
 
@@ -361,9 +509,21 @@ class ResourceManager(object):
         workflow = deployment.workflows[workflow_id]
 
         self._verify_deployment_environment_created_successfully(deployment_id)
+        self._verify_deployment_not_being_deleted(deployment_id)
 
-        self._check_for_active_system_wide_execution()
-        self._check_for_active_executions(deployment_id, force)
+        # Held until the new execution is stored (see
+        # `_lock_execution_scheduling`)
+        self._lock_execution_scheduling()
+        try:
+            self._check_for_active_system_wide_execution()
+            self._check_for_active_executions(deployment_id, force)
+            self._check_for_executions_capacity()
+        except manager_exceptions.ExistingRunningExecutionError:
+            if not queue:
+                raise
+            status = ExecutionState.QUEUED
+        else:
+            status = ExecutionState.PENDING
 
         execution_parameters = \
             ResourceManager._merge_and_validate_execution_parameters(
@@ -373,7 +533,7 @@ class ResourceManager(object):
 
         new_execution = models.Execution(
             id=execution_id,
-            status=ExecutionState.PENDING,
+            status=status,
             created_at=utils.get_formatted_timestamp(),
             workflow_id=workflow_id,
             error='',
@@ -384,9 +544,14 @@ class ResourceManager(object):
         if deployment:
             new_execution.deployment = deployment
         self.sm.put(new_execution)
+        if status == ExecutionState.QUEUED:
+            # The executions blocking this one might have ended before it
+            # was stored, in which case they didn't start it
+            self.start_queued_executions()
+            return new_execution
 
         # executing the user workflow
-        workflow_plugins = blueprint.plan[
+        workflow_plugins = plan_cache.get(blueprint)[
             constants.WORKFLOW_PLUGINS_TO_INSTALL]
         workflow_executor.execute_workflow(
             workflow_id,
@@ -400,51 +565,246 @@ class ResourceManager(object):
 
         return new_execution
 
-    def _check_for_any_active_executions(self):
-        filters = {
-            'status': ExecutionState.ACTIVE_STATES
-        }
-        executions = [
-            e.id
-            for e in self.list_executions(is_include_system_workflows=True,
-                                          filters=filters).items
-        ]
+    def start_queued_executions(self):
+        """Start the queued executions that are no longer blocked, oldest
+        first. Called whenever an execution ends, and after an execution
+        is queued
+
+        A queued execution is blocked while its tenant has a running
+        system-wide execution, while its deployment has an active execution
+        (including an older queued one), or while the global or per-tenant
+        caps of running executions are reached. Queued executions of all
+        tenants are started, regardless of the current one.
+
+        Errors are only logged, as the callers' own updates (e.g. of the
+        ended execution's status) already succeeded
+        """
+        try:
+            self._start_queued_executions()
+        except Exception:
+            db.session.rollback()
+            tb = StringIO()
+            traceback.print_exc(file=tb)
+            current_app.logger.error(
+                'Failed starting queued executions; traceback: {0}'
+                .format(tb.getvalue()))
+
+    def _start_queued_executions(self):
+        if maintenance_state.get():
+            # They're started once maintenance mode is deactivated
+            return
+        while True:
+            started = [self._start_queued_execution(execution)
+                       for execution in self._schedule_queued_executions()]
+            # An execution that failed to start no longer takes up a slot,
+            # so another queued execution might be started instead
+            if all(started):
+                return
+
+    def _schedule_queued_executions(self):
+        """Set the queued executions that are no longer blocked as pending,
+        and return them, so that they're started
+
+        The running executions are counted while holding the scheduling lock
+        (see `_lock_execution_scheduling`), so that executions ending at the
+        same time don't start more executions than the caps allow
+        """
+        self._lock_execution_scheduling()
+        queued = models.Execution.query.filter(
+            models.Execution.status == ExecutionState.QUEUED
+        ).order_by(models.Execution.created_at,
+                   models.Execution._storage_id).all()
+        scheduled = []
+        if queued:
+            scheduled = self._select_unblocked_executions(queued)
+        # Ends the transaction, and so releases the lock
+        db.session.commit()
+        return scheduled
+
+    def _select_unblocked_executions(self, queued):
+        running = self._get_running_executions()
+        max_executions = config.instance.max_concurrent_executions
+        max_tenant_executions = \
+            config.instance.max_concurrent_executions_per_tenant
+        total_executions = len(running)
+        tenant_executions = Counter(tenant_id for tenant_id, _ in running)
+        system_wide_tenants = set(tenant_id for tenant_id, deployment_fk
+                                  in running if deployment_fk is None)
+        blocked_deployments = set(deployment_fk for _, deployment_fk
+                                  in running)
+        selected = []
+        for execution in queued:
+            if max_executions and total_executions >= max_executions:
+                break
+            tenant_id = execution._tenant_id
+            deployment_fk = execution._deployment_fk
+            blocked = (
+                tenant_id in system_wide_tenants or
+                deployment_fk in blocked_deployments or
+                (max_tenant_executions and
+                 tenant_executions[tenant_id] >= max_tenant_executions))
+            # Later executions of the same deployment wait for this one
+            blocked_deployments.add(deployment_fk)
+            if blocked:
+                continue
+            if not self._update_queued_execution_status(
+                    execution, ExecutionState.PENDING):
+                # Cancelled by a concurrent request
+                blocked_deployments.discard(deployment_fk)
+                continue
+            selected.append(execution)
+            total_executions += 1
+            tenant_executions[tenant_id] += 1
+        return selected
+
+    @staticmethod
+    def _lock_execution_scheduling():
+        """Serialize checking the caps of running executions and creating or
+        starting executions across the REST service workers, until the
+        current transaction ends
+
+        SQLite (used in the tests) serializes all writes anyway
+        """
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(
+                text('SELECT pg_advisory_xact_lock(:key)'),
+                {'key': EXECUTION_SCHEDULING_LOCK})
+
+    def _start_queued_execution(self, execution):
+        """Start a queued execution (already set as pending), as its creator
+        and in its tenant
+
+        :return: Whether the execution is now running - False if it failed
+        to start, in which case it's set as failed
+        """
+        deployment = execution.deployment
+        try:
+            workflow = deployment.workflows[execution.workflow_id]
+            execution_parameters = \
+                self._merge_and_validate_execution_parameters(
+                    workflow, execution.workflow_id, execution.parameters,
+                    allow_custom_parameters=True)
+            workflow_plugins = plan_cache.get(deployment.blueprint)[
+                constants.WORKFLOW_PLUGINS_TO_INSTALL]
+            workflow_executor.execute_workflow(
+                execution.workflow_id,
+                workflow,
+                workflow_plugins=workflow_plugins,
+                blueprint_id=deployment.blueprint_id,
+                deployment_id=deployment.id,
+                execution_id=execution.id,
+                execution_parameters=execution_parameters,
+                user=execution.creator,
+                tenant=execution.tenant)
+        except Exception as e:
+            tb = StringIO()
+            traceback.print_exc(file=tb)
+            current_app.logger.error(
+                'Failed starting queued execution {0}; traceback: {1}'
+                .format(execution.id, tb.getvalue()))
+            execution.status = ExecutionState.FAILED
+            execution.error = 'Failed starting queued execution: {0}'.format(
+                e)
+            self.sm.update(execution)
+            return False
+        return True
+
+    @staticmethod
+    def _update_queued_execution_status(execution, status):
+        """Change the status of an execution only if it's still queued, so
+        that concurrent requests don't both start (or cancel) it. The change
+        is to be committed by the caller
 
-        if executions:
+        :return: Whether the status was changed
+        """
+        updated = models.Execution.query.filter_by(
+            _storage_id=execution._storage_id,
+            status=ExecutionState.QUEUED
+        ).update({'status': status}, synchronize_session=False)
+        return bool(updated)
+
+    @staticmethod
+    def _get_running_executions():
+        """Return the (tenant id, deployment storage id) of the running
+        executions of all tenants
+        """
+        return models.Execution.query.with_entities(
+            models.Execution._tenant_id,
+            models.Execution._deployment_fk
+        ).filter(
+            models.Execution.status.in_(ExecutionState.RUNNING_STATES)
+        ).all()
+
+    def _check_for_executions_capacity(self):
+        max_executions = config.instance.max_concurrent_executions
+        max_tenant_executions = \
+            config.instance.max_concurrent_executions_per_tenant
+        if not max_executions and not max_tenant_executions:
+            return
+        running = self._get_running_executions()
+        if max_executions and len(running) >= max_executions:
+            raise manager_exceptions.ExistingRunningExecutionError(
+                'You cannot start an execution, as the maximum number of '
+                'running executions ({0}) was reached'.format(max_executions))
+        tenant_id = self.sm.current_tenant.id
+        tenant_executions = sum(1 for running_tenant_id, _ in running
+                                if running_tenant_id == tenant_id)
+        if max_tenant_executions and \
+                tenant_executions >= max_tenant_executions:
             raise manager_exceptions.ExistingRunningExecutionError(
-                'You cannot start a system-wide execution if there are '
-                'other executions running. '
-                'Currently running executions: {0}'
-                .format(executions))
+                'You cannot start an execution, as the maximum number of '
+                'running executions of the tenant ({0}) was reached'
+                .format(max_tenant_executions))
+
+    def _has_active_executions(self, **filters):
+        filters['status'] = ExecutionState.ACTIVE_STATES
+        return self.sm.exists(models.Execution, filters=filters)
+
+    def _get_active_execution_ids(self, **filters):
+        filters['status'] = ExecutionState.ACTIVE_STATES
+        executions = self.sm.list(models.Execution,
+                                  include=['id'],
+                                  filters=filters,
+                                  get_all_results=True)
+        return [e.id for e in executions.items]
+
+    def _check_for_any_active_executions(self):
+        if not self._has_active_executions():
+            return
+        raise manager_exceptions.ExistingRunningExecutionError(
+            'You cannot start a system-wide execution if there are '
+            'other executions running. '
+            'Currently running executions: {0}'
+            .format(self._get_active_execution_ids()))
 
     def _check_for_active_system_wide_execution(self):
-        filters = {
-            'status': ExecutionState.ACTIVE_STATES
-        }
-        for e in self.list_executions(is_include_system_workflows=True,
-                                      filters=filters).items:
-            if e.deployment_id is None:
-                raise manager_exceptions.ExistingRunningExecutionError(
-                    'You cannot start an execution if there is a running '
-                    'system-wide execution (id: {0})'
-                    .format(e.id))
+        if not self._has_active_executions(_deployment_fk=None):
+            return
+        raise manager_exceptions.ExistingRunningExecutionError(
+            'You cannot start an execution if there is a running '
+            'system-wide execution (id: {0})'
+            .format(self._get_active_execution_ids(_deployment_fk=None)[0]))
 
     def _execute_system_workflow(self, wf_id, task_mapping, deployment=None,
-                                 execution_parameters=None, timeout=0,
-                                 created_at=None, verify_no_executions=True,
-                                 bypass_maintenance=None):
+                                 execution_parameters=None, created_at=None,
+                                 verify_no_executions=True,
+                                 bypass_maintenance=None, on_success=None,
+                                 on_failure=None):
         """
         :param deployment: deployment for workflow execution
         :param wf_id: workflow id
         :param task_mapping: mapping to the system workflow
         :param execution_parameters: parameters for the system workflow
-        :param timeout: 0 will return immediately; any positive value will
-         cause this method to wait for the given timeout for the task to
-         complete, and verify it finished successfully before returning
         :param created_at: creation time for the workflow execution object.
          if omitted, a value will be generated by this method.
         :param bypass_maintenance: allows running the workflow despite having
         the manager maintenance mode activated.
+        :param on_success: a (name, params) tuple of a step to run once the
+         workflow terminates, by calling `self._complete_<name>(**params)`.
+         The step runs when the execution's status is updated, so that no
+         request waits for the workflow to end.
+        :param on_failure: same as `on_success`, for when the workflow fails
+         or is cancelled
         :return: (async task object, execution object)
         """
         execution_id = str(uuid.uuid4())  # will also serve as the task id
@@ -468,6 +828,11 @@ class ResourceManager(object):
             parameters=self._get_only_user_execution_parameters(
                 execution_parameters),
             is_system_workflow=is_system_workflow)
+        if on_success or on_failure:
+            execution._completion_actions = {
+                'on_success': on_success,
+                'on_failure': on_failure
+            }
 
         if deployment:
             execution.deployment = deployment
@@ -481,36 +846,6 @@ class ResourceManager(object):
             execution_parameters=execution_parameters,
             bypass_maintenance=bypass_maintenance)
 
-        if timeout > 0:
-            try:
-                # wait for the workflow execution to complete
-                async_task.get(timeout=timeout, propagate=True)
-            except celery.exceptions.TimeoutError:
-                raise manager_exceptions.ExecutionTimeout(
-                    'Execution of system workflow {0} timed out ({1} seconds)'
-                    .format(wf_id, timeout))
-            except Exception as e:
-                # error message for the user
-                if deployment:
-                    add_info = ' for deployment {0}'.format(deployment.id)
-                else:
-                    add_info = ''
-                error_msg = 'Error occurred while executing the {0} ' \
-                            'system workflow {1}: {2} - {3}'.format(
-                                wf_id, add_info, type(e).__name__, e)
-                # adding traceback to the log error message
-                tb = StringIO()
-                traceback.print_exc(file=tb)
-                log_error_msg = '{0}; traceback: {1}'.format(
-                    error_msg, tb.getvalue())
-                current_app.logger.error(log_error_msg)
-                raise manager_exceptions.ExecutionFailure(error_msg)
-            self.sm.refresh(execution)  # Reload the status form the DB
-            if execution.status != ExecutionState.TERMINATED:
-                raise manager_exceptions.ExecutionFailure(
-                    'Failed executing the {0} system workflow: '
-                    'Execution did not complete successfully.'.format(wf_id))
-
         return async_task, execution
 
     def cancel_execution(self, execution_id, force=False):
@@ -541,6 +876,15 @@ class ResourceManager(object):
         """
 
         execution = self.sm.get(models.Execution, execution_id)
+        if execution.status == ExecutionState.QUEUED and \
+                self._update_queued_execution_status(
+                    execution, ExecutionState.CANCELLED):
+            db.session.commit()
+            # It was never started, so there's nothing to stop, but the
+            # queued executions it blocked might be started now
+            self.start_queued_executions()
+            return self.sm.get(models.Execution, execution_id)
+
         if execution.status not in (ExecutionState.PENDING,
                                     ExecutionState.STARTED) and \
                 (not force or execution.status != ExecutionState.CANCELLING):
@@ -614,9 +958,23 @@ class ResourceManager(object):
     def _prepare_deployment_node_instances_for_storage(self,
                                                        deployment_id,
                                                        dsl_node_instances):
+        deployment_id_filter = self.create_filters_dict(
+            deployment_id=deployment_id)
+        nodes = {
+            node.id: node for node in self.sm.list(
+                models.Node,
+                filters=deployment_id_filter,
+                get_all_results=True)
+        }
         node_instances = []
         for node_instance in dsl_node_instances:
-            node = self.get_node(deployment_id, node_instance['node_id'])
+            node = nodes.get(node_instance['node_id'])
+            if not node:
+                raise manager_exceptions.NotFoundError(
+                    'Requested Node with ID `{0}` on Deployment `{1}` '
+                    'was not found'.format(node_instance['node_id'],
+                                           deployment_id)
+                )
             instance_id = node_instance['id']
             scaling_groups = node_instance.get('scaling_groups', [])
             relationships = node_instance.get('relationships', [])
@@ -630,7 +988,9 @@ class ResourceManager(object):
                 version=None,
                 scaling_groups=scaling_groups
             )
-            instance.node = node
+            # Setting the foreign key rather than the relationship, as the
+            # instances are stored using a bulk insert
+            instance._node_fk = node._storage_id
             node_instances.append(instance)
 
         return node_instances
@@ -643,8 +1003,9 @@ class ResourceManager(object):
         deployment = self.sm.get(models.Deployment, deployment_id)
 
         for node in nodes:
-            node.deployment = deployment
-            self.sm.put(node)
+            node._deployment_fk = deployment._storage_id
+        # Committed along with the node instances
+        self.sm.put_many(nodes, commit=False)
 
     def _create_deployment_node_instances(self,
                                           deployment_id,
@@ -652,9 +1013,12 @@ class ResourceManager(object):
         node_instances = self._prepare_deployment_node_instances_for_storage(
             deployment_id,
             dsl_node_instances)
-
-        for node_instance in node_instances:
-            self.sm.put(node_instance)
+        try:
+            self.sm.put_many(node_instances)
+        except Exception:
+            # Don't leave the uncommitted nodes behind
+            db.session.rollback()
+            raise
 
     def create_deployment(self,
                           blueprint_id,
@@ -664,7 +1028,8 @@ class ResourceManager(object):
                           private_resource=False):
 
         blueprint = self.sm.get(models.Blueprint, blueprint_id)
-        plan = blueprint.plan
+        # prepare_deployment_plan works on a copy of the (cached) plan
+        plan = plan_cache.get(blueprint)
         try:
             deployment_plan = tasks.prepare_deployment_plan(plan, inputs)
         except parser_exceptions.MissingRequiredInputError, e:
@@ -924,54 +1289,100 @@ class ResourceManager(object):
         instance_dict['node_id'] = node_id
         instance_dict['tenant_name'] = tenant_name
 
+    def update_node_instances(self, updates):
+        """Update several node instances in a single transaction
+
+        Each update is a dict with the instance's `id` and `version`, and
+        optionally its new `state`, and either its new `runtime_properties`
+        or a `runtime_properties_patch` (a JSON merge patch) to apply to them.
+        An instance is only updated if its current version matches the
+        update's version; the other updates are applied regardless.
+
+        :return: A list with a result dict per update, in the same order:
+        its `id`, its `status` (updated/conflict/not_found), and the
+        instance's current `version`
+        """
+        # Lock the rows in a consistent order, to avoid deadlocks between
+        # concurrent bulk updates of overlapping instances
+        instances = self.sm.list(
+            models.NodeInstance,
+            filters={'id': [update['id'] for update in updates]},
+            sort={'_storage_id': 'asc'},
+            get_all_results=True,
+            locking=True
+        ).items
+        instances = {instance.id: instance for instance in instances}
+
+        results = []
+        updated_instances = []
+        for update in updates:
+            instance = instances.get(update['id'])
+            if instance is None:
+                results.append({'id': update['id'], 'status': 'not_found'})
+                continue
+            if instance.version != update['version']:
+                results.append({'id': instance.id,
+                                'status': 'conflict',
+                                'version': instance.version})
+                continue
+            if 'runtime_properties_patch' in update:
+                instance.runtime_properties = utils.merge_patch(
+                    instance.runtime_properties,
+                    update['runtime_properties_patch'])
+            elif 'runtime_properties' in update:
+                instance.runtime_properties = update['runtime_properties']
+            instance.state = update.get('state', instance.state)
+            instance.version += 1
+            updated_instances.append(instance)
+            results.append({'id': instance.id,
+                            'status': 'updated',
+                            'version': instance.version})
+
+        # Commit even if nothing was updated, to release the row locks
+        self.sm.update_many(updated_instances)
+        return results
+
+    def get_deployment_outputs(self, deployment_id):
+        """Return the evaluated outputs of a deployment, and their ETag
+
+        The outputs are cached, and only re-evaluated once the deployment
+        or any of its node instances changed
+        """
+        deployment = self.sm.get(
+            models.Deployment,
+            deployment_id,
+            include=['_storage_id', 'updated_at']
+        )
+        return outputs_cache.get(
+            deployment,
+            lambda: self.evaluate_deployment_outputs(deployment_id))
+
     def evaluate_deployment_outputs(self, deployment_id):
         deployment = self.sm.get(
             models.Deployment,
             deployment_id,
             include=['outputs']
         )
-
-        def get_node_instances(node_id=None):
-            filters = self.create_filters_dict(deployment_id=deployment_id,
-                                               node_id=node_id)
-            return self.sm.list(models.NodeInstance, filters=filters).items
-
-        def get_node_instance(node_instance_id):
-            return self.sm.get(models.NodeInstance, node_instance_id)
-
-        def get_node(node_id):
-            return self.get_node(deployment_id, node_id)
-
+        storage = FunctionsEvaluationStorage(self.sm, deployment_id)
         try:
             return functions.evaluate_outputs(
                 outputs_def=deployment.outputs,
-                get_node_instances_method=get_node_instances,
-                get_node_instance_method=get_node_instance,
-                get_node_method=get_node)
+                get_node_instances_method=storage.get_node_instances,
+                get_node_instance_method=storage.get_node_instance,
+                get_node_method=storage.get_node)
         except parser_exceptions.FunctionEvaluationError, e:
             raise manager_exceptions.DeploymentOutputsEvaluationError(str(e))
 
     def evaluate_functions(self, deployment_id, context, payload):
         self.sm.get(models.Deployment, deployment_id, include=['id'])
-
-        def get_node_instances(node_id=None):
-            filters = self.create_filters_dict(deployment_id=deployment_id,
-                                               node_id=node_id)
-            return self.sm.list(models.NodeInstance, filters=filters).items
-
-        def get_node_instance(node_instance_id):
-            return self.sm.get(models.NodeInstance, node_instance_id)
-
-        def get_node(node_id):
-            return self.get_node(deployment_id, node_id)
-
+        storage = FunctionsEvaluationStorage(self.sm, deployment_id)
         try:
             return functions.evaluate_functions(
                 payload=payload,
                 context=context,
-                get_node_instances_method=get_node_instances,
-                get_node_instance_method=get_node_instance,
-                get_node_method=get_node)
+                get_node_instances_method=storage.get_node_instances,
+                get_node_instance_method=storage.get_node_instance,
+                get_node_method=storage.get_node)
         except parser_exceptions.FunctionEvaluationError, e:
             raise manager_exceptions.FunctionsEvaluationError(str(e))
 
@@ -1178,7 +1589,7 @@ class ResourceManager(object):
                                        deployment_id,
                                        bypass_maintenance):
         deployment = self.sm.get(models.Deployment, deployment_id)
-        blueprint = self.sm.get(models.Blueprint, deployment.blueprint_id)
+        plan = plan_cache.get(deployment.blueprint)
         wf_id = 'delete_deployment_environment'
         deployment_env_deletion_task_name = \
             'cloudify_system_workflows.deployment_environment.delete'
@@ -1187,14 +1598,22 @@ class ResourceManager(object):
             wf_id=wf_id,
             task_mapping=deployment_env_deletion_task_name,
             deployment=deployment,
-            timeout=300,
             bypass_maintenance=bypass_maintenance,
             execution_parameters={
-                'deployment_plugins_to_uninstall': blueprint.plan[
+                'deployment_plugins_to_uninstall': plan[
                     constants.DEPLOYMENT_PLUGINS_TO_INSTALL],
-                'workflow_plugins_to_uninstall': blueprint.plan[
+                'workflow_plugins_to_uninstall': plan[
                     constants.WORKFLOW_PLUGINS_TO_INSTALL],
-            })
+            },
+            on_success=('deployment_environment_deletion', {
+                'deployment_id': deployment_id,
+                'bypass_maintenance': bypass_maintenance
+            }))
+
+    def _complete_deployment_environment_deletion(self,
+                                                  deployment_id,
+                                                  bypass_maintenance):
+        self._delete_deployment_logs(deployment_id, bypass_maintenance)
 
     def _delete_deployment_logs(self, deployment_id, bypass_maintenance):
         self._execute_system_workflow(
@@ -1205,32 +1624,48 @@ class ResourceManager(object):
                 'deployment_id': deployment_id
             },
             verify_no_executions=False,
-            timeout=300,
-            bypass_maintenance=bypass_maintenance
+            bypass_maintenance=bypass_maintenance,
+            on_success=('deployment_deletion',
+                        {'deployment_id': deployment_id})
         )
 
-    def _check_for_active_executions(self, deployment_id, force):
-
-        def _get_running_executions(deployment_id=None, include_system=True):
-            deployment_id_filter = self.create_filters_dict(
-                deployment_id=deployment_id,
-                status=ExecutionState.ACTIVE_STATES)
-            executions = self.list_executions(
-                filters=deployment_id_filter,
-                is_include_system_workflows=include_system).items
-            return [e.id for e in executions if
-                    self.sm.get(models.Execution, e.id).status
-                    not in ExecutionState.END_STATES]
+    def _complete_deployment_deletion(self, deployment_id):
+        deployment = self.sm.get(models.Deployment, deployment_id)
+        deployment_folder = os.path.join(
+            config.instance.file_server_root,
+            config.instance.file_server_deployments_folder,
+            deployment.tenant_name,
+            deployment.id)
+        self.sm.delete(deployment)
+
+        # Delete deployment resources from file server
+        if os.path.exists(deployment_folder):
+            shutil.rmtree(deployment_folder)
+
+    def _verify_deployment_not_being_deleted(self, deployment_id):
+        """Deployments are only removed from storage once the system
+        workflows deleting them end, so new executions can't be started
+        from the moment their environment deletion starts
+        """
+        if self.sm.exists(models.Execution, filters={
+            'deployment_id': deployment_id,
+            'workflow_id': 'delete_deployment_environment',
+            'status': ExecutionState.ACTIVE_STATES + [
+                ExecutionState.TERMINATED]
+        }):
+            raise manager_exceptions.DeploymentDeletionInProgressError(
+                'Deployment {0} is being deleted'.format(deployment_id))
 
+    def _check_for_active_executions(self, deployment_id, force):
         # validate no execution is currently in progress
-        if not force:
-            running = _get_running_executions(deployment_id)
-            if len(running) > 0:
-                raise manager_exceptions.ExistingRunningExecutionError(
-                    'The following executions are currently running for this '
-                    'deployment: {0}. To execute this workflow anyway, pass '
-                    '"force=true" as a query parameter to this request'.format(
-                        running))
+        if force or not self._has_active_executions(
+                deployment_id=deployment_id):
+            return
+        raise manager_exceptions.ExistingRunningExecutionError(
+            'The following executions are currently running for this '
+            'deployment: {0}. To execute this workflow anyway, pass '
+            '"force=true" as a query parameter to this request'.format(
+                self._get_active_execution_ids(deployment_id=deployment_id)))
 
     @staticmethod
     def _get_only_user_execution_parameters(execution_parameters):
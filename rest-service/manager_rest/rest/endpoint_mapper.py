@@ -46,6 +46,8 @@ def setup_resources(api):
         'NodeInstances': 'node-instances',
         'NodeInstancesId': 'node-instances/<string:node_instance_id>',
         'Events': 'events',
+        'EventsTail': 'events/tail',
+        'EventsBulk': 'events/bulk',
         'Search': 'search',
         'Status': 'status',
         'ProviderContext': 'provider/context',
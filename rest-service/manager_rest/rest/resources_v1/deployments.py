@@ -14,16 +14,12 @@
 #  * limitations under the License.
 #
 
-import os
-import shutil
-
-from flask import current_app
+from flask import request
 from flask_restful import types
 from flask_restful.reqparse import Argument
 from flask_restful_swagger import swagger
+from werkzeug.http import quote_etag
 
-from manager_rest import config
-from manager_rest.constants import CURRENT_TENANT_CONFIG
 from manager_rest.maintenance import is_bypass_maintenance_mode
 from manager_rest.resource_manager import (
     ResourceManager,
@@ -39,6 +35,7 @@ from manager_rest.rest.rest_decorators import (
 )
 from manager_rest.rest.rest_utils import (
     get_args_and_verify_arguments,
+    get_deletion_status_code,
     get_json_and_verify_params,
 )
 from manager_rest.security import SecuredResource
@@ -124,7 +121,10 @@ class DeploymentsId(SecuredResource):
     @swagger.operation(
         responseClass=models.Deployment,
         nickname="deleteById",
-        notes="deletes a deployment by its id.",
+        notes="deletes a deployment by its id. The deployment's "
+              "environment and logs are deleted by system workflows, and "
+              "the deployment is only deleted once they end. 202 is "
+              "returned meanwhile if _async is set.",
         parameters=[{'name': 'ignore_live_nodes',
                      'description': 'Specifies whether to ignore live nodes,'
                                     'or raise an error upon such nodes '
@@ -133,6 +133,15 @@ class DeploymentsId(SecuredResource):
                      'allowMultiple': False,
                      'dataType': 'boolean',
                      'defaultValue': False,
+                     'paramType': 'query'},
+                    {'name': '_async',
+                     'description': 'Return 202 if the deletion waits for '
+                                    'a system workflow to end, instead of '
+                                    '200.',
+                     'required': False,
+                     'allowMultiple': False,
+                     'dataType': 'boolean',
+                     'defaultValue': False,
                      'paramType': 'query'}]
     )
     @exceptions_handled
@@ -147,19 +156,11 @@ class DeploymentsId(SecuredResource):
 
         bypass_maintenance = is_bypass_maintenance_mode()
 
+        # The deployment and its resources on the file server are deleted
+        # once the deletion system workflows terminate
         deployment = get_resource_manager().delete_deployment(
             deployment_id, bypass_maintenance, args.ignore_live_nodes)
-
-        # Delete deployment resources from file server
-        deployment_folder = os.path.join(
-            config.instance.file_server_root,
-            config.instance.file_server_deployments_folder,
-            current_app.config[CURRENT_TENANT_CONFIG].name,
-            deployment.id)
-        if os.path.exists(deployment_folder):
-            shutil.rmtree(deployment_folder)
-
-        return deployment, 200
+        return deployment, get_deletion_status_code(deployment)
 
 
 class DeploymentModifications(SecuredResource):
@@ -271,12 +272,19 @@ class DeploymentsIdOutputs(SecuredResource):
     @swagger.operation(
         responseClass=responses.DeploymentOutputs.__name__,
         nickname="get",
-        notes="Gets a specific deployment outputs."
+        notes="Gets a specific deployment outputs. The response has an "
+              "ETag header, which changes when the outputs might have "
+              "changed, and is used with If-None-Match to get a 304 "
+              "response if they didn't."
     )
     @exceptions_handled
     @marshal_with(responses.DeploymentOutputs)
     def get(self, deployment_id, **kwargs):
         """Get deployment outputs"""
-        outputs = get_resource_manager().evaluate_deployment_outputs(
+        outputs, etag = get_resource_manager().get_deployment_outputs(
             deployment_id)
-        return dict(deployment_id=deployment_id, outputs=outputs)
+        headers = {'ETag': quote_etag(etag)}
+        if request.if_none_match.contains(etag):
+            return {}, 304, headers
+        response = dict(deployment_id=deployment_id, outputs=outputs)
+        return response, 200, headers
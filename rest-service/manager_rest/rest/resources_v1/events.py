@@ -38,6 +38,7 @@ from manager_rest.storage.resource_models import (
     Deployment,
     Execution,
     Event,
+    EventCounts,
     Log,
 )
 
@@ -57,6 +58,35 @@ class Events(SecuredResource):
         (Deployment, 'deployment_id'),
     ]
 
+    # Columns selected from both events and logs, in the order used in the
+    # UNION of the two
+    COLUMNS = [
+        'timestamp',
+        'deployment_id',
+        'message',
+        'message_code',
+        'event_type',
+        'operation',
+        'node_id',
+        'logger',
+        'level',
+        'type',
+    ]
+
+    # Columns needed to build each of the fields returned by _map_event_to_es
+    # (`type` is always selected, as it's needed to build any event)
+    PROJECTION_COLUMNS = {
+        'timestamp': ['timestamp'],
+        '@timestamp': ['timestamp'],
+        'message': ['message'],
+        'message_code': ['message_code'],
+        'event_type': ['event_type'],
+        'context': ['deployment_id', 'operation', 'node_id'],
+        'logger': ['logger'],
+        'level': ['level'],
+        'type': ['type'],
+    }
+
     @staticmethod
     def _apply_filters(query, filters):
         """Apply filters to the query."""
@@ -150,7 +180,59 @@ class Events(SecuredResource):
         return query
 
     @staticmethod
-    def _build_select_query(filters, pagination, sort, range_filters):
+    def _get_selected_columns(_include, sort):
+        """Get the names of the columns to select.
+
+        :param _include:
+            Projection requested, as fields returned by
+            :meth:`._map_event_to_es` (all the columns are selected if None)
+        :type _include: list(str)
+        :param sort: Sorting criteria passed as a request argument
+        :type sort: dict(str, str)
+        :returns: Column names, in the order they should be selected
+        :rtype: list(str)
+
+        """
+        if _include is None:
+            return list(Events.COLUMNS)
+
+        selected = {'type'}
+        for field in _include:
+            selected.update(Events.PROJECTION_COLUMNS.get(field, []))
+        # Columns used for sorting must be selected as well
+        selected.update(field.lstrip('@') for field in sort)
+        return [column for column in Events.COLUMNS if column in selected]
+
+    @staticmethod
+    def _get_join_clauses(model, join_deployment):
+        """Get the clauses used to join events or logs with their execution.
+
+        Events of executions that have no deployment are never returned, so
+        when the deployment table isn't needed, it's enough to make sure that
+        the execution has a deployment.
+
+        :param model: Model to join
+        :type model:
+            :class:`manager_rest.storage.resource_models.Event`
+            :class:`manager_rest.storage.resource_models.Log`
+            :class:`manager_rest.storage.resource_models.EventCounts`
+        :param join_deployment: Whether to join the deployments table
+        :type join_deployment: bool
+        :returns: Clauses to pass to the query's filter method
+        :rtype: list
+
+        """
+        clauses = [model._execution_fk == Execution._storage_id]
+        if join_deployment:
+            clauses.append(
+                Execution._deployment_fk == Deployment._storage_id)
+        else:
+            clauses.append(Execution._deployment_fk.isnot(None))
+        return clauses
+
+    @staticmethod
+    def _build_select_query(filters, pagination, sort, range_filters,
+                            _include=None):
         """Build query used to list events for a given execution.
 
         :param filters:
@@ -187,6 +269,11 @@ class Events(SecuredResource):
             `@` inherited from the old Elasticsearch implementation):
                 {'timestamp': {'from': <iso8601-date>, 'to': <iso8601-date>}}
         :type range_filters: dict(str, str)
+        :param _include:
+            Projection requested. Only the columns needed to build the
+            requested fields are selected, and the deployments table is only
+            joined if needed.
+        :type _include: list(str)
         :returns:
             A SQL query that returns the events found that match the conditions
             passed as arguments.
@@ -201,52 +288,58 @@ class Events(SecuredResource):
             raise manager_exceptions.BadParametersError(
                 'At least `type=cloudify_event` filter is expected')
 
+        selected_columns = Events._get_selected_columns(_include, sort)
+        join_deployment = (
+            'deployment_id' in selected_columns or
+            'deployment_id' in filters
+        )
+
+        event_columns = {
+            'timestamp': Event.timestamp.label('timestamp'),
+            'deployment_id': Deployment.id.label('deployment_id'),
+            'message': Event.message,
+            'message_code': Event.message_code,
+            'event_type': Event.event_type,
+            'operation': Event.operation,
+            'node_id': Event.node_id,
+            'logger': literal_column('NULL').label('logger'),
+            'level': literal_column('NULL').label('level'),
+            'type': literal_column("'cloudify_event'").label('type'),
+        }
         query = (
             db.session.query(
-                Event.timestamp.label('timestamp'),
-                Deployment.id.label('deployment_id'),
-                Event.message,
-                Event.message_code,
-                Event.event_type,
-                Event.operation,
-                Event.node_id,
-                literal_column('NULL').label('logger'),
-                literal_column('NULL').label('level'),
-                literal_column("'cloudify_event'").label('type'),
-            )
-            .filter(
-                Event._execution_fk == Execution._storage_id,
-                Execution._deployment_fk == Deployment._storage_id,
+                *[event_columns[column] for column in selected_columns]
             )
+            .filter(*Events._get_join_clauses(Event, join_deployment))
         )
 
         query = Events._apply_filters(query, filters)
         query = Events._apply_range_filters(query, Event, range_filters)
 
         if 'cloudify_log' in filters['type']:
+            log_columns = {
+                'timestamp': Log.timestamp.label('timestamp'),
+                'deployment_id': Deployment.id.label('deployment_id'),
+                'message': Log.message,
+                'message_code': literal_column('NULL').label('message_code'),
+                'event_type': literal_column('NULL').label('event_type'),
+                'operation': Log.operation,
+                'node_id': Log.node_id,
+                'logger': Log.logger,
+                'level': Log.level,
+                'type': literal_column("'cloudify_log'").label('type'),
+            }
             logs_query = (
                 db.session.query(
-                    Log.timestamp.label('timestamp'),
-                    Deployment.id.label('deployment_id'),
-                    Log.message,
-                    literal_column('NULL').label('message_code'),
-                    literal_column('NULL').label('event_type'),
-                    Log.operation,
-                    Log.node_id,
-                    Log.logger,
-                    Log.level,
-                    literal_column("'cloudify_log'").label('type'),
-                )
-                .filter(
-                    Log._execution_fk == Execution._storage_id,
-                    Execution._deployment_fk == Deployment._storage_id,
+                    *[log_columns[column] for column in selected_columns]
                 )
+                .filter(*Events._get_join_clauses(Log, join_deployment))
             )
             logs_query = Events._apply_filters(logs_query, filters)
             logs_query = Events._apply_range_filters(
                 logs_query, Log, range_filters)
 
-            query = query.union(logs_query)
+            query = query.union_all(logs_query)
 
         query = Events._apply_sort(query, sort)
         query = (
@@ -285,7 +378,9 @@ class Events(SecuredResource):
         :type range_filters: dict(str, str)
         :returns:
             A SQL query that returns the number of events found that match the
-            conditions passed as arguments.
+            conditions passed as arguments. Unless range filters are used, the
+            per-execution event counters are summed instead of counting the
+            events.
         :rtype: :class:`sqlalchemy.orm.query.Query`
 
         """
@@ -297,12 +392,21 @@ class Events(SecuredResource):
             raise manager_exceptions.BadParametersError(
                 'At least `type=cloudify_event` filter is expected')
 
+        join_deployment = 'deployment_id' in filters
+        if not range_filters:
+            count = EventCounts.events
+            if 'cloudify_log' in filters['type']:
+                count += EventCounts.logs
+            query = (
+                db.session.query(func.coalesce(func.sum(count), 0))
+                .filter(*Events._get_join_clauses(
+                    EventCounts, join_deployment))
+            )
+            return Events._apply_filters(query, filters)
+
         events_query = (
             db.session.query(func.count('*').label('count'))
-            .filter(
-                Event._execution_fk == Execution._storage_id,
-                Execution._deployment_fk == Deployment._storage_id,
-            )
+            .filter(*Events._get_join_clauses(Event, join_deployment))
         )
 
         events_query = Events._apply_filters(events_query, filters)
@@ -312,10 +416,7 @@ class Events(SecuredResource):
         if 'cloudify_log' in filters['type']:
             logs_query = (
                 db.session.query(func.count('*').label('count'))
-                .filter(
-                    Log._execution_fk == Execution._storage_id,
-                    Execution._deployment_fk == Deployment._storage_id,
-                )
+                .filter(*Events._get_join_clauses(Log, join_deployment))
             )
             logs_query = Events._apply_filters(logs_query, filters)
             logs_query = Events._apply_range_filters(
@@ -351,37 +452,41 @@ class Events(SecuredResource):
             attr: getattr(sql_event, attr)
             for attr in sql_event.keys()
         }
-        event['@timestamp'] = event['timestamp']
+        # Some of the columns might be missing, when a projection was used
+        if 'timestamp' in event:
+            event['@timestamp'] = event['timestamp']
 
-        event['message'] = {
-            'text': event['message']
-        }
+        if 'message' in event:
+            event['message'] = {
+                'text': event['message']
+            }
 
         context_fields = [
             'deployment_id',
             'operation',
             'node_id',
         ]
-        event['context'] = {
-            field: event[field]
-            for field in context_fields
-        }
-        for field in context_fields:
-            del event[field]
+        if any(field in event for field in context_fields):
+            event['context'] = {
+                field: event.pop(field)
+                for field in context_fields
+                if field in event
+            }
 
         if event['type'] == 'cloudify_event':
-            event['message']['arguments'] = None
-            del event['logger']
-            del event['level']
+            if 'message' in event:
+                event['message']['arguments'] = None
+            event.pop('logger', None)
+            event.pop('level', None)
         elif event['type'] == 'cloudify_log':
-            del event['event_type']
+            event.pop('event_type', None)
 
         for key, value in event.items():
             if isinstance(value, datetime):
                 event[key] = '{}Z'.format(value.isoformat()[:-3])
 
-        # Keep only keys passed in the _include request argument
-        # TBD: Do the projection at the database level
+        # Keep only keys passed in the _include request argument (columns
+        # that were selected only to build other fields or for sorting)
         if _include is not None:
             event = dicttoolz.keyfilter(lambda key: key in _include, event)
 
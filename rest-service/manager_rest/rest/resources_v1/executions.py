@@ -98,6 +98,9 @@ class Executions(SecuredResource):
         force = verify_and_convert_bool(
             'force',
             request_dict.get('force', 'false'))
+        queue = verify_and_convert_bool(
+            'queue',
+            request_dict.get('queue', 'false'))
 
         deployment_id = request_dict['deployment_id']
         workflow_id = request_dict['workflow_id']
@@ -112,7 +115,7 @@ class Executions(SecuredResource):
         execution = get_resource_manager().execute_workflow(
             deployment_id, workflow_id, parameters=parameters,
             allow_custom_parameters=allow_custom_parameters, force=force,
-            bypass_maintenance=bypass_maintenance)
+            bypass_maintenance=bypass_maintenance, queue=queue)
         return execution, 201
 
 
@@ -202,8 +205,12 @@ class ExecutionsId(SecuredResource):
         """
         request_dict = get_json_and_verify_params({'status'})
 
-        return get_resource_manager().update_execution_status(
+        resource_manager = get_resource_manager()
+        execution = resource_manager.update_execution_status(
             execution_id,
             request_dict['status'],
             request_dict.get('error', '')
         )
+        response = execution.to_response()
+        resource_manager.handle_execution_end(execution)
+        return response
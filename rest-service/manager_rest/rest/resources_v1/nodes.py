@@ -38,6 +38,7 @@ from manager_rest.storage import (
     get_storage_manager,
     models,
 )
+from manager_rest.utils import merge_patch
 
 
 class Nodes(SecuredResource):
@@ -189,6 +190,15 @@ class NodeInstancesId(SecuredResource):
                      'allowMultiple': False,
                      'dataType': 'dict',
                      'paramType': 'body'},
+                    {'name': 'runtime_properties_patch',
+                     'description': 'a JSON merge patch (RFC 7396) to apply '
+                                    'to the runtime properties, instead of '
+                                    'replacing them: null values remove '
+                                    'keys, and dicts are merged recursively',
+                     'required': False,
+                     'allowMultiple': False,
+                     'dataType': 'dict',
+                     'paramType': 'body'},
                     {'name': 'state',
                      'description': "the new node's state. If omitted, "
                                     "the state wont be updated",
@@ -212,20 +222,37 @@ class NodeInstancesId(SecuredResource):
                 'field and optionally "runtimeProperties" and/or "state" '
                 'fields')
 
+        runtime_properties_patch = request_dict.get(
+            'runtime_properties_patch')
+        if runtime_properties_patch is not None:
+            if 'runtime_properties' in request_dict:
+                raise manager_exceptions.BadParametersError(
+                    '"runtime_properties" and "runtime_properties_patch" '
+                    'are mutually exclusive')
+            if not isinstance(runtime_properties_patch, dict):
+                raise manager_exceptions.BadParametersError(
+                    '"runtime_properties_patch" is expected to be a map')
+
+        sm = get_storage_manager()
+        instance = sm.get(models.NodeInstance, node_instance_id)
         # Added for backwards compatibility with older client versions that
-        # had version=0 by default
-        version = request_dict['version'] or 1
+        # had version=0 by default: the update is based on the current version
+        version = request_dict['version'] or instance.version
+        if version != instance.version:
+            raise manager_exceptions.ConflictError(
+                'Node instance `{0}` is at version {1}, but the update is '
+                'based on version {2}'.format(
+                    node_instance_id, instance.version, version))
 
-        instance = get_storage_manager().get(
-            models.NodeInstance,
-            node_instance_id,
-            locking=True
-        )
         # Only update if new values were included in the request
-        instance.runtime_properties = request_dict.get(
-            'runtime_properties',
-            instance.runtime_properties
-        )
-        instance.state = request_dict.get('state', instance.state)
-        instance.version = version + 1
-        return get_storage_manager().update(instance)
+        values = {}
+        if runtime_properties_patch is not None:
+            # The update is only written if the instance wasn't updated since
+            # it was read, so concurrent patches don't override each other
+            values['runtime_properties'] = merge_patch(
+                instance.runtime_properties, runtime_properties_patch)
+        elif 'runtime_properties' in request_dict:
+            values['runtime_properties'] = request_dict['runtime_properties']
+        if 'state' in request_dict:
+            values['state'] = request_dict['state']
+        return sm.update_versioned(instance, version, values)
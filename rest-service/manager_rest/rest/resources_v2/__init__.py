@@ -26,7 +26,11 @@ from .deployments import ( # noqa
 
 from .executions import Executions # noqa
 
-from .events import Events # noqa
+from .events import ( # noqa
+    Events,
+    EventsBulk,
+    EventsTail,
+)
 
 from .nodes import ( # noqa
     Nodes,
@@ -56,7 +56,8 @@ class Deployments(resources_v1.Deployments):
             filters=filters,
             pagination=pagination,
             sort=sort,
-            all_tenants=all_tenants
+            all_tenants=all_tenants,
+            stream=True
         )
 
 
@@ -14,14 +14,32 @@
 #  * limitations under the License.
 #
 
+import json
+import time
+
+from dateutil import parser as date_parser
+from flask import current_app, request
+from flask_restful import types
+from flask_restful.reqparse import Argument
 from flask_restful_swagger import swagger
-from sqlalchemy import bindparam
+from sqlalchemy import (
+    and_,
+    asc,
+    bindparam,
+    literal,
+    literal_column,
+    or_,
+    true,
+    type_coerce,
+)
 
-from manager_rest import manager_exceptions
+from manager_rest import config, manager_exceptions
 from manager_rest.rest import (
     resources_v1,
     rest_decorators,
 )
+from manager_rest.rest.rest_utils import get_args_and_verify_arguments
+from manager_rest.security import SecuredResource
 from manager_rest.storage.models_base import db
 from manager_rest.storage.resource_models import (
     Deployment,
@@ -29,7 +47,7 @@ from manager_rest.storage.resource_models import (
     Event,
     Log,
 )
-from manager_rest.storage import ListResult
+from manager_rest.storage import ListResult, get_storage_manager
 
 
 class Events(resources_v1.Events):
@@ -58,7 +76,7 @@ class Events(resources_v1.Events):
         """List events using a SQL backend.
 
         :param _include:
-            Projection used to get records from database (not currently used)
+            Projection used to get records from database
         :type _include: list(str)
         :param filters:
             Filter selection.
@@ -100,12 +118,13 @@ class Events(resources_v1.Events):
         total = count_query.params(**params).scalar()
 
         select_query = self._build_select_query(
-            filters, pagination, sort, range_filters)
+            filters, pagination, sort, range_filters, _include)
 
-        results = [
+        results = (
             self._map_event_to_es(_include, event)
-            for event in select_query.params(**params).all()
-        ]
+            for event in select_query.params(**params).yield_per(
+                config.instance.list_stream_batch_size)
+        )
 
         metadata = {
             'pagination': dict(pagination, total=total)
@@ -163,7 +182,7 @@ class Events(resources_v1.Events):
                 .filter(Log._execution_fk.in_(executions_query))
                 .params(**params)
             )
-            total += delete_log_query.delete('fetch')
+            total += delete_log_query.delete(synchronize_session=False)
 
         metadata = {
             'pagination': dict(pagination, total=total)
@@ -175,3 +194,419 @@ class Events(resources_v1.Events):
         # We don't really want to return all of the deleted events,
         # so it's a bit of a hack to return the deleted element count.
         return ListResult([total], metadata)
+
+
+class EventsTail(resources_v1.Events):
+
+    """Events tail resource.
+
+    Used to follow the events and logs of an execution while it's running.
+    Instead of an offset, every call passes the high-water mark returned by
+    the previous one, and only newer records are returned.
+
+    """
+
+    EVENT_TYPES = ['cloudify_event', 'cloudify_log']
+
+    @swagger.operation(
+        responseclass='List[Event]',
+        nickname="tail events",
+        notes='Returns the events of an execution that are newer than the '
+              'high-water mark passed, optionally waiting for new ones'
+    )
+    @rest_decorators.exceptions_handled
+    @rest_decorators.marshal_events
+    @rest_decorators.paginate
+    def get(self, pagination=None, **kwargs):
+        """Get the events of an execution newer than a high-water mark.
+
+        Events and logs are ordered by timestamp, type and storage id, which
+        is the high-water mark returned in the `tail` section of the
+        response metadata. Passing it back as the `since`, `since_type` and
+        `since_id` arguments returns only the records that follow it.
+
+        When a `timeout` (in seconds) is passed and there are no new records,
+        the request blocks until new ones are stored or the timeout expires.
+
+        :param pagination:
+            Only `size` is used, to limit the number of records returned
+        :type pagination: dict(str, int)
+        :returns: Events found in the SQL backend
+        :rtype: :class:`manager_rest.storage.storage_manager.ListResult`
+
+        """
+        args = get_args_and_verify_arguments([
+            Argument('execution_id', type=str, required=True),
+            Argument('include_logs', type=types.boolean, default=False),
+            Argument('since', type=str),
+            Argument('since_type', type=str, default='cloudify_event'),
+            Argument('since_id', type=int, default=0),
+            Argument('timeout', type=int, default=0),
+        ])
+        mark = self._get_mark(args)
+        if not 0 <= args.timeout <= config.instance.events_tail_max_timeout:
+            raise manager_exceptions.BadParametersError(
+                '`timeout` is expected to be between 0 and {0}'.format(
+                    config.instance.events_tail_max_timeout))
+        size = pagination.get('size', self.DEFAULT_SEARCH_SIZE)
+
+        execution = get_storage_manager().get(Execution, args.execution_id)
+        query = self._build_tail_query(
+            execution, args.include_logs, mark, size)
+
+        deadline = time.time() + args.timeout
+        while True:
+            results = query.all()
+            remaining = deadline - time.time()
+            if results or remaining <= 0:
+                break
+            # Don't keep a transaction open while waiting for new records
+            db.session.rollback()
+            time.sleep(
+                min(config.instance.events_tail_poll_interval, remaining))
+
+        events = []
+        for result in results:
+            mark = (
+                result.tail_timestamp.isoformat(),
+                result.type,
+                result.storage_id,
+            )
+            event = self._map_event_to_es(None, result)
+            del event['tail_timestamp']
+            del event['storage_id']
+            events.append(event)
+
+        metadata = {
+            'pagination': {
+                'size': size,
+                'offset': 0,
+                'total': len(events),
+            },
+            'tail': dict(zip(['since', 'since_type', 'since_id'], mark))
+            if mark else None,
+        }
+        return ListResult(events, metadata)
+
+    @staticmethod
+    def _get_mark(args):
+        """Get the high-water mark passed in the request arguments.
+
+        :returns: (timestamp, type, storage id), or None if not passed
+        :rtype: tuple
+
+        """
+        if not args.since:
+            return None
+        try:
+            date_parser.parse(args.since)
+        except (ValueError, OverflowError):
+            raise manager_exceptions.BadParametersError(
+                '`since` is expected to be a timestamp, got {0}'.format(
+                    args.since))
+        if args.since_type not in EventsTail.EVENT_TYPES:
+            raise manager_exceptions.BadParametersError(
+                '`since_type` is expected to be one of {0}'.format(
+                    ', '.join(EventsTail.EVENT_TYPES)))
+        return args.since, args.since_type, args.since_id
+
+    @staticmethod
+    def _build_tail_query(execution, include_logs, mark, size):
+        """Build the query used to get the records following a mark.
+
+        The execution's storage id is used directly, so no joins are needed,
+        and every half of the UNION is driven by the index on
+        (_execution_fk, timestamp).
+
+        :param execution: Execution to get the events of
+        :type execution:
+            :class:`manager_rest.storage.resource_models.Execution`
+        :param include_logs: Whether logs should be returned as well
+        :type include_logs: bool
+        :param mark: High-water mark, as returned by :meth:`._get_mark`
+        :type mark: tuple
+        :param size: Maximal number of records to return
+        :type size: int
+        :returns: A SQL query that returns the records following the mark
+        :rtype: :class:`sqlalchemy.orm.query.Query`
+
+        """
+        deployment_id = literal(execution.deployment_id, db.Text)
+        query = (
+            db.session.query(
+                Event.timestamp.label('timestamp'),
+                deployment_id.label('deployment_id'),
+                Event.message,
+                Event.message_code,
+                Event.event_type,
+                Event.operation,
+                Event.node_id,
+                literal_column('NULL').label('logger'),
+                literal_column('NULL').label('level'),
+                literal_column("'cloudify_event'").label('type'),
+                Event._storage_id.label('storage_id'),
+                type_coerce(Event.timestamp, db.DateTime)
+                .label('tail_timestamp'),
+            )
+            .filter(
+                Event._execution_fk == execution._storage_id,
+                EventsTail._after_mark(Event, 'cloudify_event', mark),
+            )
+        )
+
+        if include_logs:
+            logs_query = (
+                db.session.query(
+                    Log.timestamp.label('timestamp'),
+                    deployment_id.label('deployment_id'),
+                    Log.message,
+                    literal_column('NULL').label('message_code'),
+                    literal_column('NULL').label('event_type'),
+                    Log.operation,
+                    Log.node_id,
+                    Log.logger,
+                    Log.level,
+                    literal_column("'cloudify_log'").label('type'),
+                    Log._storage_id.label('storage_id'),
+                    type_coerce(Log.timestamp, db.DateTime)
+                    .label('tail_timestamp'),
+                )
+                .filter(
+                    Log._execution_fk == execution._storage_id,
+                    EventsTail._after_mark(Log, 'cloudify_log', mark),
+                )
+            )
+            query = query.union_all(logs_query)
+
+        return (
+            query
+            .order_by(
+                asc('tail_timestamp'),
+                asc('type'),
+                asc('storage_id'),
+            )
+            .limit(size)
+        )
+
+    @staticmethod
+    def _after_mark(model, event_type, mark):
+        """Get the condition that matches the records following a mark.
+
+        Records are ordered by (timestamp, type, storage id), and the type is
+        the same for all the records in a table, so it's resolved here.
+
+        :param model: Model to filter
+        :type model:
+            :class:`manager_rest.storage.resource_models.Event`
+            :class:`manager_rest.storage.resource_models.Log`
+        :param event_type: Type of the records stored in the model's table
+        :type event_type: str
+        :param mark: High-water mark, as returned by :meth:`._get_mark`
+        :type mark: tuple
+        :returns: Condition to filter the model's query by
+        :rtype: :class:`sqlalchemy.sql.elements.ClauseElement`
+
+        """
+        if mark is None:
+            return true()
+        since, since_type, since_id = mark
+        if event_type > since_type:
+            return model.timestamp >= since
+        if event_type < since_type:
+            return model.timestamp > since
+        return or_(
+            model.timestamp > since,
+            and_(model.timestamp == since, model._storage_id > since_id),
+        )
+
+
+class EventsBulk(SecuredResource):
+
+    """Events bulk ingestion resource.
+
+    Used by producers to store batches of events and logs, instead of
+    inserting them one by one.
+
+    """
+
+    @swagger.operation(
+        nickname="bulk store events",
+        notes='Stores a newline-delimited JSON batch of events and logs'
+    )
+    @rest_decorators.exceptions_handled
+    def post(self):
+        """Store a batch of events and logs.
+
+        The request body holds one JSON object per line, using the same
+        format as the one returned when listing events, e.g.:
+            {"type": "cloudify_log", "timestamp": "...", "level": "info",
+             "logger": "...", "message": {"text": "..."},
+             "context": {"execution_id": "...", "node_id": "..."}}
+
+        The executions of the whole batch are resolved with a single query,
+        and the events and logs are stored with a single multi-row INSERT
+        each.
+
+        :returns: The number of events and logs stored, and the throughput
+        :rtype: dict
+
+        """
+        started_at = time.time()
+        items = self._parse_batch(request.get_data())
+
+        execution_ids = set(self._get_execution_id(item) for item in items)
+        executions = self._get_execution_storage_ids(execution_ids)
+
+        events, logs = [], []
+        for item in items:
+            execution_fk = executions[self._get_execution_id(item)]
+            if item.get('type') == 'cloudify_log':
+                logs.append(self._get_log_row(item, execution_fk))
+            else:
+                events.append(self._get_event_row(item, execution_fk))
+
+        if events:
+            db.session.execute(Event.__table__.insert().values(events))
+        if logs:
+            db.session.execute(Log.__table__.insert().values(logs))
+        db.session.commit()
+
+        duration = time.time() - started_at
+        rows_per_second = len(items) / duration if duration else None
+        current_app.logger.debug(
+            'Stored {0} events and {1} logs in {2:.3f} seconds'.format(
+                len(events), len(logs), duration))
+        return {
+            'events': len(events),
+            'logs': len(logs),
+            'duration': duration,
+            'rows_per_second': rows_per_second,
+        }, 201
+
+    @staticmethod
+    def _parse_batch(data):
+        """Parse a newline-delimited JSON batch.
+
+        :param data: Request body
+        :type data: str
+        :returns: The items of the batch
+        :rtype: list(dict)
+
+        """
+        items = []
+        for line_number, line in enumerate(data.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise manager_exceptions.BadParametersError(
+                    'Invalid JSON in line {0}: {1}'.format(line_number, e))
+            if not isinstance(item, dict) or 'timestamp' not in item:
+                raise manager_exceptions.BadParametersError(
+                    'Line {0} is expected to be an object with a '
+                    '`timestamp`'.format(line_number))
+            EventsBulk._validate_item(item, line_number)
+            if not EventsBulk._get_execution_id(item):
+                raise manager_exceptions.BadParametersError(
+                    'Line {0} is missing an `execution_id`'.format(
+                        line_number))
+            items.append(item)
+
+        if not items:
+            raise manager_exceptions.BadParametersError(
+                'At least a single event is expected')
+        max_batch_size = config.instance.events_bulk_max_batch_size
+        if len(items) > max_batch_size:
+            raise manager_exceptions.BadParametersError(
+                'Batches are limited to {0} events, got {1}'.format(
+                    max_batch_size, len(items)))
+        return items
+
+    @staticmethod
+    def _validate_item(item, line_number):
+        """Validate the fields of a batch item that are stored as is.
+
+        :param item: Batch item
+        :type item: dict
+        :param line_number: Line of the item in the batch
+        :type line_number: int
+
+        """
+        timestamp = item['timestamp']
+        try:
+            if not isinstance(timestamp, basestring):
+                raise ValueError(timestamp)
+            date_parser.parse(timestamp)
+        except (ValueError, OverflowError):
+            raise manager_exceptions.BadParametersError(
+                'Line {0}: `timestamp` is expected to be a timestamp, '
+                'got {1}'.format(line_number, timestamp))
+        if not isinstance(item.get('context', {}), dict):
+            raise manager_exceptions.BadParametersError(
+                'Line {0}: `context` is expected to be an object, '
+                'got {1}'.format(line_number, item['context']))
+        event_type = item.get('type', 'cloudify_event')
+        if event_type not in EventsTail.EVENT_TYPES:
+            raise manager_exceptions.BadParametersError(
+                'Line {0}: `type` is expected to be one of {1}, '
+                'got {2}'.format(line_number,
+                                 ', '.join(EventsTail.EVENT_TYPES),
+                                 event_type))
+
+    @staticmethod
+    def _get_execution_id(item):
+        return item.get('context', {}).get('execution_id')
+
+    @staticmethod
+    def _get_execution_storage_ids(execution_ids):
+        """Get the storage ids of the executions of the current tenant.
+
+        :param execution_ids: Execution ids
+        :type execution_ids: set(str)
+        :returns: Storage id by execution id
+        :rtype: dict(str, int)
+
+        """
+        tenant = get_storage_manager().current_tenant
+        executions = dict(
+            db.session.query(Execution.id, Execution._storage_id)
+            .filter(
+                Execution.id.in_(execution_ids),
+                Execution._tenant_id == tenant.id,
+            )
+        )
+        missing = execution_ids - set(executions)
+        if missing:
+            raise manager_exceptions.NotFoundError(
+                'Requested `Execution` with ID(s) `{0}` was not found'.format(
+                    ', '.join(sorted(missing))))
+        return executions
+
+    @staticmethod
+    def _get_common_fields(item, execution_fk):
+        message = item.get('message')
+        if isinstance(message, dict):
+            message = message.get('text')
+        context = item.get('context', {})
+        return {
+            'timestamp': item['timestamp'],
+            'message': message,
+            'message_code': item.get('message_code'),
+            'operation': context.get('operation'),
+            'node_id': context.get('node_id'),
+            '_execution_fk': execution_fk,
+        }
+
+    @staticmethod
+    def _get_event_row(item, execution_fk):
+        row = EventsBulk._get_common_fields(item, execution_fk)
+        row['event_type'] = item.get('event_type')
+        return row
+
+    @staticmethod
+    def _get_log_row(item, execution_fk):
+        row = EventsBulk._get_common_fields(item, execution_fk)
+        row['logger'] = item.get('logger')
+        row['level'] = item.get('level')
+        return row
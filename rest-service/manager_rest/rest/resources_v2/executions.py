@@ -73,5 +73,6 @@ class Executions(resources_v1.Executions):
             pagination=pagination,
             sort=sort,
             is_include_system_workflows=is_include_system_workflows,
-            include=_include
+            include=_include,
+            stream=True
         )
@@ -55,7 +55,8 @@ class Nodes(resources_v1.Nodes):
             pagination=pagination,
             filters=filters,
             sort=sort,
-            all_tenants=all_tenants
+            all_tenants=all_tenants,
+            stream=True
         )
 
 
@@ -88,5 +89,6 @@ class NodeInstances(resources_v1.NodeInstances):
             filters=filters,
             pagination=pagination,
             sort=sort,
-            all_tenants=all_tenants
+            all_tenants=all_tenants,
+            stream=True
         )
@@ -79,7 +79,10 @@ class Plugins(SecuredResource):
               'is: {archive_type}. The archive may be submitted via either'
               ' URL or by direct upload. Archive wheels must contain a '
               'module.json file containing required metadata for the plugin '
-              'usage.'
+              'usage. The plugin is installed by a system workflow, which '
+              'is only started by this request: the plugin is returned '
+              'before it is installed, and is removed if the installation '
+              'fails.'
         .format(archive_type='tar.gz'),
         parameters=[{'name': 'plugin_archive_url',
                      'description': 'url of a plugin archive file',
@@ -106,11 +109,6 @@ class Plugins(SecuredResource):
             str(uuid4()))
         try:
             get_resource_manager().install_plugin(plugin)
-        except manager_exceptions.ExecutionTimeout:
-            tp, ex, tb = sys.exc_info()
-            raise manager_exceptions.PluginInstallationTimeout(
-                'Timed out during plugin installation. ({0}: {1})'
-                .format(tp.__name__, ex)), None, tb
         except Exception:
             get_resource_manager().remove_plugin(
                 plugin_id=plugin.id, force=True)
@@ -180,7 +178,18 @@ class PluginsId(SecuredResource):
     @swagger.operation(
         responseClass=models.Plugin,
         nickname="deleteById",
-        notes="deletes a plugin according to its ID."
+        notes="deletes a plugin according to its ID. The plugin is "
+              "uninstalled by a system workflow, and is only deleted once "
+              "it ends. 202 is returned meanwhile if _async is set.",
+        parameters=[{'name': '_async',
+                     'description': 'Return 202 if the deletion waits for '
+                                    'a system workflow to end, instead of '
+                                    '200.',
+                     'required': False,
+                     'allowMultiple': False,
+                     'dataType': 'boolean',
+                     'defaultValue': False,
+                     'paramType': 'query'}]
     )
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(models.Plugin)
@@ -188,5 +197,6 @@ class PluginsId(SecuredResource):
         """
         Delete plugin by ID
         """
-        return get_resource_manager().remove_plugin(plugin_id=plugin_id,
-                                                    force=False)
+        plugin = get_resource_manager().remove_plugin(plugin_id=plugin_id,
+                                                      force=False)
+        return plugin, rest_utils.get_deletion_status_code(plugin)
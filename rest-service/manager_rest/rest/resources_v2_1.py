@@ -13,7 +13,6 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 #
-import os
 import sys
 
 from flask import request
@@ -30,7 +29,7 @@ from manager_rest.resource_manager import get_resource_manager
 from manager_rest.constants import (MAINTENANCE_MODE_ACTIVATED,
                                     MAINTENANCE_MODE_ACTIVATING,
                                     MAINTENANCE_MODE_DEACTIVATED)
-from manager_rest.maintenance import (get_maintenance_file_path,
+from manager_rest.maintenance import (maintenance_state,
                                       prepare_maintenance_dict,
                                       get_running_executions)
 from manager_rest.manager_exceptions import BadParametersError
@@ -39,7 +38,9 @@ from manager_rest.upload_manager import \
     UploadedBlueprintsDeploymentUpdateManager
 from manager_rest.deployment_update.manager import \
     get_deployment_updates_manager
-from .rest_utils import verify_and_convert_bool, get_json_and_verify_params
+from .rest_utils import (verify_and_convert_bool,
+                         get_json_and_verify_params,
+                         get_deletion_status_code)
 from .responses_v2_1 import MaintenanceMode as MaintenanceModeResponse
 from . import resources_v1, rest_decorators, resources_v2
 
@@ -48,10 +49,8 @@ class MaintenanceMode(SecuredResource):
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(MaintenanceModeResponse)
     def get(self, **_):
-        maintenance_file_path = get_maintenance_file_path()
-        if os.path.isfile(maintenance_file_path):
-            state = utils.read_json_file(maintenance_file_path)
-
+        state = maintenance_state.get()
+        if state:
             if state['status'] == MAINTENANCE_MODE_ACTIVATED:
                 return state
             if state['status'] == MAINTENANCE_MODE_ACTIVATING:
@@ -70,11 +69,9 @@ class MaintenanceModeAction(SecuredResource):
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(MaintenanceModeResponse)
     def post(self, maintenance_action, **_):
-        maintenance_file_path = get_maintenance_file_path()
-
         if maintenance_action == 'activate':
-            if os.path.isfile(maintenance_file_path):
-                state = utils.read_json_file(maintenance_file_path)
+            state = maintenance_state.get()
+            if state:
                 return state, 304
 
             now = utils.get_formatted_timestamp()
@@ -88,22 +85,22 @@ class MaintenanceModeAction(SecuredResource):
             status = MAINTENANCE_MODE_ACTIVATING \
                 if remaining_executions else MAINTENANCE_MODE_ACTIVATED
             activated_at = '' if remaining_executions else now
-            utils.mkdirs(config.instance.maintenance_folder)
             new_state = prepare_maintenance_dict(
                 status=status,
                 activation_requested_at=now,
                 activated_at=activated_at,
                 remaining_executions=remaining_executions,
                 requested_by=user)
-            utils.write_dict_to_json_file(maintenance_file_path, new_state)
+            maintenance_state.set(new_state)
 
             return new_state
 
         if maintenance_action == 'deactivate':
-            if not os.path.isfile(maintenance_file_path):
+            if not maintenance_state.get():
                 return prepare_maintenance_dict(
                         MAINTENANCE_MODE_DEACTIVATED), 304
-            os.remove(maintenance_file_path)
+            maintenance_state.remove()
+            get_resource_manager().start_queued_executions()
             return prepare_maintenance_dict(MAINTENANCE_MODE_DEACTIVATED)
 
         valid_actions = ['activate', 'deactivate']
@@ -274,6 +271,73 @@ class NodeInstances(resources_v2.NodeInstances):
         models.NodeInstance
     )
 
+    @swagger.operation(
+        nickname="patchNodeInstances",
+        notes="Update several node instances in a single transaction. "
+              "Expecting the request body to be a list of dictionaries, "
+              "each containing the instance's 'id' and 'version' (used for "
+              "optimistic locking), and optionally 'state' (string), and "
+              "either 'runtime_properties' (dictionary) or "
+              "'runtime_properties_patch' (a JSON merge patch). Returns the "
+              "status of each update: updated, conflict (if the version "
+              "doesn't match the current one) or not_found",
+        consumes=["application/json"]
+    )
+    @rest_decorators.exceptions_handled
+    def patch(self, **kwargs):
+        """
+        Update several node instances
+        """
+        updates = get_json_and_verify_params()
+        self._validate_updates(updates)
+        results = get_resource_manager().update_node_instances(updates)
+        return {'items': results}, 200
+
+    @staticmethod
+    def _validate_updates(updates):
+        if not isinstance(updates, list) or not updates:
+            raise BadParametersError(
+                'Request body is expected to be a non-empty list of node '
+                'instance updates')
+        max_batch_size = config.instance.node_instances_bulk_max_batch_size
+        if len(updates) > max_batch_size:
+            raise BadParametersError(
+                'Batches are limited to {0} node instances, got {1}'.format(
+                    max_batch_size, len(updates)))
+
+        ids = set()
+        for index, update in enumerate(updates):
+            if not isinstance(update, dict):
+                raise BadParametersError(
+                    'Update {0} is expected to be a map'.format(index))
+            if not isinstance(update.get('id'), basestring):
+                raise BadParametersError(
+                    'Update {0} is missing an `id`'.format(index))
+            if update['id'] in ids:
+                raise BadParametersError(
+                    'Node instance `{0}` is updated more than once'.format(
+                        update['id']))
+            ids.add(update['id'])
+            version = update.get('version')
+            if not isinstance(version, int) or isinstance(version, bool):
+                raise BadParametersError(
+                    'Update of `{0}` is expected to have an integer '
+                    '`version`'.format(update['id']))
+            if not isinstance(update.get('state', ''), basestring):
+                raise BadParametersError(
+                    '`state` of `{0}` is expected to be a string'.format(
+                        update['id']))
+            if 'runtime_properties' in update and \
+                    'runtime_properties_patch' in update:
+                raise BadParametersError(
+                    '"runtime_properties" and "runtime_properties_patch" '
+                    'of `{0}` are mutually exclusive'.format(update['id']))
+            for field in ('runtime_properties', 'runtime_properties_patch'):
+                if not isinstance(update.get(field, {}), dict):
+                    raise BadParametersError(
+                        '`{0}` of `{1}` is expected to be a map'.format(
+                            field, update['id']))
+
 
 class NodeInstancesId(resources_v1.NodeInstancesId):
 
@@ -293,7 +357,18 @@ class PluginsId(resources_v2.PluginsId):
     @swagger.operation(
         responseClass=models.Plugin,
         nickname="deleteById",
-        notes="deletes a plugin according to its ID."
+        notes="deletes a plugin according to its ID. The plugin is "
+              "uninstalled by a system workflow, and is only deleted once "
+              "it ends. 202 is returned meanwhile if _async is set.",
+        parameters=[{'name': '_async',
+                     'description': 'Return 202 if the deletion waits for '
+                                    'a system workflow to end, instead of '
+                                    '200.',
+                     'required': False,
+                     'allowMultiple': False,
+                     'dataType': 'boolean',
+                     'defaultValue': False,
+                     'paramType': 'query'}]
     )
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(models.Plugin)
@@ -306,23 +381,13 @@ class PluginsId(resources_v2.PluginsId):
             'force', request_dict.get('force', False)
         )
         try:
-            return get_resource_manager().remove_plugin(plugin_id=plugin_id,
-                                                        force=force)
+            plugin = get_resource_manager().remove_plugin(plugin_id=plugin_id,
+                                                          force=force)
         except manager_exceptions.ManagerException:
             raise
-        except manager_exceptions.ExecutionTimeout:
-            tp, ex, tb = sys.exc_info()
-            raise manager_exceptions.PluginInstallationTimeout(
-                'Timed out during plugin un-installation. ({0}: {1})'
-                .format(tp.__name__, ex)), None, tb
         except Exception:
             tp, ex, tb = sys.exc_info()
             raise manager_exceptions.PluginInstallationError(
                 'Failed during plugin un-installation. ({0}: {1})'
                 .format(tp.__name__, ex)), None, tb
-
-
-def write_maintenance_state(state):
-    maintenance_file_path = get_maintenance_file_path()
-    with open(maintenance_file_path, 'w') as f:
-        f.write(state)
+        return plugin, get_deletion_status_code(plugin)
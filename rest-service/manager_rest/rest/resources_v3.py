@@ -29,7 +29,10 @@ from flask import current_app, request
 from . import rest_decorators
 from .responses_v3 import BaseResponse, ResourceID
 from ..security.authentication import authenticator
-from ..security.tenant_authorization import tenant_authorizer
+from ..security.tenant_authorization import (
+    tenant_authorizer,
+    invalidates_authorization_cache
+)
 from .rest_utils import get_json_and_verify_params, set_restart_task
 
 try:
@@ -67,6 +70,7 @@ class Tenants(SecuredMultiTenancyResourceSkipTenantAuth):
 class TenantsId(SecuredMultiTenancyResource):
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(TenantResponse)
+    @invalidates_authorization_cache
     def post(self, tenant_name, multi_tenancy):
         """
         Create a tenant
@@ -83,6 +87,7 @@ class TenantsId(SecuredMultiTenancyResource):
 
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(TenantResponse)
+    @invalidates_authorization_cache
     def delete(self, tenant_name, multi_tenancy):
         """
         Delete a tenant
@@ -93,6 +98,7 @@ class TenantsId(SecuredMultiTenancyResource):
 class TenantUsers(SecuredMultiTenancyResource):
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(TenantResponse)
+    @invalidates_authorization_cache
     def put(self, multi_tenancy):
         """
         Add a user to a tenant
@@ -105,6 +111,7 @@ class TenantUsers(SecuredMultiTenancyResource):
 
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(TenantResponse)
+    @invalidates_authorization_cache
     def delete(self, multi_tenancy):
         """
         Remove a user from a tenant
@@ -119,6 +126,7 @@ class TenantUsers(SecuredMultiTenancyResource):
 class TenantGroups(SecuredMultiTenancyResource):
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(TenantResponse)
+    @invalidates_authorization_cache
     def put(self, multi_tenancy):
         """
         Add a group to a tenant
@@ -132,6 +140,7 @@ class TenantGroups(SecuredMultiTenancyResource):
 
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(TenantResponse)
+    @invalidates_authorization_cache
     def delete(self, multi_tenancy):
         """
         Remove a group from a tenant
@@ -163,6 +172,7 @@ class UserGroups(SecuredMultiTenancyResource):
 
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(GroupResponse)
+    @invalidates_authorization_cache
     def post(self, multi_tenancy):
         """
         Create a group
@@ -185,6 +195,7 @@ class UserGroupsId(SecuredMultiTenancyResource):
 
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(GroupResponse)
+    @invalidates_authorization_cache
     def delete(self, group_name, multi_tenancy):
         """
         Delete a user group
@@ -212,6 +223,7 @@ class Users(SecuredMultiTenancyResource):
 
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(UserResponse)
+    @invalidates_authorization_cache
     def put(self, multi_tenancy):
         """
         Create a user
@@ -229,6 +241,7 @@ class Users(SecuredMultiTenancyResource):
 class UsersId(SecuredMultiTenancyResource):
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(UserResponse)
+    @invalidates_authorization_cache
     def post(self, username, multi_tenancy):
         """
         Set password/role for a certain user
@@ -255,6 +268,7 @@ class UsersId(SecuredMultiTenancyResource):
 
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(UserResponse)
+    @invalidates_authorization_cache
     def delete(self, username, multi_tenancy):
         """
         Delete a user
@@ -265,6 +279,7 @@ class UsersId(SecuredMultiTenancyResource):
 class UserGroupsUsers(SecuredMultiTenancyResource):
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(GroupResponse)
+    @invalidates_authorization_cache
     def put(self, multi_tenancy):
         """
         Add a user to a group
@@ -282,6 +297,7 @@ class UserGroupsUsers(SecuredMultiTenancyResource):
 
     @rest_decorators.exceptions_handled
     @rest_decorators.marshal_with(GroupResponse)
+    @invalidates_authorization_cache
     def delete(self, multi_tenancy):
         """
         Remove a user from a group
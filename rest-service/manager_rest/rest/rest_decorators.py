@@ -23,6 +23,7 @@ from sqlalchemy.util._collections import _LW as sql_alchemy_collection
 from toolz import dicttoolz
 from voluptuous import (
     All,
+    Boolean,
     Coerce,
     Datetime,
     ExactSequence,
@@ -39,7 +40,8 @@ from manager_rest.rest.rest_utils import verify_and_convert_bool
 from manager_rest.storage.models_base import SQLModelBase
 
 from .responses_v2 import ListResponse
-from .rest_utils import skip_nested_marshalling
+from .rest_utils import (skip_nested_marshalling,
+                         make_streaming_list_response)
 
 INCLUDE = 'Include'
 SORT = 'Sort'
@@ -112,6 +114,8 @@ class marshal_with(object):
                 'class variable'.format(type(response_class)))
 
         self.response_class = response_class
+        # Fields per API version, without the version's skipped fields
+        self._fields_by_version = {}
 
     def __call__(self, f):
         @wraps(f)
@@ -129,6 +133,15 @@ class marshal_with(object):
             response = f(*args, **kwargs)
 
             if isinstance(response, ListResponse):
+                if not isinstance(response.items, list):
+                    return make_streaming_list_response(
+                        response.items,
+                        response.metadata,
+                        lambda item: marshal(
+                            self.wrap_with_response_object(item),
+                            fields_to_include
+                        )
+                    )
                 wrapped_items = self.wrap_with_response_object(response.items)
                 response.items = marshal(wrapped_items, fields_to_include)
                 return marshal(response, ListResponse.resource_fields)
@@ -164,9 +177,7 @@ class marshal_with(object):
         return '_include' in request.args and request.args['_include']
 
     def _get_fields_to_include(self):
-        skipped_fields = self._get_skipped_fields()
-        model_fields = {k: v for k, v in self._fields.iteritems()
-                        if k not in skipped_fields}
+        model_fields = self._get_model_fields()
 
         if self._is_include_parameter_in_request():
             include = set(request.args['_include'].split(','))
@@ -184,8 +195,21 @@ class marshal_with(object):
         version = url.split('/api/')[1]
         return version.split('/')[0]
 
-    def _get_skipped_fields(self):
+    def _get_model_fields(self):
+        """Return the response class' fields, without the fields skipped in
+        the request's API version. Computed once per API version
+        """
         api_version = self._get_api_version()
+        try:
+            return self._fields_by_version[api_version]
+        except KeyError:
+            skipped_fields = self._get_skipped_fields(api_version)
+            model_fields = {k: v for k, v in self._fields.iteritems()
+                            if k not in skipped_fields}
+            self._fields_by_version[api_version] = model_fields
+            return model_fields
+
+    def _get_skipped_fields(self, api_version):
         if hasattr(self.response_class, 'skipped_fields'):
             return self.response_class.skipped_fields.get(api_version, [])
         return []
@@ -327,7 +351,11 @@ def marshal_events(func):
     Decorator for marshalling raw event responses
     """
     def marshal_response(*args, **kwargs):
-        return marshal(func(*args, **kwargs), ListResponse.resource_fields)
+        response = func(*args, **kwargs)
+        if not isinstance(response.items, list):
+            return make_streaming_list_response(
+                response.items, response.metadata, lambda item: item)
+        return marshal(response, ListResponse.resource_fields)
     return marshal_response
 
 
@@ -342,6 +370,11 @@ def paginate(func):
     (note that the leading underscore is dropped) if a values was passed in a
     request header. Otherwise, the dictionary will be empty.
 
+    Keyset pagination is used instead of offsets when the `_cursor` parameter
+    is passed. An empty cursor requests the first page, and every page
+    returns the cursor of the next one in its pagination metadata.
+    Passing `_count=false` skips counting the total number of results.
+
     A `voluptuous.error.Invalid` exception will be raised if any of the request
     parameters has an invalid value.
 
@@ -361,6 +394,14 @@ def paginate(func):
                 Range(min=0),
                 msg='`_offset` is expected to be a positive integer',
             ),
+            '_cursor': All(
+                basestring,
+                msg='`_cursor` is expected to be a string',
+            ),
+            '_count': All(
+                Boolean(),
+                msg='`_count` is expected to be <true/false>',
+            ),
         },
         extra=REMOVE_EXTRA,
     )
@@ -12,10 +12,12 @@
 #  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
+import json
 import subprocess
 
-from flask import request, make_response
+from flask import request, make_response, Response, stream_with_context
 from flask_restful.reqparse import RequestParser
+from sqlalchemy import inspect
 
 from contextlib import contextmanager
 
@@ -89,6 +91,19 @@ def convert_to_int(value):
             'invalid parameter, should be int, got: {0}'.format(value))
 
 
+def get_deletion_status_code(instance):
+    """Return 202 if the deletion of `instance` waits for a system workflow
+    to end, and the client asked for it with `_async=true`. Otherwise (and
+    for older clients, which only accept 200) return 200
+    """
+    accepts_pending = verify_and_convert_bool(
+        '_async', request.args.get('_async', 'false'))
+    # Deleted instances are detached from the session once committed
+    if accepts_pending and not inspect(instance).detached:
+        return 202
+    return 200
+
+
 def make_streaming_response(res_id, res_path, content_length, archive_type):
     response = make_response()
     response.headers['Content-Description'] = 'File Transfer'
@@ -102,6 +117,38 @@ def make_streaming_response(res_id, res_path, content_length, archive_type):
     return response
 
 
+def make_streaming_list_response(items, metadata, marshal_item,
+                                 chunk_size=100):
+    """Return a response that writes a list JSON envelope incrementally,
+    marshalling the items one by one while iterating over them
+
+    The items are written before the metadata, so that metadata that's only
+    known once all the items were read (e.g. the next page's cursor) can
+    still be filled in while iterating.
+
+    :param items: An iterable of items (e.g. a `yield_per` query)
+    :param metadata: The envelope's metadata dict
+    :param marshal_item: A function that returns the serializable
+    representation of a single item
+    :param chunk_size: The number of items written at once
+    """
+    def generate():
+        yield '{"items": ['
+        chunk = []
+        separator = ''
+        for item in items:
+            chunk.append(json.dumps(marshal_item(item)))
+            if len(chunk) == chunk_size:
+                yield separator + ', '.join(chunk)
+                chunk, separator = [], ', '
+        if chunk:
+            yield separator + ', '.join(chunk)
+        yield '], "metadata": {0}}}'.format(json.dumps(metadata))
+
+    return Response(stream_with_context(generate()),
+                    mimetype='application/json')
+
+
 def set_restart_task(delay=1):
     cmd = 'sleep {0}; sudo systemctl restart {1}'\
         .format(delay, REST_SERVICE_NAME)
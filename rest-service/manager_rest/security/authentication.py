@@ -13,16 +13,16 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
-from datetime import datetime
 from collections import namedtuple
 
 from flask import current_app
 from flask_security.utils import verify_password, md5
 
-from manager_rest.storage import user_datastore
 from manager_rest.app_logging import raise_unauthorized_user_error
 
 from . import user_handler
+from .login_tracker import login_tracker
+from .tenant_authorization import invalidate_authorization_cache
 
 
 Authorization = namedtuple('Authorization', 'username password')
@@ -49,8 +49,7 @@ class Authentication(object):
                                               'info provided')
             user = self._authenticate_token(token)
 
-        user.last_login_at = datetime.now()
-        user_datastore.commit()
+        login_tracker.record(user)
         return user
 
     def _authenticate_password(self, user, auth):
@@ -90,7 +89,9 @@ class Authentication(object):
     def _ldap_auth(self, user, username, password):
         """Perform LDAP user authentication
         - Authenticate the username and password against the LDAP server
-        - If the user exists in the DB, update its groups and login date
+        - If the user exists in the DB, update its groups and login date.
+          If that changed the user's role or tenants, the authorization
+          caches are invalidated
         - If the user doesn't exist in the DB, create it with data from LDAP
 
         :param user: The DB user object
@@ -101,7 +102,11 @@ class Authentication(object):
         self.logger.debug('Running LDAP authentication')
         self.ldap.authenticate_user(username, password)
         if user:
-            return self.ldap.update_user(user)
+            authorization = (user.role, user.all_tenant_names)
+            user = self.ldap.update_user(user)
+            if (user.role, user.all_tenant_names) != authorization:
+                invalidate_authorization_cache()
+            return user
         else:
             return self.ldap.create_user(username)
 
@@ -0,0 +1,146 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from dateutil import parser as date_parser
+
+from manager_rest import config
+from manager_rest.storage import db, user_datastore
+from manager_rest.storage.models import User
+from manager_rest.storage.storage_manager import sql_errors
+
+
+class LoginTracker(object):
+    """Keep track of users' last login times
+
+    Instead of committing the `users` row on every authenticated request,
+    logins are recorded in memory (per worker), and flushed to the DB by a
+    background thread every `last_login_flush_interval` seconds. A login is
+    only recorded if the stored value is older than
+    `last_login_update_granularity` seconds.
+
+    Logins that weren't flushed yet are lost if the worker exits, which
+    means the stored value may lag behind by up to a single flush interval.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_recorded = {}
+        self._flusher = None
+        self._flusher_pid = None
+
+    @property
+    def pending_flushes(self):
+        """The number of logins waiting to be flushed to the DB
+        """
+        return len(self._pending)
+
+    def record(self, user):
+        """Record a login of `user`, if the last one recorded is older than
+        the configured granularity
+        """
+        now = datetime.now()
+        granularity = timedelta(
+            seconds=config.instance.last_login_update_granularity)
+
+        with self._lock:
+            last_login = self._last_recorded.get(user.id)
+            if last_login is None:
+                last_login = self._parse_login_time(user.last_login_at)
+            if last_login and now - last_login < granularity:
+                return
+            self._last_recorded[user.id] = now
+            if config.instance.last_login_deferred_updates:
+                self._pending[user.id] = now
+
+        if config.instance.last_login_deferred_updates:
+            self._start_flusher()
+        else:
+            user.last_login_at = now
+            user_datastore.commit()
+
+    def flush(self):
+        """Write all the pending logins to the DB in a single transaction
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        current_app.logger.debug(
+            'Flushing {0} pending user logins'.format(len(pending)))
+        try:
+            for user_id, login_time in pending.iteritems():
+                User.query.filter_by(id=user_id).update(
+                    {'last_login_at': login_time},
+                    synchronize_session=False
+                )
+            db.session.commit()
+        except sql_errors as e:
+            db.session.rollback()
+            current_app.logger.error(
+                'Failed flushing user logins: {0}'.format(e))
+            # Keep the logins for the next flush, unless newer ones were
+            # recorded in the meantime
+            with self._lock:
+                for user_id, login_time in pending.iteritems():
+                    self._pending.setdefault(user_id, login_time)
+
+    def _start_flusher(self):
+        """Start the background flushing thread, if it's not running in the
+        current process (e.g. after gunicorn forked the worker)
+        """
+        if config.instance.test_mode:
+            return
+        pid = os.getpid()
+        if self._flusher_pid == pid and self._flusher.is_alive():
+            return
+
+        with self._lock:
+            if self._flusher_pid == pid and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(
+                target=self._flush_periodically,
+                args=(current_app._get_current_object(), ),
+                name='login-tracker-flusher'
+            )
+            self._flusher.daemon = True
+            self._flusher.start()
+            self._flusher_pid = pid
+
+    def _flush_periodically(self, app):
+        while True:
+            time.sleep(config.instance.last_login_flush_interval)
+            with app.app_context():
+                try:
+                    self.flush()
+                finally:
+                    db.session.remove()
+
+    @staticmethod
+    def _parse_login_time(login_time):
+        if not login_time:
+            return None
+        if isinstance(login_time, basestring):
+            login_time = date_parser.parse(login_time)
+        return login_time.replace(tzinfo=None)
+
+
+login_tracker = LoginTracker()
@@ -1,27 +1,80 @@
+import threading
+from functools import wraps
+
 from flask import current_app
+from sqlalchemy.orm import make_transient_to_detached
 
-from manager_rest.storage.models import Tenant
+from manager_rest.storage.models import Tenant, Generation
 from manager_rest.manager_exceptions import NotFoundError
-from manager_rest.storage import get_storage_manager, user_datastore
+from manager_rest.storage import get_storage_manager, db
 from manager_rest.constants import (CLOUDIFY_TENANT_HEADER,
                                     ADMIN_ROLE,
                                     CURRENT_TENANT_CONFIG)
 
 from manager_rest.app_logging import raise_unauthorized_user_error
 
+from .token_cache import token_cache
+
+AUTHORIZATION_GENERATION = 'authorization'
+
 
 class TenantAuthorization(object):
+    """Authorize users to access tenants
+
+    Tenants and the users' effective tenant sets are cached per worker, and
+    stamped with the authorization generation - a DB counter that is bumped
+    whenever users, groups, roles or tenants are modified (see
+    `invalidates_authorization_cache`). A generation change clears the
+    caches, including the token cache.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._tenants = {}
+        self._user_tenants = {}
+
     def authorize(self, user, request, tenant_name=None):
         logger = current_app.logger
 
         logger.debug('Tenant authorization for {0}'.format(user))
 
-        admin_role = user_datastore.find_role(ADMIN_ROLE)
         if tenant_name is None:
             tenant_name = request.headers.get(CLOUDIFY_TENANT_HEADER)
         if not tenant_name:
             raise raise_unauthorized_user_error(
                 'a Tenant name was not provided')
+
+        self._refresh_generation()
+        tenant = self._get_tenant(tenant_name)
+
+        logger.debug('User attempting to connect with {0}'.format(tenant))
+        if not self._is_associated(user, tenant):
+            raise_unauthorized_user_error(
+                '{0} is not associated with {1}'.format(user, tenant)
+            )
+
+        current_app.config[CURRENT_TENANT_CONFIG] = tenant
+
+    def clear(self):
+        with self._lock:
+            self._tenants.clear()
+            self._user_tenants.clear()
+        token_cache.clear()
+
+    def _refresh_generation(self):
+        generation = Generation.get_value(AUTHORIZATION_GENERATION)
+        if generation != self._generation:
+            self.clear()
+            self._generation = generation
+
+    def _get_tenant(self, tenant_name):
+        """Return the tenant, attached to the current session. Cached tenants
+        are merged into the session without querying the DB
+        """
+        cached_tenant = self._tenants.get(tenant_name)
+        if cached_tenant is not None:
+            return db.session.merge(cached_tenant, load=False)
+
         try:
             tenant = get_storage_manager().get(
                 Tenant,
@@ -32,14 +85,41 @@ class TenantAuthorization(object):
             raise_unauthorized_user_error(
                 'Provided tenant name unknown: {0}'.format(tenant_name)
             )
+        cached_tenant = Tenant(id=tenant.id, name=tenant.name)
+        make_transient_to_detached(cached_tenant)
+        self._tenants[tenant_name] = cached_tenant
+        return tenant
 
-        logger.debug('User attempting to connect with {0}'.format(tenant))
-        if tenant not in user.all_tenants and admin_role not in user.roles:
-            raise_unauthorized_user_error(
-                '{0} is not associated with {1}'.format(user, tenant)
-            )
-
-        current_app.config[CURRENT_TENANT_CONFIG] = tenant
+    def _is_associated(self, user, tenant):
+        """Check whether the user is an admin or is associated with the
+        tenant, either directly or via a group
+        """
+        user_tenants = self._user_tenants.get(user.id)
+        if user_tenants is None:
+            user_tenants = (user.role == ADMIN_ROLE, user.all_tenant_names)
+            self._user_tenants[user.id] = user_tenants
+        is_admin, tenant_names = user_tenants
+        return is_admin or tenant.name in tenant_names
 
 
 tenant_authorizer = TenantAuthorization()
+
+
+def invalidates_authorization_cache(func):
+    """Bump the authorization generation after a method that modifies
+    users, groups, roles or tenants, so that all the workers drop their
+    cached tenants, tokens and tenant associations
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        invalidate_authorization_cache()
+        return result
+    return wrapper
+
+
+def invalidate_authorization_cache():
+    """Bump the authorization generation, and clear this worker's caches
+    """
+    Generation.bump(AUTHORIZATION_GENERATION)
+    tenant_authorizer.clear()
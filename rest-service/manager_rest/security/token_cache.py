@@ -0,0 +1,107 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import time
+import hashlib
+import calendar
+import threading
+from collections import OrderedDict, namedtuple
+
+from manager_rest import config
+
+
+CachedToken = namedtuple('CachedToken', 'user_id data role tenant_names '
+                                        'expires_at')
+
+
+class TokenCache(object):
+    """A bounded, in-process LRU cache of verified authentication tokens
+
+    Tokens are keyed by their digest, and hold the data extracted from the
+    token, along with the user's role and the names of all the tenants the
+    user is associated with (directly, or via a group). Entries expire after
+    `token_cache_ttl` seconds, or when the token itself expires, whichever
+    comes first.
+
+    The user itself is still loaded from the DB on every request, so password
+    changes and user deletion take effect immediately. Role and tenant
+    changes clear the cache along with the tenant authorization cache (see
+    manager_rest.security.tenant_authorization).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        """Return the CachedToken entry of `token`, or None
+        """
+        if not token or not config.instance.token_cache_size:
+            return None
+        key = self._get_key(token)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry.expires_at < time.time():
+                self.misses += 1
+                return None
+            # Re-insert to mark the entry as the most recently used
+            self._entries[key] = entry
+            self.hits += 1
+            return entry
+
+    def set(self, token, user, data, issued_at, max_age):
+        """Cache a token that was successfully verified
+
+        :param token: The token string
+        :param user: The user the token belongs to
+        :param data: The data that was extracted from the token
+        :param issued_at: A UTC datetime of the token's creation
+        :param max_age: The maximal age of a token, in seconds
+        :return: The new CachedToken entry
+        """
+        cache_size = config.instance.token_cache_size
+        if not cache_size:
+            return None
+        expires_at = min(time.time() + config.instance.token_cache_ttl,
+                         calendar.timegm(issued_at.utctimetuple()) + max_age)
+        entry = CachedToken(
+            user_id=user.id,
+            data=data,
+            role=user.role,
+            tenant_names=user.all_tenant_names,
+            expires_at=expires_at
+        )
+        key = self._get_key(token)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > cache_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _get_key(token):
+        return hashlib.sha256(token).hexdigest()
+
+
+token_cache = TokenCache()
@@ -0,0 +1,134 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Per-execution counters of events and logs
+
+The `event_counts` table holds the number of events and logs stored for every
+execution, so that they don't have to be counted on every page request. The
+counters are maintained by DB triggers, since events and logs are also
+inserted by producers other than the REST service.
+
+The triggers are created (and the counters of existing rows are computed)
+when the tables are created with `db.create_all()`. Partitions of the events
+and logs tables get their own triggers (see storage.partitions).
+"""
+
+from sqlalchemy import event
+
+from .models_base import db
+from .resource_models import EventCounts
+
+COUNTED_TABLES = ['events', 'logs']
+
+_POSTGRES_COUNT_FUNCTION = """
+CREATE OR REPLACE FUNCTION {column}_count_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO event_counts (_execution_fk, {column})
+        VALUES (NEW._execution_fk, 1)
+        ON CONFLICT (_execution_fk)
+        DO UPDATE SET {column} = event_counts.{column} + 1;
+    ELSE
+        UPDATE event_counts SET {column} = {column} - 1
+        WHERE _execution_fk = OLD._execution_fk;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+_POSTGRES_COUNT_TRIGGER = """
+DROP TRIGGER IF EXISTS {table}_count_trigger ON {table};
+CREATE TRIGGER {table}_count_trigger
+    AFTER INSERT OR DELETE ON {table}
+    FOR EACH ROW EXECUTE PROCEDURE {column}_count_trigger();
+"""
+
+_SQLITE_COUNT_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS {table}_count_insert_trigger
+    AFTER INSERT ON {table}
+    BEGIN
+        INSERT OR IGNORE INTO event_counts (_execution_fk)
+        VALUES (NEW._execution_fk);
+        UPDATE event_counts SET {column} = {column} + 1
+        WHERE _execution_fk = NEW._execution_fk;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {table}_count_delete_trigger
+    AFTER DELETE ON {table}
+    BEGIN
+        UPDATE event_counts SET {column} = {column} - 1
+        WHERE _execution_fk = OLD._execution_fk;
+    END
+    """,
+]
+
+_COMPUTE_COUNTS = """
+INSERT INTO event_counts (_execution_fk, events, logs)
+SELECT executions._storage_id,
+       (SELECT count(*) FROM events
+        WHERE events._execution_fk = executions._storage_id),
+       (SELECT count(*) FROM logs
+        WHERE logs._execution_fk = executions._storage_id)
+FROM executions
+"""
+
+_SUBTRACT_PARTITION_COUNTS = """
+UPDATE event_counts
+SET {column} = event_counts.{column} - partition_counts.count
+FROM (
+    SELECT _execution_fk, count(*) AS count
+    FROM {partition}
+    GROUP BY _execution_fk
+) AS partition_counts
+WHERE event_counts._execution_fk = partition_counts._execution_fk
+"""
+
+
+def create_count_triggers(connection, table, column=None):
+    """Create the triggers that maintain the counters of `table`
+
+    :param connection: A connection to execute the DDL with
+    :param table: The events or logs table, or one of their partitions
+    :param column: The counter to maintain (defaults to the table's name)
+    """
+    column = column or table
+    if connection.dialect.name == 'postgresql':
+        connection.execute(_POSTGRES_COUNT_FUNCTION.format(column=column))
+        connection.execute(_POSTGRES_COUNT_TRIGGER.format(
+            table=table, column=column))
+    else:
+        for trigger in _SQLITE_COUNT_TRIGGERS:
+            connection.execute(trigger.format(table=table, column=column))
+
+
+def subtract_partition_counts(connection, partition, column):
+    """Subtract the rows of a partition that is about to be removed (which
+    doesn't fire any triggers) from the counters
+    """
+    connection.execute(_SUBTRACT_PARTITION_COUNTS.format(
+        partition=partition, column=column))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _setup_event_counts(target, connection, tables=(), **kwargs):
+    for table in COUNTED_TABLES:
+        create_count_triggers(connection, table)
+    # Compute the counters of events and logs stored before the counters
+    # table was created
+    if EventCounts.__table__ in tables:
+        connection.execute(_COMPUTE_COUNTS)
@@ -0,0 +1,185 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Migration of pickled columns to JSON
+
+Columns that used to be pickled (PickleType) are now stored as JSONB (see
+models_base.JSONType), or as compressed JSON (CompressedJSONType). This
+converts the columns of an existing DB:
+
+- JSONType columns are converted into a new JSONB column, which then
+  replaces the pickled one
+- CompressedJSONType columns keep their (bytea) type, and are converted in
+  place. Pickles (protocol 2) always start with 0x80, and zlib streams never
+  do, so the rows that still need to be converted can be told apart
+
+Rows are converted in batches, each in its own transaction, so that the
+tables aren't locked for long, and the migration can be resumed if it's
+interrupted.
+
+Usage (on the manager, as a user that can access the DB, after the REST
+service is stopped):
+
+    python -m manager_rest.storage.json_migration
+
+This is also run by the snapshot restore workflow, after restoring a
+snapshot that was created before the columns were converted.
+"""
+
+import sys
+import logging
+import argparse
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+
+from manager_rest.storage import db
+from manager_rest.storage.models_base import JSONType, CompressedJSONType
+
+MIGRATION_BATCH_SIZE = 1000
+
+format_str = '%(asctime)s [%(name)s] %(levelname)s: %(message)s'
+logger = logging.getLogger('json_migration')
+
+_SELECT_PICKLED_ROWS = """
+SELECT _storage_id, {column} AS value FROM {table}
+WHERE {condition}
+LIMIT :batch_size
+"""
+
+_UPDATE_ROW = """
+UPDATE {table} SET {column} = :value WHERE _storage_id = :storage_id
+"""
+
+_REPLACE_COLUMN = """
+ALTER TABLE {table} DROP COLUMN {column};
+ALTER TABLE {table} RENAME COLUMN {new_column} TO {column};
+"""
+
+
+def get_json_columns():
+    """Return the (table, column) pairs of the JSON columns of all models
+    """
+    for table in db.metadata.sorted_tables:
+        for column in table.columns:
+            if isinstance(column.type, (JSONType, CompressedJSONType)):
+                yield table, column
+
+
+def migrate_columns(batch_size=MIGRATION_BATCH_SIZE):
+    for table, column in get_json_columns():
+        if isinstance(column.type, CompressedJSONType):
+            migrate_compressed_column(table.name, column.name, batch_size)
+        else:
+            migrate_jsonb_column(table.name, column, batch_size)
+
+
+def migrate_jsonb_column(table, column, batch_size=MIGRATION_BATCH_SIZE):
+    """Convert a pickled column to JSONB, through a new column that
+    replaces it once all the rows are converted
+    """
+    # Either already converted, or missing from this DB
+    if get_data_type(table, column.name) != 'bytea':
+        return
+    new_column = '{0}_json'.format(column.name)
+    if not get_data_type(table, new_column):
+        logger.info('Adding column {0}.{1}'.format(table, new_column))
+        db.session.execute('ALTER TABLE {0} ADD COLUMN {1} JSONB'.format(
+            table, new_column))
+        db.session.commit()
+
+    condition = '{0} IS NOT NULL AND {1} IS NULL'.format(column.name,
+                                                         new_column)
+    converted = _convert_rows(table, column.name, new_column, JSONB,
+                              condition, batch_size)
+
+    db.session.execute(_REPLACE_COLUMN.format(
+        table=table, column=column.name, new_column=new_column))
+    if not column.nullable:
+        db.session.execute('ALTER TABLE {0} ALTER COLUMN {1} SET NOT NULL'
+                           .format(table, column.name))
+    db.session.commit()
+    logger.info('Converted {0} rows of {1}.{2} to JSONB'.format(
+        converted, table, column.name))
+
+
+def migrate_compressed_column(table, column, batch_size=MIGRATION_BATCH_SIZE):
+    """Convert the pickled rows of a column to compressed JSON, in place
+    """
+    condition = 'get_byte({0}, 0) = 128'.format(column)
+    converted = _convert_rows(table, column, column, CompressedJSONType,
+                              condition, batch_size)
+    logger.info('Converted {0} rows of {1}.{2} to compressed JSON'.format(
+        converted, table, column))
+
+
+def _convert_rows(table, column, target_column, target_type, condition,
+                  batch_size):
+    """Unpickle the values of `column` in the rows matching `condition`, and
+    store them in `target_column` as `target_type`, batch by batch
+
+    :return: The number of converted rows
+    """
+    select_query = text(
+        _SELECT_PICKLED_ROWS.format(
+            table=table, column=column, condition=condition)
+    ).columns(value=db.PickleType)
+    update_query = text(
+        _UPDATE_ROW.format(table=table, column=target_column)
+    ).bindparams(bindparam('value', type_=target_type))
+
+    converted = 0
+    while True:
+        rows = db.session.execute(select_query,
+                                  {'batch_size': batch_size}).fetchall()
+        if not rows:
+            break
+        db.session.execute(update_query, [
+            {'storage_id': storage_id, 'value': value}
+            for storage_id, value in rows
+        ])
+        db.session.commit()
+        converted += len(rows)
+    return converted
+
+
+def get_data_type(table, column):
+    """Return the data type of a column, or None if it doesn't exist
+    """
+    return db.session.execute(text(
+        'SELECT data_type FROM information_schema.columns '
+        'WHERE table_name = :table AND column_name = :column'
+    ), {'table': table, 'column': column}).scalar()
+
+
+def main():
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO,
+                        format=format_str)
+    parser = argparse.ArgumentParser(
+        description='Convert pickled columns to JSON')
+    parser.add_argument('--batch-size', type=int,
+                        default=MIGRATION_BATCH_SIZE,
+                        help='Number of rows to convert in each transaction')
+    args = parser.parse_args()
+
+    # Imported here, as the flask app is only needed when running as a script
+    from manager_rest.flask_utils import setup_flask_app
+    setup_flask_app()
+
+    migrate_columns(args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
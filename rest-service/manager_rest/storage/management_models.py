@@ -36,6 +36,32 @@ class ProviderContext(SQLModelBase):
     context = db.Column(db.PickleType, nullable=False)
 
 
+class Generation(SQLModelBase):
+    """A counter that is bumped whenever the data it guards is modified, so
+    that per-worker caches of that data can tell when they're stale
+    """
+    __tablename__ = 'generations'
+
+    id = db.Column(db.Text, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def get_value(cls, generation_id):
+        value = db.session.query(cls.value).filter(
+            cls.id == generation_id).scalar()
+        return value or 0
+
+    @classmethod
+    def bump(cls, generation_id):
+        updated = cls.query.filter_by(id=generation_id).update(
+            {'value': cls.value + 1},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.add(cls(id=generation_id, value=1))
+        db.session.commit()
+
+
 class Tenant(SQLModelBase):
     __tablename__ = 'tenants'
 
@@ -119,6 +145,10 @@ class User(SQLModelBase, UserMixin):
     last_name = db.Column(db.String(255))
     password = db.Column(db.String(255))
 
+    # The token cache entry the user was authenticated with, if any
+    # (see manager_rest.security.token_cache). Not persisted
+    cached_token = None
+
     def _get_identifier_dict(self):
         return OrderedDict({'username': self.username})
 
@@ -148,6 +178,18 @@ class User(SQLModelBase, UserMixin):
 
         return list(set(tenant_list))
 
+    @property
+    def all_tenant_names(self):
+        """Return the names of all tenants associated with a user - either
+        directly, or via a group the user is in
+        """
+        if self.cached_token:
+            return self.cached_token.tenant_names
+        tenant_names = set(tenant.name for tenant in self.tenants)
+        for group in self.groups:
+            tenant_names.update(tenant.name for tenant in group.tenants)
+        return frozenset(tenant_names)
+
     def to_response(self):
         user_dict = super(User, self).to_response()
         tenant_names = [tenant.name for tenant in self.all_tenants]
@@ -159,6 +201,8 @@ class User(SQLModelBase, UserMixin):
 
     @property
     def role(self):
+        if self.cached_token:
+            return self.cached_token.role
         return self.roles[0].name
 
     @property
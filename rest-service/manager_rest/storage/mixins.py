@@ -13,9 +13,14 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+from sqlalchemy import case
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.ext.declarative import declared_attr
 
+from manager_rest.constants import (OWNER_PERMISSION,
+                                    VIEWER_PERMISSION,
+                                    CREATOR_PERMISSION)
+
 from .models_base import db
 from .management_models import User, Tenant
 from .relationships import many_to_many_relationship, foreign_key
@@ -101,6 +106,21 @@ class TopLevelCreatorMixin(object):
     def owners(cls):
         return many_to_many_relationship(cls, User, table_prefix='owners')
 
+    @classmethod
+    def get_permission_column(cls, user):
+        """Return a column that computes the permission `user` has on each
+        resource, using EXISTS subqueries against the owners/viewers tables
+        (the SQL equivalent of SQLResourceBase.permission)
+        """
+        return case(
+            [
+                (cls._creator_id == user.id, CREATOR_PERMISSION),
+                (cls.owners.any(id=user.id), OWNER_PERMISSION),
+                (cls.viewers.any(id=user.id), VIEWER_PERMISSION)
+            ],
+            else_=''
+        ).label('permission')
+
 
 class TopLevelMixin(TopLevelTenantMixin, TopLevelCreatorMixin):
     def __init__(self, *args, **kwargs):
@@ -19,6 +19,7 @@ from .management_models import (User,
                                 Role,
                                 Group,
                                 Tenant,
+                                Generation,
                                 user_datastore,
                                 ProviderContext)
 
@@ -30,8 +31,12 @@ from .resource_models import (Blueprint,
                               NodeInstance,
                               Execution,
                               Event,
+                              EventCounts,
                               Log,
                               DeploymentModification,
                               DeploymentUpdate,
                               DeploymentModificationState,
                               DeploymentUpdateStep)
+
+# Registers the DB triggers maintaining the event counters
+from . import event_counts
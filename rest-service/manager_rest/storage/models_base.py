@@ -13,14 +13,19 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import json
+import zlib
+from operator import attrgetter
 from collections import OrderedDict
 from dateutil import parser as date_parser
 
 from flask_sqlalchemy import SQLAlchemy, inspect
 from flask_restful import fields as flask_fields
+from sqlalchemy import type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.associationproxy import ASSOCIATION_PROXY
 
-from manager_rest.utils import classproperty
+from manager_rest.utils import memoized_classproperty
 
 db = SQLAlchemy()
 
@@ -48,6 +53,83 @@ class UTCDateTime(db.TypeDecorator):
             return value
 
 
+class JSONType(db.TypeDecorator):
+    """A JSON document, stored as JSONB in PostgreSQL (so that it can be
+    filtered and projected in SQL, see `json_value`), and as text otherwise
+
+    :param comparator: Same as PickleType's - a function used to compare
+    values, to decide whether an assigned value has changed
+    """
+    impl = db.Text
+
+    def __init__(self, comparator=None):
+        super(JSONType, self).__init__()
+        self.comparator = comparator
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(JSONB(none_as_null=True))
+        return super(JSONType, self).load_dialect_impl(dialect)
+
+    def process_bind_param(self, value, dialect):
+        # JSONB values are serialized by the DB driver
+        if value is None or dialect.name == 'postgresql':
+            return value
+        return json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == 'postgresql':
+            return value
+        return json.loads(value)
+
+    def compare_values(self, x, y):
+        if self.comparator:
+            return self.comparator(x, y)
+        return x == y
+
+
+class CompressedJSONType(db.TypeDecorator):
+    """A zlib-compressed JSON document, for large documents that are only
+    read whole (e.g. blueprint plans)
+    """
+    impl = db.LargeBinary
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        return zlib.compress(json.dumps(value))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return value
+        return json.loads(zlib.decompress(value))
+
+
+def json_value(column, *path):
+    """Return an SQL expression of the value at `path` in a JSONType column,
+    e.g. `json_value(NodeInstance.runtime_properties, 'cloudify_agent')`
+
+    Only supported by PostgreSQL, where the documents are stored as JSONB
+    """
+    document = type_coerce(column, JSONB)
+    if len(path) == 1:
+        return document[path[0]]
+    return document[path]
+
+
+def fields_getter(field_names):
+    """Return a function that returns a dict with the values of all the
+    `field_names` attributes of an object, using a single attrgetter
+    """
+    field_names = tuple(field_names)
+    if not field_names:
+        return lambda obj: {}
+    getter = attrgetter(*field_names)
+    if len(field_names) == 1:
+        return lambda obj: {field_names[0]: getter(obj)}
+    return lambda obj: dict(zip(field_names, getter(obj)))
+
+
 class CIColumn(db.Column):
     """A column for case insensitive string fields
     """
@@ -75,6 +157,8 @@ class SQLModelBase(db.Model):
         'Text': flask_fields.String,
         'String': flask_fields.String,
         'PickleType': flask_fields.Raw,
+        'JSONType': flask_fields.Raw,
+        'CompressedJSONType': flask_fields.Raw,
         'UTCDateTime': flask_fields.String,
         'Enum': flask_fields.String,
         'Boolean': flask_fields.Boolean
@@ -98,16 +182,18 @@ class SQLModelBase(db.Model):
         else:
             # Can't simply call here `self.to_response()` because inheriting
             # class might override it, but we always need the same code here
-            res = {f: getattr(self, f) for f in self.resource_fields}
+            res = self._resource_fields_getter(self)
         return res
 
     def to_response(self):
-        return {f: getattr(self, f) for f in self.resource_fields}
+        return self._resource_fields_getter(self)
 
-    @classproperty
+    @memoized_classproperty
     def resource_fields(cls):
         """Return a mapping of available field names and their corresponding
         flask types
+
+        The mapping is computed once per class, and shouldn't be modified
         """
         fields = dict()
         columns = inspect(cls).columns
@@ -119,6 +205,10 @@ class SQLModelBase(db.Model):
             fields[field_name] = cls._sql_to_flask_type_map[field_type_name]
         return fields
 
+    @memoized_classproperty
+    def _resource_fields_getter(cls):
+        return fields_getter(cls.resource_fields)
+
     @classmethod
     def _get_association_proxies(cls):
         """Return a dictionary with all association proxy names as keys, and
@@ -41,8 +41,11 @@ class ExecutionState(object):
     STARTED = 'started'
     CANCELLING = 'cancelling'
     FORCE_CANCELLING = 'force_cancelling'
+    QUEUED = 'queued'
 
     STATES = [TERMINATED, FAILED, CANCELLED, PENDING, STARTED,
-              CANCELLING, FORCE_CANCELLING]
+              CANCELLING, FORCE_CANCELLING, QUEUED]
     END_STATES = [TERMINATED, FAILED, CANCELLED]
     ACTIVE_STATES = [state for state in STATES if state not in END_STATES]
+    # Active executions that were already started (i.e. not queued)
+    RUNNING_STATES = [state for state in ACTIVE_STATES if state != QUEUED]
@@ -0,0 +1,114 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import func
+
+from manager_rest import config
+
+from .models_base import db
+from .resource_models import Node, NodeInstance
+
+
+class OutputsCache(object):
+    """A bounded, in-process LRU cache of evaluated deployment outputs
+
+    An entry is valid as long as the deployment's generation (see
+    `get_generation`) is unchanged, so outputs are only re-evaluated once
+    a node instance of the deployment was added, removed or updated, or
+    the deployment itself was updated.
+
+    The number of entries is capped by `deployment_outputs_cache_size`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, deployment, evaluate):
+        """Return the outputs of `deployment`, and their ETag
+
+        :param deployment: A Deployment instance, or any object with its
+        `_storage_id` and `updated_at` attributes
+        :param evaluate: A function that evaluates the deployment's outputs,
+        called if they aren't cached
+        :return: A tuple of the outputs and the ETag of the generation they
+        were evaluated in
+        """
+        generation = self.get_generation(deployment)
+        etag = hashlib.sha1(json.dumps(generation)).hexdigest()
+        key = deployment._storage_id
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry[0] == etag:
+                # Re-insert to mark the entry as the most recently used
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[1], etag
+            self.misses += 1
+
+        outputs = evaluate()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (etag, outputs)
+            while len(self._entries) > \
+                    config.instance.deployment_outputs_cache_size:
+                self._entries.popitem(last=False)
+        current_app.logger.debug(
+            'Deployment outputs cache miss: {0}'.format(self.stats))
+        return outputs, etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries)
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def get_generation(deployment):
+        """Return a value that changes whenever a node instance of the
+        deployment is added, removed or updated, using a single query
+
+        Every update of a node instance increments its version, so the sum
+        of the versions grows with each update. Added instances get higher
+        storage IDs than the existing ones, and removed ones lower the count.
+        """
+        count, max_storage_id, versions = db.session.query(
+            func.count(NodeInstance._storage_id),
+            func.max(NodeInstance._storage_id),
+            func.coalesce(func.sum(NodeInstance.version), 0)
+        ).join(Node).filter(
+            Node._deployment_fk == deployment._storage_id
+        ).one()
+        return [deployment._storage_id, deployment.updated_at,
+                count, max_storage_id, int(versions)]
+
+
+outputs_cache = OutputsCache()
@@ -0,0 +1,282 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+"""Monthly partitioning of the events and logs tables
+
+The tables are partitioned using table inheritance (the manager runs
+PostgreSQL 9.5, which has no declarative partitioning): every month has a
+child table (e.g. `events_y2017m01`) with a CHECK constraint on its time
+range, and an insert trigger on the parent table routes new rows to the
+child table of their month. Rows of months that have no child table yet are
+kept in the parent table, so no data is lost if partitions weren't created
+in time.
+
+Queries against the parent tables include the child tables, so the REST
+service isn't aware of the partitioning. Every partition gets the triggers
+maintaining the event counters (see storage.event_counts). Old data is
+removed by dropping (or detaching) whole partitions, instead of deleting
+rows.
+
+Usage (on the manager, as a user that can access the DB):
+
+    # Create the trigger and partitions, and move the existing rows
+    python -m manager_rest.storage.partitions setup
+
+    # Meant to run daily: create the upcoming partitions, and drop the
+    # ones older than the retention period
+    python -m manager_rest.storage.partitions maintain --retention-days 90
+"""
+
+import re
+import sys
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from manager_rest.storage import db
+from manager_rest.storage.event_counts import (create_count_triggers,
+                                               subtract_partition_counts)
+
+PARTITIONED_TABLES = ['events', 'logs']
+MIGRATION_BATCH_SIZE = 10000
+
+format_str = '%(asctime)s [%(name)s] %(levelname)s: %(message)s'
+logger = logging.getLogger('partitions')
+
+_INSERT_TRIGGER = """
+CREATE OR REPLACE FUNCTION {table}_insert_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE format('INSERT INTO %I SELECT ($1).*',
+                   '{table}_' || to_char(NEW."timestamp", '"y"YYYY"m"MM'))
+        USING NEW;
+    RETURN NULL;
+EXCEPTION WHEN undefined_table THEN
+    -- There's no partition for this month, keep the row in the parent table
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS {table}_insert_trigger ON {table};
+CREATE TRIGGER {table}_insert_trigger
+    BEFORE INSERT ON {table}
+    FOR EACH ROW EXECUTE PROCEDURE {table}_insert_trigger();
+"""
+
+_CREATE_PARTITION = """
+CREATE TABLE {partition} (
+    LIKE {table} INCLUDING DEFAULTS INCLUDING INDEXES,
+    CHECK ("timestamp" >= '{start}' AND "timestamp" < '{end}')
+) INHERITS ({table});
+ALTER TABLE {partition}
+    ADD FOREIGN KEY (_execution_fk)
+    REFERENCES executions (_storage_id) ON DELETE CASCADE;
+"""
+
+_MOVE_ROWS = """
+WITH moved AS (
+    DELETE FROM ONLY {table}
+    WHERE _storage_id IN (
+        SELECT _storage_id FROM ONLY {table}
+        WHERE "timestamp" >= :start AND "timestamp" < :end
+        LIMIT :batch_size
+    )
+    RETURNING *
+)
+INSERT INTO {partition} SELECT * FROM moved
+"""
+
+
+def get_partition_name(table, month):
+    """Return the name of the partition of `table` holding `month`
+    """
+    return '{0}_y{1:04d}m{2:02d}'.format(table, month.year, month.month)
+
+
+def get_month_range(month):
+    """Return the (start, end) datetimes of the month `month` is in
+    """
+    start = datetime(month.year, month.month, 1)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+def parse_partition_name(table, partition):
+    """Return the (start, end) datetimes of a partition of `table`, or None
+    if `partition` isn't named like a partition of `table`
+    """
+    match = re.match(r'^{0}_y(\d{{4}})m(\d{{2}})$'.format(table), partition)
+    if not match:
+        return None
+    return get_month_range(datetime(int(match.group(1)),
+                                    int(match.group(2)), 1))
+
+
+def setup_partitioning(months_ahead=2):
+    """Create the insert triggers and partitions, and move the existing rows
+    of the parent tables to the partitions of their months
+    """
+    for table in PARTITIONED_TABLES:
+        logger.info('Setting up partitioning of {0}'.format(table))
+        db.session.execute(_INSERT_TRIGGER.format(table=table))
+        # Partitions created before the counters were added have no triggers
+        for partition in get_partitions(table):
+            create_count_triggers(db.session.connection(), partition, table)
+        db.session.commit()
+        create_partitions(table, months_ahead)
+        migrate_rows(table)
+
+
+def maintain_partitions(retention_days=None, detach=False, months_ahead=2):
+    """Create the upcoming partitions, and remove the expired ones
+    """
+    for table in PARTITIONED_TABLES:
+        create_partitions(table, months_ahead)
+        if retention_days is not None:
+            remove_expired_partitions(table, retention_days, detach)
+
+
+def create_partitions(table, months_ahead):
+    """Create the partitions of the current month, and of `months_ahead`
+    months following it, unless they already exist
+    """
+    month = datetime.utcnow()
+    for _ in range(months_ahead + 1):
+        create_partition(table, month)
+        month = get_month_range(month)[1]
+
+
+def create_partition(table, month):
+    """Create the partition of `table` holding `month`, unless it exists
+
+    :return: The name of the partition
+    """
+    partition = get_partition_name(table, month)
+    exists = db.session.execute(
+        text('SELECT to_regclass(:partition)'),
+        {'partition': partition}
+    ).scalar()
+    if not exists:
+        start, end = get_month_range(month)
+        logger.info('Creating partition {0}'.format(partition))
+        db.session.execute(_CREATE_PARTITION.format(
+            table=table,
+            partition=partition,
+            start=start.isoformat(),
+            end=end.isoformat()
+        ))
+        create_count_triggers(db.session.connection(), partition, table)
+        db.session.commit()
+    return partition
+
+
+def migrate_rows(table, batch_size=MIGRATION_BATCH_SIZE):
+    """Move the rows stored in the parent table to their partitions
+
+    Rows are moved in batches, each in its own transaction, so that the
+    tables aren't locked for long, and the migration can be resumed if it's
+    interrupted.
+    """
+    months = db.session.execute(text(
+        'SELECT DISTINCT date_trunc(\'month\', "timestamp") '
+        'FROM ONLY {0}'.format(table)
+    )).fetchall()
+    for month, in months:
+        partition = create_partition(table, month)
+        start, end = get_month_range(month)
+        moved = 0
+        while True:
+            result = db.session.execute(
+                text(_MOVE_ROWS.format(table=table, partition=partition)),
+                {'start': start, 'end': end, 'batch_size': batch_size}
+            )
+            db.session.commit()
+            if not result.rowcount:
+                break
+            moved += result.rowcount
+        logger.info('Moved {0} rows to {1}'.format(moved, partition))
+
+
+def remove_expired_partitions(table, retention_days, detach=False):
+    """Remove the partitions of `table` holding only rows older than
+    `retention_days` days
+
+    :param detach: Detach the partitions from the parent table instead of
+                   dropping them, e.g. to archive them before dropping
+    :return: The names of the removed partitions
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    removed = []
+    for partition in get_partitions(table):
+        month_range = parse_partition_name(table, partition)
+        if not month_range or month_range[1] > cutoff:
+            continue
+        subtract_partition_counts(db.session.connection(), partition, table)
+        if detach:
+            logger.info('Detaching partition {0}'.format(partition))
+            db.session.execute('ALTER TABLE {0} NO INHERIT {1}'.format(
+                partition, table))
+        else:
+            logger.info('Dropping partition {0}'.format(partition))
+            db.session.execute('DROP TABLE {0}'.format(partition))
+        db.session.commit()
+        removed.append(partition)
+    return removed
+
+
+def get_partitions(table):
+    """Return the names of the tables inheriting from `table`
+    """
+    rows = db.session.execute(text(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+        'WHERE parent.relname = :table '
+        'ORDER BY child.relname'
+    ), {'table': table}).fetchall()
+    return [row[0] for row in rows]
+
+
+def main():
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO,
+                        format=format_str)
+    parser = argparse.ArgumentParser(
+        description='Partition the events and logs tables by month')
+    parser.add_argument('command', choices=['setup', 'maintain'])
+    parser.add_argument('--months-ahead', type=int, default=2,
+                        help='Number of upcoming months to create '
+                             'partitions for')
+    parser.add_argument('--retention-days', type=int,
+                        help='Remove partitions older than this many days')
+    parser.add_argument('--detach', action='store_true',
+                        help='Detach expired partitions instead of dropping '
+                             'them')
+    args = parser.parse_args()
+
+    # Imported here, as the flask app is only needed when running as a script
+    from manager_rest.flask_utils import setup_flask_app
+    setup_flask_app()
+
+    if args.command == 'setup':
+        setup_partitioning(args.months_ahead)
+    maintain_partitions(args.retention_days, args.detach, args.months_ahead)
+
+
+if __name__ == '__main__':
+    main()
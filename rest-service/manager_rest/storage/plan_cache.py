@@ -0,0 +1,129 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import json
+import zlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import type_coerce
+
+from manager_rest import config, manager_exceptions
+
+from .models_base import db
+from .resource_models import Blueprint
+
+
+class PlanCache(object):
+    """A bounded, in-process LRU cache of deserialized blueprint plans
+
+    `Blueprint.plan` is deferred, so loading a blueprint doesn't deserialize
+    its (possibly large) plan. Code that only needs to read the plan gets it
+    from this cache instead, keyed by the blueprint's storage ID and
+    `updated_at`, so that a blueprint that's updated gets a new entry.
+
+    The cached plans are shared, and must not be modified: callers that need
+    to change a plan must deepcopy it first.
+
+    The size of an entry is the length of the plan's JSON document (before
+    it's compressed for storage, so that the size tracks the memory the
+    deserialized plan takes), and the total size is capped by
+    `blueprint_plan_cache_size` bytes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, blueprint):
+        """Return the plan of `blueprint`, which may be a Blueprint instance,
+        or any object with its `_storage_id` and `updated_at` attributes
+        """
+        key = (blueprint._storage_id, blueprint.updated_at)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                # Re-insert to mark the entry as the most recently used
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        plan, size = self._load_plan(blueprint._storage_id)
+        max_size = config.instance.blueprint_plan_cache_size
+        if size <= max_size:
+            with self._lock:
+                old_entry = self._entries.pop(key, None)
+                if old_entry is not None:
+                    self.size -= old_entry[1]
+                self._entries[key] = (plan, size)
+                self.size += size
+                while self.size > max_size:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self.size -= evicted_size
+        current_app.logger.debug(
+            'Blueprint plan cache miss: {0}'.format(self.stats))
+        return plan
+
+    def remove(self, storage_id):
+        """Remove the entries of the blueprint with `storage_id`
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == storage_id]:
+                self.size -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """Remove all the entries, and reset the stats
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'size': self.size
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _load_plan(storage_id):
+        """Load a plan, and the length of its JSON document, from the DB
+        """
+        column = Blueprint.__table__.c.plan
+        stored_plan = db.session.query(
+            type_coerce(column, column.type.impl)
+        ).filter(Blueprint._storage_id == storage_id).scalar()
+        if stored_plan is None:
+            raise manager_exceptions.NotFoundError(
+                'Requested `Blueprint` with storage ID `{0}` was not '
+                'found'.format(storage_id)
+            )
+        # Decompressed here rather than by the column type, to get the size
+        document = zlib.decompress(stored_plan)
+        return json.loads(document), len(document)
+
+
+plan_cache = PlanCache()
@@ -14,15 +14,20 @@
 #  * limitations under the License.
 
 from flask_restful import fields as flask_fields
+from sqlalchemy import column
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.associationproxy import association_proxy
 
-from manager_rest.utils import classproperty
+from manager_rest.utils import memoized_classproperty
 from manager_rest.rest.responses import Workflow
 from manager_rest.deployment_update.constants import ACTION_TYPES, ENTITY_TYPES
 
-from .models_base import db, UTCDateTime
+from .models_base import (db,
+                          UTCDateTime,
+                          SQLModelBase,
+                          JSONType,
+                          CompressedJSONType)
 from .relationships import foreign_key, one_to_many_relationship
 from .resource_models_base import (TopLevelResource,
                                    DerivedResource,
@@ -47,7 +52,9 @@ class Blueprint(TopLevelResource):
 
     created_at = db.Column(UTCDateTime, nullable=False, index=True)
     main_file_name = db.Column(db.Text, nullable=False)
-    plan = db.Column(db.PickleType, nullable=False)
+    # Deferred, as plans can be large: code that only reads the plan should
+    # get it from the plan cache (see storage.plan_cache)
+    plan = db.deferred(db.Column(CompressedJSONType, nullable=False))
     updated_at = db.Column(UTCDateTime)
     description = db.Column(db.Text)
 
@@ -67,14 +74,14 @@ class Plugin(TopLevelResource):
     distribution = db.Column(db.Text)
     distribution_release = db.Column(db.Text)
     distribution_version = db.Column(db.Text)
-    excluded_wheels = db.Column(db.PickleType)
+    excluded_wheels = db.Column(JSONType)
     package_name = db.Column(db.Text, nullable=False, index=True)
     package_source = db.Column(db.Text)
     package_version = db.Column(db.Text)
-    supported_platform = db.Column(db.PickleType)
-    supported_py_versions = db.Column(db.PickleType)
+    supported_platform = db.Column(JSONType)
+    supported_py_versions = db.Column(JSONType)
     uploaded_at = db.Column(UTCDateTime, nullable=False, index=True)
-    wheels = db.Column(db.PickleType, nullable=False)
+    wheels = db.Column(JSONType, nullable=False)
 
 # endregion
 
@@ -92,15 +99,15 @@ class Deployment(TopLevelCreatorMixin, DerivedTenantMixin, SQLResourceBase):
 
     created_at = db.Column(UTCDateTime, nullable=False, index=True)
     description = db.Column(db.Text)
-    inputs = db.Column(db.PickleType)
-    groups = db.Column(db.PickleType)
+    inputs = db.Column(JSONType)
+    groups = db.Column(JSONType)
     permalink = db.Column(db.Text)
-    policy_triggers = db.Column(db.PickleType)
-    policy_types = db.Column(db.PickleType)
-    outputs = db.Column(db.PickleType(comparator=lambda *a: False))
-    scaling_groups = db.Column(db.PickleType)
+    policy_triggers = db.Column(JSONType)
+    policy_types = db.Column(JSONType)
+    outputs = db.Column(JSONType(comparator=lambda *a: False))
+    scaling_groups = db.Column(JSONType)
     updated_at = db.Column(UTCDateTime)
-    workflows = db.Column(db.PickleType(comparator=lambda *a: False))
+    workflows = db.Column(JSONType(comparator=lambda *a: False))
 
     _blueprint_fk = foreign_key(Blueprint._storage_id)
 
@@ -119,9 +126,9 @@ class Deployment(TopLevelCreatorMixin, DerivedTenantMixin, SQLResourceBase):
     blueprint_id = association_proxy('blueprint', 'id')
     _tenant_id = association_proxy('blueprint', '_tenant_id')
 
-    @classproperty
+    @memoized_classproperty
     def response_fields(cls):
-        fields = super(Deployment, cls).response_fields
+        fields = dict(super(Deployment, cls).response_fields)
         fields['workflows'] = flask_fields.List(
             flask_fields.Nested(Workflow.resource_fields)
         )
@@ -145,15 +152,27 @@ class Deployment(TopLevelCreatorMixin, DerivedTenantMixin, SQLResourceBase):
 
 class Execution(TopLevelMixin, SQLResourceBase):
     __tablename__ = 'executions'
+    __table_args__ = (
+        # Used to check for active executions of a tenant/deployment (see
+        # ResourceManager._check_for_active_executions). Only the (few)
+        # active executions are indexed, and not the ended ones
+        db.Index('executions__active_idx', '_tenant_id', '_deployment_fk',
+                 postgresql_where=column('status', db.Text).in_(
+                     ExecutionState.ACTIVE_STATES)),
+    )
 
     created_at = db.Column(UTCDateTime, nullable=False, index=True)
     error = db.Column(db.Text)
     is_system_workflow = db.Column(db.Boolean, nullable=False)
-    parameters = db.Column(db.PickleType)
+    parameters = db.Column(JSONType)
     status = db.Column(
-        db.Enum(*ExecutionState.STATES, name='execution_status')
+        db.Enum(*ExecutionState.STATES, name='execution_status'),
+        index=True
     )
     workflow_id = db.Column(db.Text, nullable=False)
+    # Steps to run when a system workflow ends (see
+    # ResourceManager.handle_execution_end)
+    _completion_actions = db.Column(JSONType)
 
     _deployment_fk = foreign_key(Deployment._storage_id, nullable=True)
 
@@ -183,6 +202,15 @@ class Event(DerivedResource):
     """Execution events."""
 
     __tablename__ = 'events'
+    __table_args__ = (
+        # Used to get the events of an execution in chronological order
+        db.Index('events__execution_fk_timestamp_idx',
+                 '_execution_fk', 'timestamp'),
+        # When the table is partitioned (see storage.partitions), inserted
+        # rows are routed to partitions by a trigger and RETURNING yields
+        # nothing, so primary keys are fetched from the sequence beforehand
+        {'implicit_returning': False},
+    )
 
     timestamp = db.Column(UTCDateTime, nullable=False, index=True)
     message = db.Column(db.Text)
@@ -213,6 +241,13 @@ class Log(DerivedResource):
     """Execution logs."""
 
     __tablename__ = 'logs'
+    __table_args__ = (
+        # Used to get the events of an execution in chronological order
+        db.Index('logs__execution_fk_timestamp_idx',
+                 '_execution_fk', 'timestamp'),
+        # See Event
+        {'implicit_returning': False},
+    )
 
     timestamp = db.Column(UTCDateTime, nullable=False, index=True)
     message = db.Column(db.Text)
@@ -239,6 +274,29 @@ class Log(DerivedResource):
         return Execution
 
 
+class EventCounts(SQLModelBase):
+
+    """Number of events and logs of every execution.
+
+    Maintained by DB triggers (see storage.event_counts), and used instead
+    of counting the events and logs when listing them.
+
+    """
+
+    __tablename__ = 'event_counts'
+
+    _execution_fk = db.Column(
+        db.Integer,
+        db.ForeignKey(Execution._storage_id, ondelete='CASCADE'),
+        primary_key=True
+    )
+    events = db.Column(db.Integer, nullable=False, server_default='0')
+    logs = db.Column(db.Integer, nullable=False, server_default='0')
+
+    def _get_identifier_dict(self):
+        return {'execution': self._execution_fk}
+
+
 class DeploymentUpdate(DerivedResource):
     __tablename__ = 'deployment_updates'
 
@@ -273,9 +331,9 @@ class DeploymentUpdate(DerivedResource):
     execution_id = association_proxy('execution', 'id')
     _tenant_id = association_proxy('deployment', '_tenant_id')
 
-    @classproperty
+    @memoized_classproperty
     def response_fields(cls):
-        fields = super(DeploymentUpdate, cls).response_fields
+        fields = dict(super(DeploymentUpdate, cls).response_fields)
         fields['steps'] = flask_fields.List(
             flask_fields.Nested(DeploymentUpdateStep.response_fields)
         )
@@ -368,13 +426,13 @@ class Node(DerivedResource):
     min_number_of_instances = db.Column(db.Integer, nullable=False)
     number_of_instances = db.Column(db.Integer, nullable=False)
     planned_number_of_instances = db.Column(db.Integer, nullable=False)
-    plugins = db.Column(db.PickleType)
-    plugins_to_install = db.Column(db.PickleType)
-    properties = db.Column(db.PickleType)
-    relationships = db.Column(db.PickleType)
-    operations = db.Column(db.PickleType)
+    plugins = db.Column(JSONType)
+    plugins_to_install = db.Column(JSONType)
+    properties = db.Column(JSONType)
+    relationships = db.Column(JSONType)
+    operations = db.Column(JSONType)
     type = db.Column(db.Text, nullable=False, index=True)
-    type_hierarchy = db.Column(db.PickleType)
+    type_hierarchy = db.Column(JSONType)
 
     _deployment_fk = foreign_key(Deployment._storage_id)
 
@@ -407,9 +465,9 @@ class NodeInstance(DerivedResource):
     # TODO: This probably should be a foreign key, but there's no guarantee
     # in the code, currently, that the host will be created beforehand
     host_id = db.Column(db.Text)
-    relationships = db.Column(db.PickleType)
-    runtime_properties = db.Column(db.PickleType)
-    scaling_groups = db.Column(db.PickleType)
+    relationships = db.Column(JSONType)
+    runtime_properties = db.Column(JSONType)
+    scaling_groups = db.Column(JSONType)
     state = db.Column(db.Text, nullable=False)
     version = db.Column(db.Integer, default=1)
 
@@ -13,16 +13,18 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+from flask import g, has_app_context
 from flask_security import current_user
 from flask_restful import fields as flask_fields
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.associationproxy import association_proxy
 
-from manager_rest.utils import classproperty
+from manager_rest.utils import memoized_classproperty
 from manager_rest.constants import (OWNER_PERMISSION,
                                     VIEWER_PERMISSION,
                                     CREATOR_PERMISSION)
 
-from .models_base import db, SQLModelBase
+from .models_base import db, SQLModelBase, fields_getter
 from .mixins import TopLevelMixin, DerivedMixin
 
 
@@ -45,12 +47,16 @@ class SQLResourceBase(SQLModelBase):
     # Lists of fields to skip when using older versions of the client
     skipped_fields = {'v1': [], 'v2': [], 'v2.1': []}
 
-    @classproperty
+    @memoized_classproperty
     def response_fields(cls):
-        fields = cls.resource_fields
+        fields = dict(cls.resource_fields)
         fields.update(cls._extra_fields)
         return fields
 
+    @memoized_classproperty
+    def _response_fields_getter(cls):
+        return fields_getter(cls.response_fields)
+
     @classmethod
     def unique_id(cls):
         return '_storage_id'
@@ -62,6 +68,9 @@ class SQLResourceBase(SQLModelBase):
 
     @property
     def permission(self):
+        precomputed = _precomputed_permissions().get(inspect(self).key)
+        if precomputed and precomputed[0] == current_user.id:
+            return precomputed[1]
         if self.creator == current_user:
             return CREATOR_PERMISSION
         if current_user in self.owners:
@@ -71,7 +80,7 @@ class SQLResourceBase(SQLModelBase):
         return ''
 
     def to_response(self):
-        return {f: getattr(self, f) for f in self.response_fields}
+        return self._response_fields_getter(self)
 
     def _get_identifier_dict(self):
         id_dict = super(SQLResourceBase, self)._get_identifier_dict()
@@ -79,6 +88,29 @@ class SQLResourceBase(SQLModelBase):
         return id_dict
 
 
+def _precomputed_permissions():
+    """The (user id, permission) tuples computed as part of the queries
+    that loaded resources in the current request (see SQLStorageManager.list),
+    by the identity key of the resource
+    """
+    if not has_app_context():
+        return {}
+    if not hasattr(g, 'precomputed_permissions'):
+        g.precomputed_permissions = {}
+    return g.precomputed_permissions
+
+
+def set_precomputed_permission(instance, user_id, permission):
+    _precomputed_permissions()[inspect(instance).key] = (user_id, permission)
+
+
+@event.listens_for(SQLResourceBase, 'expire', propagate=True, raw=True)
+def _clear_precomputed_permission(state, attrs):
+    # Owners/viewers might have changed since the permission was computed.
+    # The state is used, as the instance itself might already be collected
+    _precomputed_permissions().pop(state.key, None)
+
+
 class TopLevelResource(TopLevelMixin, SQLResourceBase):
     # SQLAlchemy syntax
     __abstract__ = True
@@ -13,19 +13,26 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import json
 import psutil
 
-from collections import OrderedDict
+from datetime import datetime
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from collections import OrderedDict, Counter
 
 from flask import current_app
 from flask_security import current_user
 
 from manager_rest.storage.models_base import db
+from manager_rest.storage.resource_models_base import \
+    set_precomputed_permission
 from manager_rest import manager_exceptions, config
 from manager_rest.constants import CURRENT_TENANT_CONFIG
 
-from sqlalchemy import or_ as sql_or, func
+from sqlalchemy import (or_ as sql_or, and_ as sql_and, false, func,
+                        type_coerce, TypeDecorator)
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import undefer
 from sqlite3 import DatabaseError as SQLiteDBError
 
 try:
@@ -314,30 +321,214 @@ class SQLStorageManager(object):
             return column.remote_attr.label(column_name)
 
     @staticmethod
-    def _paginate(query, pagination):
-        """Paginate the query by size and offset
+    def _should_compute_permission(model_class, include):
+        """The current user's permission on resources that hold their own
+        creator/owners/viewers is computed in the list query itself, instead
+        of lazy loading the owners and viewers of each resource separately
+        """
+        if not model_class.top_level_creator:
+            return False
+        if getattr(current_user, 'id', None) is None:
+            return False
+        return not include or 'permission' in include
+
+    @staticmethod
+    def _get_results(query, set_permissions=False, stream=False):
+        """Run the query, and return the results. If `set_permissions` is
+        set, the query returns (instance, permission) rows, and the
+        permissions are stored on the instances. If `stream` is set, an
+        iterator that fetches the results in batches is returned instead of
+        a list
+        """
+        if stream:
+            results = query.yield_per(config.instance.list_stream_batch_size)
+        else:
+            results = query.all()
+        if set_permissions:
+            results = SQLStorageManager._set_permissions(results)
+            if not stream:
+                results = list(results)
+        return results
+
+    @staticmethod
+    def _set_permissions(rows):
+        for instance, permission in rows:
+            set_precomputed_permission(instance, current_user.id, permission)
+            yield instance
+
+    def _stream_with_cursor(self, results, pagination, get_cursor):
+        """Yield the streamed results, and set the next page's cursor in the
+        pagination metadata once they were all read
+        """
+        count = 0
+        for item in results:
+            count += 1
+            yield item
+        if count and count == pagination['size']:
+            pagination['cursor'] = get_cursor()
+
+    def _paginate(self, query, model_class, pagination, sort,
+                  get_all_results=False, set_permissions=False, stream=False):
+        """Paginate the query by size and either offset or cursor
 
         :param query: Current SQLAlchemy query object
-        :param pagination: An optional dict with size and offset keys
-        :return: A tuple with four elements:
-        - results: `size` items starting from `offset`
-        - the total count of items
-        - `size` [default: 0]
+        :param model_class: SQL DB table class
+        :param pagination: An optional dict with size, offset, cursor and
+        count keys
+        :param sort: The (keyset) sorting dict the query was sorted by
+        :param get_all_results: If set to True, the max results limit isn't
+        enforced when no pagination is passed
+        :param set_permissions: Passed on to `_get_results`
+        :param stream: Passed on to `_get_results`. When streaming in keyset
+        mode, the next cursor is set by `_stream_with_cursor` instead
+        :return: A tuple with five elements:
+        - results: `size` items starting from `offset` (or after `cursor`)
+        - the total count of items (None if `count` is set to False)
+        - `size` [default: `default_page_size`]
         - `offset` [default: 0]
+        - the cursor pointing after the last returned item (None if not
+          in keyset mode, or if there are no more items). When streaming,
+          a function that returns it once all the results were read
         """
 
         if pagination:
-            size = pagination.get('size', 0)
+            size = pagination.get('size', config.instance.default_page_size)
             SQLStorageManager._validate_pagination(size)
             offset = pagination.get('offset', 0)
-            total = query.order_by(None).count()  # Fastest way to count
-            results = query.limit(size).offset(offset).all()
-            return results, total, size, offset
+            if pagination.get('count', True):
+                total = query.order_by(None).count()  # Fastest way to count
+            else:
+                total = None
+
+            if 'cursor' not in pagination:
+                results = self._get_results(
+                    query.limit(size).offset(offset), set_permissions, stream)
+                return results, total, size, offset, None
+
+            if pagination['cursor']:
+                query = self._add_keyset_filter(
+                    query, model_class, sort, pagination['cursor'])
+            results = self._get_results(
+                query.limit(size), set_permissions, stream)
+
+            def get_cursor():
+                return self._get_cursor(query, model_class, sort, size)
+
+            if stream:
+                return results, total, size, 0, get_cursor
+            next_cursor = None
+            if results and len(results) == size:
+                next_cursor = get_cursor()
+            return results, total, size, 0, next_cursor
         else:
-            total = query.order_by(None).count()
-            SQLStorageManager._validate_returned_size(total)
-            results = query.all()
-            return results, len(results), 0, 0
+            total = None
+            if not get_all_results:
+                total = query.order_by(None).count()
+                SQLStorageManager._validate_returned_size(total)
+            results = self._get_results(query, set_permissions, stream)
+            if not stream:
+                total = len(results)
+            return results, total, 0, 0, None
+
+    @staticmethod
+    def _get_keyset_sort(model_class, sort):
+        """Return the sort dict to be used in keyset (cursor) pagination -
+        the requested sort, with the model's unique id as a final tie-breaker
+        """
+        sort = OrderedDict(sort or ())
+        sort.setdefault(model_class.unique_id(), 'asc')
+        return sort
+
+    def _get_cursor(self, query, model_class, sort, size):
+        """Return the cursor pointing after the last item of the page
+
+        The sort keys of the last item are read from the DB without their
+        type decorators, as some of them (e.g. UTCDateTime) lose precision
+        when their values are loaded, which would repeat items across pages
+        """
+        columns = []
+        for column_name in sort:
+            column = self._get_column(model_class, column_name)
+            if isinstance(column.type, TypeDecorator):
+                column = type_coerce(column, column.type.impl)
+            columns.append(column)
+        values = query.with_entities(*columns).offset(size - 1).first()
+        return self._encode_cursor(sort, values)
+
+    @staticmethod
+    def _encode_cursor(sort, values):
+        """Return an opaque token holding the sort keys of the last item
+        """
+        cursor = {
+            'sort': [[column, order] for column, order in sort.iteritems()],
+            'values': [value.isoformat() if isinstance(value, datetime)
+                       else value for value in values]
+        }
+        return urlsafe_b64encode(json.dumps(cursor))
+
+    @staticmethod
+    def _decode_cursor(cursor, sort):
+        """Return the sort key values held by `cursor`, after making sure the
+        cursor was created for the same sort order
+        """
+        try:
+            decoded = json.loads(urlsafe_b64decode(str(cursor)))
+            cursor_sort, values = decoded['sort'], decoded['values']
+        except (TypeError, ValueError, KeyError):
+            raise manager_exceptions.BadParametersError(
+                'Invalid pagination cursor: {0}'.format(cursor)
+            )
+        expected_sort = [[column, order] for column, order in sort.iteritems()]
+        if cursor_sort != expected_sort or len(values) != len(sort):
+            raise manager_exceptions.BadParametersError(
+                'Pagination cursor does not match the requested sort order. '
+                'Cursor sort: {0}, requested sort: {1}'.format(
+                    cursor_sort, expected_sort
+                )
+            )
+        return values
+
+    def _add_keyset_filter(self, query, model_class, sort, cursor):
+        """Filter the query so that only items that come after the cursor (in
+        the sort order) are returned, i.e. for a sort by (a, b):
+        a > a0 OR (a == a0 AND b > b0)
+        """
+        values = self._decode_cursor(cursor, sort)
+        columns = [self._get_column(model_class, c) for c in sort]
+        orders = sort.values()
+        # NULLs are sorted as the largest values by PostgreSQL, and as the
+        # smallest ones by SQLite
+        nulls_largest = db.engine.dialect.name == 'postgresql'
+
+        clauses = []
+        for index, column in enumerate(columns):
+            equals = [self._keyset_equals(columns[i], values[i])
+                      for i in range(index)]
+            after = self._keyset_after(column, values[index],
+                                       desc=orders[index] == 'desc',
+                                       nulls_largest=nulls_largest)
+            clauses.append(sql_and(*(equals + [after])))
+        return query.filter(sql_or(*clauses))
+
+    @staticmethod
+    def _keyset_equals(column, value):
+        if value is None:
+            return column.is_(None)
+        return column == value
+
+    @staticmethod
+    def _keyset_after(column, value, desc, nulls_largest):
+        """Return the clause matching the rows whose `column` comes after
+        `value` in the sort order. Comparing to NULL doesn't match any row,
+        so NULLs are matched explicitly, where the DB sorts them
+        """
+        nulls_last = nulls_largest != desc
+        if value is None:
+            return false() if nulls_last else column.isnot(None)
+        after = column < value if desc else column > value
+        if nulls_last:
+            after = sql_or(after, column.is_(None))
+        return after
 
     @staticmethod
     def _validate_pagination(pagination_size):
@@ -391,6 +582,30 @@ class SQLStorageManager(object):
                 )
             )
 
+    def _validate_unique_resource_ids_per_tenant(self, model_class, instances):
+        """Assert that none of the instances' ids already exists in the
+        current tenant, and that there are no duplicate ids among them, using
+        a single query for the whole batch
+        """
+        if not model_class.is_resource or not model_class.is_id_unique:
+            return
+
+        ids = [instance.id for instance in instances]
+        duplicate_ids = set(i for i, count in Counter(ids).iteritems()
+                            if count > 1)
+        filters = {'id': ids, '_tenant_id': self.current_tenant.id}
+        query = self._get_query(model_class, include=['id'], filters=filters)
+        duplicate_ids.update(row.id for row in query.all())
+
+        if duplicate_ids:
+            raise manager_exceptions.ConflictError(
+                '{0} with ids {1} already exist on {2}'.format(
+                    model_class.__name__,
+                    sorted(duplicate_ids),
+                    self.current_tenant
+                )
+            )
+
     def _associate_users_and_tenants(self, instance, private_resource):
         """Associate, if necessary, the instance with the current tenant/user
         """
@@ -463,8 +678,19 @@ class SQLStorageManager(object):
              filters=None,
              pagination=None,
              sort=None,
-             all_tenants=None):
+             all_tenants=None,
+             get_all_results=False,
+             stream=False,
+             locking=False):
         """Return a (possibly empty) list of `model_class` results
+
+        :param get_all_results: If set to True, all the results are returned
+        even when they exceed `max_results` (only meant for internal use)
+        :param stream: If set to True, the items of the returned ListResult
+        are an iterator that fetches the results from the DB in batches, to
+        be consumed (once) while writing the response
+        :param locking: If set to True, the returned rows are locked for
+        update until the end of the transaction
         """
         self._validate_available_memory()
         if filters:
@@ -474,18 +700,65 @@ class SQLStorageManager(object):
             msg = 'List `{0}`'.format(model_class.__name__)
 
         current_app.logger.debug(msg)
+        with_permission = self._should_compute_permission(model_class,
+                                                          include)
+        if with_permission and include:
+            include = [c for c in include if c != 'permission'] or ['id']
+
+        keyset = bool(pagination) and 'cursor' in pagination
+        if keyset:
+            sort = self._get_keyset_sort(model_class, sort)
+            # The sort keys are needed to create the next cursor
+            if include:
+                include = list(include) + [c for c in sort if c not in include]
+
         query = self._get_query(model_class,
                                 include,
                                 filters,
                                 sort,
                                 all_tenants)
-
-        results, total, size, offset = self._paginate(query, pagination)
+        if not include:
+            # Load deferred columns (e.g. blueprint plans) along with the
+            # rows, as listed items are returned with all of their fields
+            query = query.options(undefer('*'))
+        if locking:
+            query = query.with_for_update()
+        if with_permission:
+            query = query.add_columns(
+                model_class.get_permission_column(current_user))
+
+        results, total, size, offset, cursor = self._paginate(
+            query, model_class, pagination, sort, get_all_results,
+            set_permissions=with_permission and not include,
+            stream=stream)
         pagination = {'total': total, 'size': size, 'offset': offset}
+        if keyset:
+            if stream:
+                pagination['cursor'] = None
+                results = self._stream_with_cursor(results, pagination,
+                                                   cursor)
+            else:
+                pagination['cursor'] = cursor
 
         current_app.logger.debug('Returning: {0}'.format(results))
         return ListResult(items=results, metadata={'pagination': pagination})
 
+    def exists(self, model_class, filters=None, all_tenants=None):
+        """Return whether there are any `model_class` results matching the
+        filters, using a single `SELECT EXISTS (...)` query that doesn't load
+        any of the results
+
+        :param filters: Same as `list`'s
+        :param all_tenants: Same as `list`'s
+        """
+        current_app.logger.debug('Check if `{0}` with filter {1} exists'
+                                 .format(model_class.__name__, filters))
+        query = self._get_query(model_class,
+                                include=['_storage_id'],
+                                filters=filters,
+                                all_tenants=all_tenants)
+        return db.session.query(query.exists()).scalar()
+
     def put(self, instance, private_resource=False):
         """Create a `model_class` instance from a serializable `model` object
 
@@ -502,6 +775,53 @@ class SQLStorageManager(object):
         self._validate_unique_resource_id_per_tenant(instance)
         return instance
 
+    def put_many(self, instances, return_defaults=False, commit=True):
+        """Insert several instances of the same model class in a single
+        transaction, using a bulk INSERT
+
+        Note that relationships aren't handled by the bulk insert, so
+        foreign keys should be set directly on the instances (e.g. `_node_fk`
+        instead of `node`), and the instances aren't attached to the session
+        after the insert. The tenant and creator of top level resources are
+        set the same way, which is why private resources (that need their
+        viewers and owners set) aren't supported.
+
+        :param instances: A list of instances of a single SQLModelBase class
+        :param return_defaults: If set to True, server generated values (e.g.
+        `_storage_id`) will be set on the instances. This requires inserting
+        the instances one by one, so it should only be used when necessary
+        :param commit: If set to False, the instances are only inserted in
+        the current transaction, to be committed along with the following
+        changes (e.g. the next batch)
+        :return: The same list of instances
+        """
+        if not instances:
+            return instances
+
+        model_class = instances[0].__class__
+        current_app.logger.debug(
+            'Put {0} `{1}` instances'.format(len(instances),
+                                             model_class.__name__)
+        )
+        for instance in instances:
+            if instance.top_level_tenant:
+                instance._tenant_id = self.current_tenant.id
+            if instance.top_level_creator:
+                instance._creator_id = current_user.id
+        self._validate_unique_resource_ids_per_tenant(model_class, instances)
+
+        try:
+            db.session.bulk_save_objects(instances,
+                                         return_defaults=return_defaults)
+        except sql_errors as e:
+            db.session.rollback()
+            raise manager_exceptions.SQLStorageException(
+                'SQL Storage error: {0}'.format(str(e))
+            )
+        if commit:
+            self._safe_commit()
+        return instances
+
     def delete(self, instance):
         """Delete the passed instance
         """
@@ -524,6 +844,58 @@ class SQLStorageManager(object):
         self._safe_commit()
         return instance
 
+    def update_versioned(self, instance, version, values):
+        """Update the columns in `values` of `instance` and increment its
+        version, only if its stored version is still `version`
+
+        This is a single `UPDATE ... WHERE version = <version>`, so no row
+        lock is held between reading the instance and updating it (unlike
+        `get(..., locking=True)` followed by `update`). The in-session
+        `instance` isn't modified, and is reloaded when accessed next.
+
+        :param instance: Instance to be updated in the DB
+        :param version: The version the update is based on
+        :param values: A dict of column names and their new values
+        :return: The updated instance
+        :raises ConflictError: If the instance's stored version is different
+        """
+        current_app.logger.debug(
+            'Update {0} from version {1}'.format(instance, version))
+        model_class = instance.__class__
+        table = model_class.__table__
+        query = table.update().where(
+            sql_and(table.c._storage_id == instance._storage_id,
+                    table.c.version == version)
+        ).values(version=version + 1, **values)
+        try:
+            result = db.session.execute(query)
+        except sql_errors as e:
+            db.session.rollback()
+            raise manager_exceptions.SQLStorageException(
+                'SQL Storage error: {0}'.format(str(e))
+            )
+        if result.rowcount != 1:
+            db.session.rollback()
+            raise manager_exceptions.ConflictError(
+                '{0} `{1}` was updated concurrently: expected version {2}'
+                .format(model_class.__name__, instance.id, version))
+        self._safe_commit()
+        db.session.expire(instance)
+        return instance
+
+    def update_many(self, instances):
+        """Add several instances to the DB session, and commit them in a
+        single transaction
+
+        :param instances: Instances to be updated in the DB
+        :return: The same list of instances
+        """
+        current_app.logger.debug(
+            'Update {0} instances'.format(len(instances)))
+        db.session.add_all(instances)
+        self._safe_commit()
+        return instances
+
     def refresh(self, instance):
         """Reload the instance with fresh information from the DB
 
@@ -33,6 +33,9 @@ from manager_rest import utils, config, constants, archiving
 from manager_rest.test.security_utils import get_admin_user
 from manager_rest.storage.models_states import ExecutionState
 from manager_rest.storage import FileServer, get_storage_manager, models
+from manager_rest.storage.plan_cache import plan_cache
+from manager_rest.storage.outputs_cache import outputs_cache
+from manager_rest.security.tenant_authorization import tenant_authorizer
 from manager_rest.constants import CLOUDIFY_TENANT_HEADER, DEFAULT_TENANT_NAME
 from manager_rest.storage.storage_utils import \
     create_default_user_tenant_and_roles
@@ -222,6 +225,11 @@ class BaseServerTestCase(unittest.TestCase):
 
     def _handle_default_db_config(self, server):
         server.db.create_all()
+        # The DB is recreated for every test, so drop any cached tenants,
+        # tokens, blueprint plans and deployment outputs from previous tests
+        tenant_authorizer.clear()
+        plan_cache.clear()
+        outputs_cache.clear()
         admin_user = get_admin_user()
         default_tenant = create_default_user_tenant_and_roles(
             admin_username=admin_user['username'],
@@ -290,6 +298,7 @@ class BaseServerTestCase(unittest.TestCase):
         test_config.rest_service_log_file_size_MB = 100,
         test_config.rest_service_log_files_backup_count = 20
         test_config.maintenance_folder = self.maintenance_mode_dir
+        test_config.maintenance_executions_check_interval = 0
         test_config.security_hash_salt = 'hash_salt'
         test_config.security_secret_key = 'secret_key'
         return test_config
@@ -15,8 +15,10 @@
 
 import uuid
 from nose.plugins.attrib import attr
+from sqlalchemy import event
 
 from manager_rest.test import base_test
+from manager_rest.storage import db
 from cloudify_rest_client.exceptions import FunctionsEvaluationError
 
 
@@ -75,6 +77,37 @@ class AttributesTestCase(base_test.BaseServerTestCase):
         self.assertEqual(response.deployment_id, self.id_)
         self.assertEqual(response.payload, expected_processed_payload)
 
+    def test_constant_number_of_queries(self):
+        """The number of queries doesn't depend on the number of evaluated
+        functions
+        """
+        context = {'self': self.node1.id}
+        single_payload = {'node1': {'get_attribute': ['SELF', 'key1']}}
+        payload = {
+            'node{0}_{1}'.format(node, i): {
+                'get_attribute': ['node{0}'.format(node),
+                                  'key{0}'.format(node)]}
+            for node in (1, 2, 3, 4, 6) for i in range(5)
+        }
+        # The first evaluation also lazy loads what's kept for the following
+        # ones (e.g. the roles of the user), so it isn't compared
+        self._count_queries(context, single_payload)
+        self.assertEqual(self._count_queries(context, single_payload),
+                         self._count_queries(context, payload))
+
+    def _count_queries(self, context, payload):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            self.client.evaluate.functions(self.id_, context, payload)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        return len(statements)
+
     def test_missing_self(self):
         payload = {
             'node1': {'get_attribute': ['SELF', 'key1']},
@@ -14,13 +14,17 @@
 #  * limitations under the License.
 
 import os
+import json
 import tempfile
 import shutil
 
+from mock import Mock
 from nose.plugins.attrib import attr
 
-from manager_rest import archiving
+from manager_rest import archiving, manager_exceptions
+from manager_rest.resource_manager import get_resource_manager
 from manager_rest.storage import FileServer
+from manager_rest.storage.plan_cache import plan_cache
 from manager_rest.test import base_test
 from cloudify_rest_client.exceptions import CloudifyClientError
 from .test_utils import generate_progress_func
@@ -119,6 +123,58 @@ class BlueprintsTestCase(base_test.BaseServerTestCase):
         resp = self.delete('/blueprints/nonexistent-blueprint')
         self.assertEquals(404, resp.status_code)
 
+    def test_plan_cache(self):
+        blueprint = self._add_blueprint()
+        self.assertEqual({'name': 'my-bp'}, plan_cache.get(blueprint))
+        self.assertEqual({'name': 'my-bp'}, plan_cache.get(blueprint))
+        self.assertEqual(1, plan_cache.misses)
+        self.assertEqual(1, plan_cache.hits)
+        self.assertEqual(1, len(plan_cache))
+
+        # an updated blueprint gets a new entry
+        blueprint.plan = {'name': 'my-updated-bp'}
+        blueprint.updated_at = '2030-01-01T00:00:00.000Z'
+        self.sm.update(blueprint)
+        self.assertEqual({'name': 'my-updated-bp'},
+                         plan_cache.get(blueprint))
+        self.assertEqual(2, plan_cache.misses)
+
+        # a deleted blueprint's entries are removed
+        get_resource_manager().delete_blueprint(blueprint.id)
+        self.assertEqual(0, len(plan_cache))
+        self.assertEqual(0, plan_cache.size)
+
+    def test_plan_cache_deleted_blueprint(self):
+        blueprint = self._add_blueprint()
+        deleted = Mock(_storage_id=blueprint._storage_id,
+                       updated_at=blueprint.updated_at)
+        self.sm.delete(blueprint)
+        self.assertRaises(manager_exceptions.NotFoundError,
+                          plan_cache.get, deleted)
+        self.assertEqual(0, len(plan_cache))
+
+    def test_plan_cache_size(self):
+        blueprints = [self._add_blueprint() for _ in range(3)]
+        plan_cache.get(blueprints[0])
+        entry_size = plan_cache.size
+        self.server_configuration.blueprint_plan_cache_size = entry_size * 2
+        for blueprint in blueprints:
+            plan_cache.get(blueprint)
+        # the least recently used plan was evicted
+        self.assertEqual(2, len(plan_cache))
+        self.assertEqual(entry_size * 2, plan_cache.size)
+        plan_cache.get(blueprints[0])
+        self.assertEqual(4, plan_cache.misses)
+
+    def test_plan_cache_entry_size(self):
+        # the size of a plan is its uncompressed size, which is what its
+        # deserialized form takes in memory
+        blueprint = self._add_blueprint()
+        blueprint.plan = {'name': 'my-bp', 'description': 'a' * 10000}
+        self.sm.update(blueprint)
+        plan_cache.get(blueprint)
+        self.assertEqual(len(json.dumps(blueprint.plan)), plan_cache.size)
+
     def test_zipped_plugin(self):
         self.put_file(*self.put_blueprint_args())
         self.check_if_resource_on_fileserver('hello_world',
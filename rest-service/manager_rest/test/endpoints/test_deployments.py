@@ -17,10 +17,13 @@ import errno
 import os
 import uuid
 
+from mock import patch
 from nose.plugins.attrib import attr
 
 from manager_rest.test import base_test
 from manager_rest import manager_exceptions
+from manager_rest.storage import models
+from manager_rest.storage.models_states import ExecutionState
 from manager_rest.constants import DEFAULT_TENANT_NAME
 
 from cloudify_rest_client.exceptions import CloudifyClientError
@@ -299,6 +302,54 @@ class DeploymentsTestCase(base_test.BaseServerTestCase):
             resp.json['error_code'],
             manager_exceptions.NotFoundError.NOT_FOUND_ERROR_CODE)
 
+    def test_delete_deployment_waits_for_workflows(self):
+        (blueprint_id, deployment_id, blueprint_response,
+         deployment_response) = self.put_deployment(self.DEPLOYMENT_ID)
+
+        # the deletion workflow is still running when the request returns
+        with patch('manager_rest.test.mocks.task_state',
+                   return_value=ExecutionState.STARTED):
+            resp = self.delete('/deployments/{0}'.format(deployment_id),
+                               query_params={'_async': 'true'})
+        self.assertEquals(202, resp.status_code)
+        self.assertEquals(deployment_id, resp.json['id'])
+        resp = self.get('/deployments/{0}'.format(deployment_id))
+        self.assertEquals(200, resp.status_code)
+
+        # no executions can be started (or queued) meanwhile
+        for params in ({'force': True}, {'queue': True}):
+            params.update(deployment_id=deployment_id, workflow_id='install')
+            resp = self.post('/executions', params)
+            self.assertEquals(400, resp.status_code)
+            self.assertEquals(
+                manager_exceptions.DeploymentDeletionInProgressError
+                .DEPLOYMENT_DELETION_IN_PROGRESS_ERROR_CODE,
+                resp.json['error_code'])
+
+        # terminating it starts the logs deletion (which the mock celery
+        # client terminates right away), and then deletes the deployment
+        execution = self.sm.list(
+            models.Execution,
+            filters={'workflow_id': 'delete_deployment_environment'}
+        ).items[0]
+        self.client.executions.update(execution.id,
+                                      ExecutionState.TERMINATED)
+        resp = self.get('/deployments/{0}'.format(deployment_id))
+        self.assertEquals(404, resp.status_code)
+
+    def test_delete_deployment_pending_without_async(self):
+        (blueprint_id, deployment_id, blueprint_response,
+         deployment_response) = self.put_deployment(self.DEPLOYMENT_ID)
+
+        # clients that don't pass _async only accept 200
+        with patch('manager_rest.test.mocks.task_state',
+                   return_value=ExecutionState.STARTED):
+            resp = self.delete('/deployments/{0}'.format(deployment_id))
+        self.assertEquals(200, resp.status_code)
+        self.assertEquals(deployment_id, resp.json['id'])
+        resp = self.get('/deployments/{0}'.format(deployment_id))
+        self.assertEquals(200, resp.status_code)
+
     def test_get_nodes_of_deployment(self):
 
         (blueprint_id, deployment_id, blueprint_response,
@@ -411,6 +462,37 @@ class DeploymentsTestCase(base_test.BaseServerTestCase):
         self.assertEqual(8080, endpoint['port'])
         self.assertEqual(81, outputs['port2'])
 
+    def test_outputs_etag(self):
+        id_ = str(uuid.uuid4())
+        self.put_deployment(
+            blueprint_file_name='blueprint_with_outputs.yaml',
+            blueprint_id=id_,
+            deployment_id=id_)
+        instances = self.client.node_instances.list(deployment_id=id_)
+        vm = [x for x in instances if x.node_id == 'vm'][0]
+        self.client.node_instances.update(
+            vm.id, runtime_properties={'ip': '10.0.0.1'})
+
+        outputs_url = '/deployments/{0}/outputs'.format(id_)
+        response = self.get(outputs_url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('10.0.0.1', response.json['outputs']['ip_address'])
+        etag = response.headers['ETag']
+
+        # The body of a 304 response is empty, so it isn't parsed
+        response = self.app.get(self._version_url(outputs_url),
+                                headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response.headers['ETag'])
+
+        # Updating a node instance invalidates the cached outputs
+        self.client.node_instances.update(
+            vm.id, runtime_properties={'ip': '10.0.0.2'}, version=2)
+        response = self.get(outputs_url, headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers['ETag'])
+        self.assertEqual('10.0.0.2', response.json['outputs']['ip_address'])
+
     def test_illegal_output(self):
         id_ = str(uuid.uuid4())
         self.put_deployment(
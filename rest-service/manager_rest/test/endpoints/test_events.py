@@ -12,6 +12,7 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import json
 from collections import namedtuple
 from copy import deepcopy
 from datetime import datetime
@@ -22,6 +23,7 @@ from nose.plugins.attrib import attr
 
 from manager_rest.manager_exceptions import BadParametersError
 from manager_rest.rest.resources_v1 import Events
+from manager_rest.storage import db, models
 from manager_rest.test import base_test
 
 
@@ -94,7 +96,7 @@ class BuildSelectQueryTest(TestCase):
         ]
         self.db.session.query().filter().column_descriptions = (
             column_descriptions)
-        self.db.session.query().filter().union().column_descriptions = (
+        self.db.session.query().filter().union_all().column_descriptions = (
             column_descriptions)
         self.addCleanup(db_patcher.stop)
 
@@ -102,7 +104,7 @@ class BuildSelectQueryTest(TestCase):
         """Query against events table."""
         Events._build_select_query(**self.DEFAULT_PARAMS)
         self.assertLessEqual(
-            self.db.session.query().filter().union.call_count,
+            self.db.session.query().filter().union_all.call_count,
             1,
         )
 
@@ -112,7 +114,7 @@ class BuildSelectQueryTest(TestCase):
         params['filters']['type'].append('cloudify_log')
         Events._build_select_query(**params)
         self.assertGreater(
-            self.db.session.query().filter().union.call_count,
+            self.db.session.query().filter().union_all.call_count,
             1,
         )
 
@@ -137,6 +139,18 @@ class BuildSelectQueryTest(TestCase):
         with self.assertRaises(BadParametersError):
             Events._build_select_query(**params)
 
+    def test_projection(self):
+        """Only the columns needed for the projection are selected."""
+        self.assertEqual(
+            Events._get_selected_columns(
+                ['message', '@timestamp', 'unknown'], {'node_id': 'asc'}),
+            ['timestamp', 'message', 'node_id', 'type'],
+        )
+        self.assertEqual(
+            Events._get_selected_columns(None, {}),
+            Events.COLUMNS,
+        )
+
 
 @attr(client_min_version=1, client_max_version=base_test.LATEST_API_VERSION)
 class BuildCountQueryTest(TestCase):
@@ -154,21 +168,34 @@ class BuildCountQueryTest(TestCase):
         self.db = db_patcher.start()
         self.addCleanup(db_patcher.stop)
 
+    # Events are only counted when range filters are used, otherwise the
+    # event counters are used. The range filter is applied in a second
+    # `filter` call, after the join clauses
+    RANGE_FILTERS = {
+        'timestamp': {'from': '2016-12-09T00:00Z'},
+    }
+
     def test_from_events(self):
         """Query against events table."""
         filters = {'type': ['cloudify_event']}
-        range_filters = {}
-        Events._build_count_query(filters, range_filters)
+        Events._build_count_query(filters, self.RANGE_FILTERS)
         self.assertEqual(
-            self.db.session.query().filter().subquery.call_count, 1)
+            self.db.session.query().filter().filter().subquery.call_count, 1)
 
     def test_from_logs(self):
         """Query against both events and logs tables."""
         filters = {'type': ['cloudify_event', 'cloudify_log']}
+        Events._build_count_query(filters, self.RANGE_FILTERS)
+        self.assertEqual(
+            self.db.session.query().filter().filter().subquery.call_count, 2)
+
+    def test_from_counters(self):
+        """Query against the event counters table."""
+        filters = {'type': ['cloudify_event', 'cloudify_log']}
         range_filters = {}
         Events._build_count_query(filters, range_filters)
         self.assertEqual(
-            self.db.session.query().filter().subquery.call_count, 2)
+            self.db.session.query().filter().filter().subquery.call_count, 0)
 
     def test_filter_required(self):
         """Filter parameter is expected to be dictionary."""
@@ -263,3 +290,216 @@ class MapEventToEsTest(TestCase):
         es_log = Events._map_event_to_es(None, sql_log)
 
         self.assertDictEqual(es_log, expected_es_log)
+
+    def test_map_projected_event(self):
+        """Map event with only some of the columns selected."""
+        class ProjectedEventResult(
+                namedtuple('ProjectedEventResult', ['message', 'type'])):
+            def keys(self):
+                return self._fields
+
+        sql_event = ProjectedEventResult(
+            message='<message>',
+            type='cloudify_event',
+        )
+        expected_es_event = {
+            'message': {
+                'arguments': None,
+                'text': '<message>',
+            },
+        }
+
+        es_event = Events._map_event_to_es(['message'], sql_event)
+        self.assertDictEqual(es_event, expected_es_event)
+
+
+@attr(client_min_version=2, client_max_version=base_test.LATEST_API_VERSION)
+class EventsTailTest(base_test.BaseServerTestCase):
+
+    """Get the events of an execution following a high-water mark."""
+
+    def setUp(self):
+        super(EventsTailTest, self).setUp()
+        deployment = self._add_deployment(self._add_blueprint())
+        self.execution = self._add_execution(deployment)
+
+    def _add_event(self, model, timestamp, message):
+        # Events aren't connected to a tenant directly, so they're added to
+        # the session rather than with sm.put
+        event = model(timestamp=timestamp, message=message)
+        event.execution = self.execution
+        db.session.add(event)
+        db.session.commit()
+        return event
+
+    def _tail(self, **params):
+        params['execution_id'] = self.execution.id
+        response = self.get('/events/tail', query_params=params)
+        self.assertEqual(200, response.status_code)
+        return response.json
+
+    def test_tail(self):
+        """Only records following the mark are returned."""
+        self._add_event(models.Event, datetime(2017, 1, 1), 'first')
+        self._add_event(models.Log, datetime(2017, 1, 1), 'second')
+        self._add_event(models.Event, datetime(2017, 1, 2), 'third')
+
+        result = self._tail(include_logs=True, _size=2)
+        self.assertEqual(
+            ['first', 'second'],
+            [event['message']['text'] for event in result['items']])
+        self.assertEqual(
+            'cloudify_log', result['metadata']['tail']['since_type'])
+
+        result = self._tail(include_logs=True, **result['metadata']['tail'])
+        self.assertEqual(
+            ['third'],
+            [event['message']['text'] for event in result['items']])
+        self.assertEqual(
+            self.execution.deployment_id,
+            result['items'][0]['context']['deployment_id'])
+
+        tail = result['metadata']['tail']
+        result = self._tail(include_logs=True, **tail)
+        self.assertEqual([], result['items'])
+        self.assertEqual(tail, result['metadata']['tail'])
+
+    def test_tail_without_logs(self):
+        """Logs are only returned when requested."""
+        self._add_event(models.Event, datetime(2017, 1, 1), 'event')
+        self._add_event(models.Log, datetime(2017, 1, 1), 'log')
+
+        result = self._tail()
+        self.assertEqual(
+            ['event'],
+            [event['message']['text'] for event in result['items']])
+
+
+@attr(client_min_version=2, client_max_version=base_test.LATEST_API_VERSION)
+class EventCountsTest(base_test.BaseServerTestCase):
+
+    """Count events using the per-execution counters."""
+
+    def setUp(self):
+        super(EventCountsTest, self).setUp()
+        deployment = self._add_deployment(self._add_blueprint())
+        self.execution = self._add_execution(deployment)
+
+    def _add_event(self, model, timestamp):
+        # Events aren't connected to a tenant directly, so they're added to
+        # the session rather than with sm.put
+        event = model(timestamp=timestamp)
+        event.execution = self.execution
+        db.session.add(event)
+        db.session.commit()
+        return event
+
+    def _get_total(self, event_types):
+        response = self.get('/events', query_params={
+            'execution_id': self.execution.id,
+            'type': event_types,
+        })
+        return response.json['metadata']['pagination']['total']
+
+    def test_counters(self):
+        """Counters are updated on insert and delete."""
+        self._add_event(models.Event, datetime(2017, 1, 1))
+        self._add_event(models.Event, datetime(2017, 1, 2))
+        log = self._add_event(models.Log, datetime(2017, 1, 3))
+
+        counts = models.EventCounts.query.all()
+        self.assertEqual(1, len(counts))
+        self.assertEqual(2, counts[0].events)
+        self.assertEqual(1, counts[0].logs)
+        self.assertEqual(2, self._get_total(['cloudify_event']))
+        self.assertEqual(
+            3, self._get_total(['cloudify_event', 'cloudify_log']))
+
+        self.sm.delete(log)
+        self.assertEqual(
+            2, self._get_total(['cloudify_event', 'cloudify_log']))
+
+    def test_projected_duplicates(self):
+        """Rows that are identical once projected are all returned."""
+        for model in (models.Event, models.Event, models.Log):
+            self._add_event(model, datetime(2017, 1, 1))
+        response = self.get('/events', query_params={
+            'execution_id': self.execution.id,
+            'type': ['cloudify_event', 'cloudify_log'],
+            '_include': 'message,type',
+        })
+        self.assertEqual(3, response.json['metadata']['pagination']['total'])
+        self.assertEqual(3, len(response.json['items']))
+
+
+@attr(client_min_version=2, client_max_version=base_test.LATEST_API_VERSION)
+class EventsBulkTest(base_test.BaseServerTestCase):
+
+    """Store batches of events and logs."""
+
+    def setUp(self):
+        super(EventsBulkTest, self).setUp()
+        deployment = self._add_deployment(self._add_blueprint())
+        self.execution = self._add_execution(deployment)
+
+    def _post_batch(self, items):
+        data = '\n'.join(json.dumps(item) for item in items)
+        response = self.app.post(self._version_url('/events/bulk'),
+                                 content_type='application/x-ndjson',
+                                 data=data)
+        response.json = json.loads(response.data)
+        return response
+
+    def test_bulk(self):
+        """Events and logs are stored with the execution they belong to."""
+        context = {'execution_id': self.execution.id, 'node_id': 'node'}
+        response = self._post_batch([
+            {'type': 'cloudify_event', 'timestamp': '2017-01-01T00:00:00Z',
+             'event_type': 'task_started', 'message': {'text': 'event'},
+             'context': context},
+            {'type': 'cloudify_log', 'timestamp': '2017-01-01T00:00:01Z',
+             'level': 'info', 'logger': 'logger', 'message': {'text': 'log'},
+             'context': context},
+        ])
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(1, response.json['events'])
+        self.assertEqual(1, response.json['logs'])
+
+        event = models.Event.query.one()
+        self.assertEqual('event', event.message)
+        self.assertEqual('node', event.node_id)
+        self.assertEqual(self.execution.id, event.execution_id)
+        log = models.Log.query.one()
+        self.assertEqual('info', log.level)
+
+    def test_bulk_unknown_execution(self):
+        """Nothing is stored if an execution isn't found."""
+        response = self._post_batch([
+            {'timestamp': '2017-01-01T00:00:00Z',
+             'context': {'execution_id': 'unknown'}},
+        ])
+        self.assertEqual(404, response.status_code)
+        self.assertEqual(0, models.Event.query.count())
+
+    def test_bulk_invalid_line(self):
+        """Invalid lines are rejected."""
+        response = self.app.post(self._version_url('/events/bulk'),
+                                 data='{"timestamp": ')
+        self.assertEqual(400, response.status_code)
+
+    def test_bulk_invalid_fields(self):
+        """Items with invalid fields are rejected with their line number."""
+        context = {'execution_id': self.execution.id}
+        valid = {'timestamp': '2017-01-01T00:00:00Z', 'context': context}
+        invalid_items = [
+            {'timestamp': 'not a timestamp', 'context': context},
+            {'timestamp': 1483228800, 'context': context},
+            {'timestamp': '2017-01-01T00:00:00Z', 'context': 'context'},
+            {'timestamp': '2017-01-01T00:00:00Z', 'context': context,
+             'type': 'unknown'},
+        ]
+        for item in invalid_items:
+            response = self._post_batch([valid, item])
+            self.assertEqual(400, response.status_code)
+            self.assertIn('Line 2', response.json['message'])
+        self.assertEqual(0, models.Event.query.count())
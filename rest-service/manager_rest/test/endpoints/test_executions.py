@@ -17,16 +17,20 @@ from itertools import dropwhile
 
 import mock
 from nose.plugins.attrib import attr
+from sqlalchemy import event
 
 from cloudify_rest_client import exceptions
 
-from manager_rest import utils
-from manager_rest.storage import models
+from manager_rest import utils, config
+from manager_rest.storage import db, models
 from manager_rest import manager_exceptions
+from manager_rest.resource_manager import get_resource_manager
 from manager_rest.test.base_test import BaseServerTestCase
 from manager_rest.test.base_test import LATEST_API_VERSION
 from manager_rest.storage.models_states import ExecutionState
 
+ENDED_EXECUTIONS = 200
+
 
 @attr(client_min_version=1, client_max_version=LATEST_API_VERSION)
 class ExecutionsTestCase(BaseServerTestCase):
@@ -697,6 +701,224 @@ class ExecutionsTestCase(BaseServerTestCase):
             except exceptions.CloudifyClientError, e:
                 self.assertEqual(expected_status_code, e.status_code)
 
+    def test_active_executions_checks(self):
+        (_, deployment_id, _, _) = self.put_deployment(self.DEPLOYMENT_ID)
+        rm = get_resource_manager()
+        rm._check_for_any_active_executions()
+        rm._check_for_active_system_wide_execution()
+        rm._check_for_active_executions(deployment_id, force=False)
+
+        execution = self.client.executions.start(deployment_id, 'install')
+        self._modify_execution_status_in_database(
+            execution=execution,
+            new_status=ExecutionState.STARTED)
+        with self.assertRaisesRegexp(
+                manager_exceptions.ExistingRunningExecutionError,
+                execution.id):
+            rm._check_for_any_active_executions()
+        with self.assertRaisesRegexp(
+                manager_exceptions.ExistingRunningExecutionError,
+                execution.id):
+            rm._check_for_active_executions(deployment_id, force=False)
+        rm._check_for_active_executions(deployment_id, force=True)
+        # The execution isn't system-wide
+        rm._check_for_active_system_wide_execution()
+
+    def test_active_executions_checks_single_query(self):
+        """Each check for active executions done when starting an execution
+        is a single query, regardless of the number of ended executions
+        """
+        (_, deployment_id, _, _) = self.put_deployment(self.DEPLOYMENT_ID)
+        deployment = self.sm.get(models.Deployment, deployment_id)
+        for i in range(ENDED_EXECUTIONS):
+            execution = models.Execution(
+                id='ended_execution_{0}'.format(i),
+                status=ExecutionState.TERMINATED,
+                workflow_id='install',
+                created_at=utils.get_formatted_timestamp(),
+                error='',
+                parameters=dict(),
+                is_system_workflow=False)
+            execution.deployment = deployment
+            self.sm.put(execution)
+
+        rm = get_resource_manager()
+        checks = [
+            rm._check_for_any_active_executions,
+            rm._check_for_active_system_wide_execution,
+            lambda: rm._check_for_active_executions(
+                deployment_id, force=False)
+        ]
+        for check in checks:
+            # Load the current user and tenant before counting queries
+            check()
+            statements = []
+
+            def count(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(db.engine, 'before_cursor_execute', count)
+            try:
+                check()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count)
+            self.assertEqual(1, len(statements))
+
+    def test_queue_execution(self):
+        (_, deployment_id, _, _) = self.put_deployment(self.DEPLOYMENT_ID)
+        execution = self.client.executions.start(deployment_id, 'install')
+        self._modify_execution_status_in_database(
+            execution=execution,
+            new_status=ExecutionState.STARTED)
+
+        response = self.post('/executions', {
+            'deployment_id': deployment_id,
+            'workflow_id': 'install'
+        })
+        self.assertEqual(400, response.status_code)
+        response = self.post('/executions', {
+            'deployment_id': deployment_id,
+            'workflow_id': 'install',
+            'queue': True
+        })
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(ExecutionState.QUEUED, response.json['status'])
+        queued_id = response.json['id']
+
+        # Ending the blocking execution starts the queued one (which the
+        # mock celery client ends right away)
+        self._modify_execution_status(execution.id, ExecutionState.TERMINATED)
+        self.assertEqual(ExecutionState.TERMINATED,
+                         self.client.executions.get(queued_id).status)
+
+    def test_cancel_queued_execution(self):
+        (_, deployment_id, _, _) = self.put_deployment(self.DEPLOYMENT_ID)
+        execution = self.client.executions.start(deployment_id, 'install')
+        self._modify_execution_status_in_database(
+            execution=execution,
+            new_status=ExecutionState.STARTED)
+        queued_ids = [
+            self.post('/executions', {
+                'deployment_id': deployment_id,
+                'workflow_id': 'install',
+                'queue': True
+            }).json['id'] for _index in range(2)]
+
+        cancelled = self.client.executions.cancel(queued_ids[0])
+        self.assertEqual(ExecutionState.CANCELLED, cancelled.status)
+        # The other queued execution is still blocked by the running one
+        self.assertEqual(ExecutionState.QUEUED,
+                         self.client.executions.get(queued_ids[1]).status)
+
+    def test_max_concurrent_executions(self):
+        (_, first_deployment_id, _, _) = self.put_deployment('first')
+        (_, second_deployment_id, _, _) = self.put_deployment(
+            'second', blueprint_id='second')
+        execution = self.client.executions.start(first_deployment_id,
+                                                 'install')
+        self._modify_execution_status_in_database(
+            execution=execution,
+            new_status=ExecutionState.STARTED)
+
+        with mock.patch.object(config.instance,
+                               'max_concurrent_executions_per_tenant', 1):
+            response = self.post('/executions', {
+                'deployment_id': second_deployment_id,
+                'workflow_id': 'install'
+            })
+            self.assertEqual(400, response.status_code)
+            response = self.post('/executions', {
+                'deployment_id': second_deployment_id,
+                'workflow_id': 'install',
+                'queue': True
+            })
+            self.assertEqual(ExecutionState.QUEUED, response.json['status'])
+            self._modify_execution_status(execution.id,
+                                          ExecutionState.TERMINATED)
+        self.assertEqual(
+            ExecutionState.TERMINATED,
+            self.client.executions.get(response.json['id']).status)
+
+    def test_concurrent_executions_end(self):
+        """Executions ending at the same time start no more queued
+        executions than the caps allow
+        """
+        deployment_ids = [self.put_deployment(
+            'deployment{0}'.format(index),
+            blueprint_id='blueprint{0}'.format(index))[1]
+            for index in range(4)]
+        running = [self.client.executions.start(deployment_id, 'install')
+                   for deployment_id in deployment_ids[:2]]
+        for execution in running:
+            self._modify_execution_status_in_database(
+                execution=execution,
+                new_status=ExecutionState.STARTED)
+
+        with mock.patch.object(config.instance,
+                               'max_concurrent_executions', 1):
+            queued_ids = [self.post('/executions', {
+                'deployment_id': deployment_id,
+                'workflow_id': 'install',
+                'queue': True
+            }).json['id'] for deployment_id in deployment_ids[2:]]
+            for execution in running:
+                self._modify_execution_status_in_database(
+                    execution=execution,
+                    new_status=ExecutionState.TERMINATED)
+
+            rm = get_resource_manager()
+            lock = mock.Mock()
+            # The other end takes the scheduling lock first, and starts
+            # a queued execution before this one counts the running ones
+            lock.side_effect = lambda: (
+                lock.call_count == 1 and rm.start_queued_executions())
+            with mock.patch.object(rm, '_lock_execution_scheduling', lock), \
+                    mock.patch('manager_rest.workflow_executor.'
+                               'execute_workflow') as execute:
+                rm.start_queued_executions()
+
+        self.assertEqual(1, execute.call_count)
+        statuses = [self.client.executions.get(execution_id).status
+                    for execution_id in queued_ids]
+        self.assertEqual([ExecutionState.PENDING, ExecutionState.QUEUED],
+                         statuses)
+
+    def test_queued_execution_not_blocked(self):
+        """An execution that was queued after the executions blocking it
+        ended is started right away
+        """
+        (_, deployment_id, _, _) = self.put_deployment(self.DEPLOYMENT_ID)
+        with mock.patch(
+                'manager_rest.resource_manager.ResourceManager.'
+                '_check_for_active_executions',
+                side_effect=manager_exceptions.ExistingRunningExecutionError(
+                    'blocked')):
+            response = self.post('/executions', {
+                'deployment_id': deployment_id,
+                'workflow_id': 'install',
+                'queue': True
+            })
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(
+            ExecutionState.TERMINATED,
+            self.client.executions.get(response.json['id']).status)
+
+    def test_start_queued_executions_failure(self):
+        """Failing to start the queued executions doesn't fail the status
+        update of the execution that ended
+        """
+        (_, deployment_id, _, _) = self.put_deployment(self.DEPLOYMENT_ID)
+        execution = self.client.executions.start(deployment_id, 'install')
+        self._modify_execution_status_in_database(
+            execution=execution,
+            new_status=ExecutionState.STARTED)
+        with mock.patch(
+                'manager_rest.resource_manager.ResourceManager.'
+                '_start_queued_executions',
+                side_effect=RuntimeError('failed')):
+            self._modify_execution_status(execution.id,
+                                          ExecutionState.TERMINATED)
+
     def test_get_non_existent_execution(self):
         resource_path = '/executions/idonotexist'
         response = self.get(resource_path)
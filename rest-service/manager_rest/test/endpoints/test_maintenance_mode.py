@@ -112,6 +112,17 @@ class MaintenanceModeTest(BaseServerTestCase):
         self.assertRaises(exceptions.MaintenanceModeActiveError,
                           internal_request_client.blueprints.list)
 
+    def test_maintenance_state_cached(self):
+        self._activate_maintenance_mode()
+        with patch('manager_rest.maintenance.utils.read_json_file') as read:
+            self.assertRaises(exceptions.MaintenanceModeActiveError,
+                              self.client.blueprints.list)
+            self.client.maintenance_mode.status()
+        self.assertFalse(read.called)
+
+        self.client.maintenance_mode.deactivate()
+        self.client.blueprints.list()
+
     def test_multiple_maintenance_mode_activations(self):
         self._activate_maintenance_mode()
         try:
@@ -15,7 +15,6 @@
 from datetime import datetime
 
 from nose.plugins.attrib import attr
-from unittest import skip
 
 from cloudify_rest_client.exceptions import CloudifyClientError
 
@@ -132,7 +131,6 @@ class NodesTest(base_test.BaseServerTestCase):
         self.assertEqual('ddd', response.json['runtime_properties']['ccc'])
         self.assertEqual('b-state', response.json['state'])
 
-    @skip('Deprecated since using sqlalchemy locking mechanism')
     def test_old_version(self):
         """Can't update a node instance passing new version != old version."""
         node_instance_id = '1234'
@@ -151,6 +149,25 @@ class NodesTest(base_test.BaseServerTestCase):
                 runtime_properties={'key': 'new value'})
         self.assertEqual(cm.exception.status_code, 409)
 
+    def test_update_versioned_conflict(self):
+        """An update based on a stale version isn't written."""
+        self.put_node_instance(
+            instance_id='1234',
+            deployment_id='111',
+            runtime_properties={'key': 'value'}
+        )
+        instance = self.sm.get(NodeInstance, '1234')
+        self.sm.update_versioned(instance, 1, {'state': 'started'})
+        self.assertEqual(2, instance.version)
+        self.assertEqual('started', instance.state)
+
+        with self.assertRaises(manager_exceptions.ConflictError):
+            self.sm.update_versioned(
+                instance, 1, {'runtime_properties': {'key': 'new value'}})
+        instance = self.sm.get(NodeInstance, '1234')
+        self.assertEqual(2, instance.version)
+        self.assertEqual({'key': 'value'}, instance.runtime_properties)
+
     def test_patch_node(self):
         """Getting an instance after updating it, returns the updated data."""
         node_instance_id = '1234'
@@ -201,6 +218,111 @@ class NodesTest(base_test.BaseServerTestCase):
         self.assertEqual('bbb', response.runtime_properties['aaa'])
         self.assertNotIn('key', response.runtime_properties)
 
+    def test_patch_node_runtime_props_merge_patch(self):
+        """A runtime properties patch is merged with the existing ones."""
+        self.put_node_instance(
+            instance_id='1234',
+            deployment_id='111',
+            runtime_properties={
+                'key': 'value',
+                'removed': 'value',
+                'nested': {'a': 1, 'b': 2}
+            }
+        )
+        response = self.patch('/node-instances/1234', {
+            'version': 1,
+            'runtime_properties_patch': {
+                'new_key': 'new_value',
+                'removed': None,
+                'nested': {'b': None, 'c': 3}
+            }
+        })
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({
+            'key': 'value',
+            'new_key': 'new_value',
+            'nested': {'a': 1, 'c': 3}
+        }, response.json['runtime_properties'])
+        self.assertEqual(2, response.json['version'])
+
+        response = self.get('/node-instances/1234')
+        self.assertEqual('new_value',
+                         response.json['runtime_properties']['new_key'])
+
+    def test_patch_node_runtime_props_invalid_merge_patch(self):
+        self.put_node_instance(
+            instance_id='1234',
+            deployment_id='111',
+            runtime_properties={'key': 'value'}
+        )
+        response = self.patch('/node-instances/1234', {
+            'version': 1,
+            'runtime_properties': {'key': 'value'},
+            'runtime_properties_patch': {'key': None}
+        })
+        self.assertEqual(400, response.status_code)
+        response = self.patch('/node-instances/1234', {
+            'version': 1,
+            'runtime_properties_patch': ['key']
+        })
+        self.assertEqual(400, response.status_code)
+
+    @attr(client_min_version=2.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_bulk_patch_node_instances(self):
+        for instance_id in ('1', '2', '3'):
+            self.put_node_instance(
+                instance_id=instance_id,
+                deployment_id='111',
+                runtime_properties={'key': 'value'}
+            )
+        response = self.patch('/node-instances', [
+            {'id': '1', 'version': 1, 'state': 'started',
+             'runtime_properties': {'new_key': 'new_value'}},
+            {'id': '2', 'version': 1,
+             'runtime_properties_patch': {'key': None, 'a': 1}},
+            {'id': '3', 'version': 2, 'state': 'started'},
+            {'id': '4', 'version': 1}
+        ])
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([
+            {'id': '1', 'status': 'updated', 'version': 2},
+            {'id': '2', 'status': 'updated', 'version': 2},
+            {'id': '3', 'status': 'conflict', 'version': 1},
+            {'id': '4', 'status': 'not_found'}
+        ], response.json['items'])
+
+        instance = self.get('/node-instances/1').json
+        self.assertEqual('started', instance['state'])
+        self.assertEqual({'new_key': 'new_value'},
+                         instance['runtime_properties'])
+        instance = self.get('/node-instances/2').json
+        self.assertEqual({'a': 1}, instance['runtime_properties'])
+        instance = self.get('/node-instances/3').json
+        self.assertNotEqual('started', instance['state'])
+        self.assertEqual(1, instance['version'])
+
+    @attr(client_min_version=2.1,
+          client_max_version=base_test.LATEST_API_VERSION)
+    def test_bulk_patch_node_instances_invalid(self):
+        self.put_node_instance(instance_id='1', deployment_id='111')
+        invalid_bodies = [
+            {'id': '1', 'version': 1},
+            [],
+            ['1'],
+            [{'version': 1}],
+            [{'id': '1'}],
+            [{'id': '1', 'version': '1'}],
+            [{'id': '1', 'version': 1}, {'id': '1', 'version': 1}],
+            [{'id': '1', 'version': 1, 'runtime_properties': ['a']}],
+            [{'id': '1', 'version': 1, 'runtime_properties': {},
+              'runtime_properties_patch': {}}],
+        ]
+        for body in invalid_bodies:
+            response = self.patch('/node-instances', body)
+            self.assertEqual(400, response.status_code, body)
+        self.assertEqual(1, self.get('/node-instances/1').json['version'])
+
     def test_patch_node_runtime_props_overwrite(self):
         """Runtime properties update with a preexisting key keeps the new value.
 
@@ -242,12 +364,12 @@ class NodesTest(base_test.BaseServerTestCase):
 
     def test_patch_node_conflict(self):
         """A conflict inside the storage manager propagates to the client."""
-        # patch the storage manager .update_node_instance method to throw an
+        # patch the storage manager .update_versioned method to throw an
         # error - remember to revert it after the test
         def _revert_update_node_func(func):
-            self.sm.update = func
+            self.sm.update_versioned = func
 
-        def conflict_update_node_func(node):
+        def conflict_update_node_func(node, version, values):
             raise manager_exceptions.ConflictError()
 
         node_instance_id = '1234'
@@ -259,14 +381,14 @@ class NodesTest(base_test.BaseServerTestCase):
             }
         )
 
-        self.addCleanup(_revert_update_node_func, self.sm.update)
-        self.sm.update = conflict_update_node_func
+        self.addCleanup(_revert_update_node_func, self.sm.update_versioned)
+        self.sm.update_versioned = conflict_update_node_func
 
         with self.assertRaises(CloudifyClientError) as cm:
             self.client.node_instances.update(
                 node_instance_id,
                 runtime_properties={'key': 'new_value'},
-                version=2
+                version=1
             )
 
         self.assertEqual(cm.exception.status_code, 409)
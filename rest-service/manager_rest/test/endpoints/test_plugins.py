@@ -17,7 +17,6 @@ import os
 from mock import patch
 from nose.plugins.attrib import attr
 
-from manager_rest import manager_exceptions
 from manager_rest.test import base_test
 from manager_rest.test.base_test import BaseServerTestCase
 
@@ -168,21 +167,6 @@ class PluginsTest(BaseServerTestCase):
                          'plugin_installation_error')
         self.assertEqual(0, len(self.client.plugins.list()))
 
-    @attr(client_min_version=2,
-          client_max_version=base_test.LATEST_API_VERSION)
-    def test_install_timeout(self):
-        def raises(*args, **kwargs):
-            raise manager_exceptions.ExecutionTimeout('TIMEOUT')
-        patch_path = ('manager_rest.resource_manager.ResourceManager.'
-                      'install_plugin')
-        with patch(patch_path, raises):
-            response = self.upload_plugin(TEST_PACKAGE_NAME,
-                                          TEST_PACKAGE_VERSION)
-        self.assertEqual(response.status_code, 400)
-        self.assertEqual(response.json['error_code'],
-                         'plugin_installation_timeout')
-        self.assertEqual(1, len(self.client.plugins.list()))
-
     @attr(client_min_version=2.1,
           client_max_version=base_test.LATEST_API_VERSION)
     def test_uninstall_failure(self):
@@ -197,20 +181,6 @@ class PluginsTest(BaseServerTestCase):
                 self.client.plugins.delete(plugin_id)
         self.assertEqual(1, len(self.client.plugins.list()))
 
-    @attr(client_min_version=2.1,
-          client_max_version=base_test.LATEST_API_VERSION)
-    def test_uninstall_timeout(self):
-        def raises(*args, **kwargs):
-            raise manager_exceptions.ExecutionTimeout('TIMEOUT')
-        self.upload_plugin(TEST_PACKAGE_NAME, TEST_PACKAGE_VERSION)
-        plugin_id = self.client.plugins.list()[0].id
-        patch_path = ('manager_rest.resource_manager.ResourceManager.'
-                      'remove_plugin')
-        with patch(patch_path, raises):
-            with self.assertRaises(exceptions.PluginInstallationTimeout):
-                self.client.plugins.delete(plugin_id)
-        self.assertEqual(1, len(self.client.plugins.list()))
-
     @attr(client_min_version=3,
           client_max_version=base_test.LATEST_API_VERSION)
     def test_plugin_upload_progress(self):
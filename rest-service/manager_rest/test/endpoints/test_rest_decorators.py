@@ -58,6 +58,20 @@ class PaginateTest(TestCase):
             }
             paginate(verify)()
 
+    def test_cursor_and_count(self):
+        """Cursor is passed as is and count is coerced to a boolean."""
+        def verify(pagination):
+            self.assertEqual(pagination['cursor'], '')
+            self.assertFalse(pagination['count'])
+            return Mock()
+
+        with patch('manager_rest.rest.rest_decorators.request') as request:
+            request.args = {
+                '_cursor': '',
+                '_count': 'false',
+            }
+            paginate(verify)()
+
     def test_negative(self):
         """Exception raised when negative value is passed."""
         def verify(pagination):
@@ -15,9 +15,9 @@
 
 from nose.plugins.attrib import attr
 
-from manager_rest import utils
+from manager_rest import utils, manager_exceptions
 from manager_rest.test import base_test
-from manager_rest.storage import models
+from manager_rest.storage import db, models
 
 
 @attr(client_min_version=1, client_max_version=base_test.LATEST_API_VERSION)
@@ -189,3 +189,82 @@ class StorageManagerTests(base_test.BaseServerTestCase):
         self.assertFalse(hasattr(blueprint_restored, 'updated_at'))
         self.assertFalse(hasattr(blueprint_restored, 'plan'))
         self.assertFalse(hasattr(blueprint_restored, 'main_file_name'))
+
+    def _put_node(self, deployment, node_id='node-id'):
+        node = models.Node(id=node_id,
+                           type='cloudify.nodes.Root',
+                           number_of_instances=1,
+                           planned_number_of_instances=1,
+                           deploy_number_of_instances=1,
+                           min_number_of_instances=1,
+                           max_number_of_instances=1)
+        node.deployment = deployment
+        return self.sm.put(node)
+
+    def _node_instances(self, node, ids):
+        instances = []
+        for instance_id in ids:
+            instance = models.NodeInstance(id=instance_id,
+                                           state='uninitialized',
+                                           runtime_properties={})
+            instance._node_fk = node._storage_id
+            instances.append(instance)
+        return instances
+
+    def test_put_many(self):
+        deployment = self._add_deployment(self._add_blueprint())
+        node = self._put_node(deployment)
+        ids = ['node-id_{0}'.format(i) for i in range(5)]
+
+        self.sm.put_many(self._node_instances(node, ids))
+
+        instances = self.sm.list(models.NodeInstance,
+                                 filters={'deployment_id': deployment.id})
+        self.assertEquals(sorted(ids), sorted(i.id for i in instances))
+        for instance in instances:
+            self.assertEquals(node.id, instance.node_id)
+            self.assertEquals(1, instance.version)
+
+    def test_put_many_top_level(self):
+        now = utils.get_formatted_timestamp()
+        blueprints = [models.Blueprint(id='blueprint-{0}'.format(i),
+                                       created_at=now,
+                                       updated_at=now,
+                                       plan={'name': 'my-bp'},
+                                       main_file_name='aaa')
+                      for i in range(3)]
+
+        self.sm.put_many(blueprints)
+
+        blueprints = self.sm.list(models.Blueprint)
+        self.assertEquals(3, len(blueprints))
+        for blueprint in blueprints:
+            self.assertEquals(self.sm.current_tenant.id, blueprint._tenant_id)
+            self.assertIsNotNone(blueprint.creator)
+
+    def test_put_many_without_commit(self):
+        deployment = self._add_deployment(self._add_blueprint())
+        node = self._put_node(deployment)
+
+        self.sm.put_many(self._node_instances(node, ['node-id_1']),
+                         commit=False)
+        self.assertRaises(manager_exceptions.ConflictError,
+                          self.sm.put_many,
+                          self._node_instances(node, ['node-id_1']))
+        db.session.rollback()
+        self.assertEquals(0, len(self.sm.list(models.NodeInstance)))
+
+    def test_put_many_existing_id(self):
+        deployment = self._add_deployment(self._add_blueprint())
+        node = self._put_node(deployment)
+        self.sm.put_many(self._node_instances(node, ['node-id_1']))
+
+        self.assertRaises(manager_exceptions.ConflictError,
+                          self.sm.put_many,
+                          self._node_instances(node, ['node-id_1',
+                                                      'node-id_2']))
+        self.assertRaises(manager_exceptions.ConflictError,
+                          self.sm.put_many,
+                          self._node_instances(node, ['node-id_3',
+                                                      'node-id_3']))
+        self.assertEquals(1, len(self.sm.list(models.NodeInstance)))
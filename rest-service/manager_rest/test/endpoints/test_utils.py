@@ -14,13 +14,16 @@
 #  * limitations under the License.
 
 import os
+import json
 
 from mock import patch
 from nose.plugins.attrib import attr
 
 from manager_rest.utils import read_json_file, write_dict_to_json_file
+from manager_rest.utils import merge_patch
 from manager_rest.utils import plugin_installable_on_current_platform
 from manager_rest.test import base_test
+from manager_rest.rest.rest_utils import make_streaming_list_response
 from manager_rest.storage import models
 
 
@@ -40,6 +43,48 @@ class TestUtils(base_test.BaseServerTestCase):
         self.assertEqual(3, read_dict['test'])
         self.assertEqual(test_dict, read_dict)
 
+    def test_merge_patch(self):
+        target = {'a': 1, 'b': {'c': 2, 'd': 3}, 'e': {'f': 4}}
+        result = merge_patch(target, {'a': None, 'b': {'c': 5}, 'g': [6]})
+        self.assertEqual({'b': {'c': 5, 'd': 3}, 'e': {'f': 4}, 'g': [6]},
+                         result)
+        # the target isn't modified, and unpatched values are shared
+        self.assertEqual({'a': 1, 'b': {'c': 2, 'd': 3}, 'e': {'f': 4}},
+                         target)
+        self.assertIs(target['e'], result['e'])
+        self.assertEqual({'a': 1}, merge_patch(None, {'a': 1}))
+        self.assertEqual({'a': 1}, merge_patch({'a': [1, 2]}, {'a': 1}))
+
+    def test_response_fields_memoized(self):
+        self.assertIs(models.Deployment.response_fields,
+                      models.Deployment.response_fields)
+        self.assertIn('workflows', models.Deployment.response_fields)
+        self.assertNotIn('workflows', models.Blueprint.response_fields)
+        self.assertIn('permission', models.Blueprint.response_fields)
+        self.assertNotIn('permission', models.Blueprint.resource_fields)
+
+        blueprint = models.Blueprint(id='bp', main_file_name='bp.yaml')
+        blueprint_dict = blueprint.to_dict()
+        self.assertEqual(set(blueprint_dict),
+                         set(models.Blueprint.resource_fields))
+        self.assertEqual(blueprint_dict['id'], 'bp')
+
+    def test_streaming_list_response(self):
+        metadata = {'pagination': {'total': 5}}
+        items = (i for i in range(5))
+        response = make_streaming_list_response(
+            items, metadata, lambda item: {'id': item}, chunk_size=2)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(json.loads(response.get_data()), {
+            'items': [{'id': i} for i in range(5)],
+            'metadata': metadata
+        })
+
+        response = make_streaming_list_response(
+            iter([]), metadata, lambda item: item)
+        self.assertEqual(json.loads(response.get_data()),
+                         {'items': [], 'metadata': metadata})
+
     @attr(client_min_version=2,
           client_max_version=base_test.LATEST_API_VERSION)
     def test_plugin_installable_on_current_platform(self):
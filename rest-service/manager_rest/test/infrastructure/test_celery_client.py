@@ -0,0 +1,99 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from unittest import TestCase
+
+from mock import Mock, patch
+from nose.plugins.attrib import attr
+
+from manager_rest import celery_client, config, workflow_executor
+from manager_rest.test.base_test import LATEST_API_VERSION
+
+
+@attr(client_min_version=1, client_max_version=LATEST_API_VERSION)
+class CeleryClientTest(TestCase):
+
+    def setUp(self):
+        super(CeleryClientTest, self).setUp()
+        self.celery = Mock()
+        self._patch('manager_rest.celery_client.Celery',
+                    return_value=self.celery)
+        self._patch('manager_rest.celery_client.current_app')
+        self._patch_config(test_mode=False,
+                           amqp_ssl_enabled=False,
+                           amqp_ca_path=None,
+                           amqp_address='localhost',
+                           amqp_username='guest',
+                           amqp_password='guest',
+                           amqp_pool_limit=10)
+        # Start every test without a client
+        self._patch('manager_rest.celery_client._client', None)
+        self._patch('manager_rest.celery_client._client_pid', None)
+
+    def _patch(self, target, *args, **kwargs):
+        patcher = patch(target, *args, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def _patch_config(self, **values):
+        for name, value in values.items():
+            patcher = patch.object(config.instance, name, value, create=True)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+    def test_client_reused(self):
+        client = celery_client.get_client()
+        self.assertIs(client, celery_client.get_client())
+        self.assertEqual(1, celery_client.Celery.call_count)
+
+    def test_client_recreated_after_fork(self):
+        with patch('os.getpid', return_value=1):
+            client = celery_client.get_client()
+        with patch('os.getpid', return_value=2):
+            forked_client = celery_client.get_client()
+            self.assertIsNot(client, forked_client)
+            self.assertIs(forked_client, celery_client.get_client())
+        self.assertEqual(2, celery_client.Celery.call_count)
+
+    def test_client_not_closed_per_task(self):
+        self._patch('manager_rest.workflow_executor.current_user')
+        self._patch('manager_rest.workflow_executor.current_app')
+        for task_id in ['task1', 'task2']:
+            workflow_executor.execute_system_workflow(
+                wf_id='create_snapshot',
+                task_id=task_id,
+                task_mapping='cloudify_system_workflows.snapshot.create')
+        self.assertEqual(1, celery_client.Celery.call_count)
+        self.assertEqual(2, self.celery.send_task.call_count)
+        self.assertFalse(self.celery.close.called)
+
+    def test_publish_retry_policy(self):
+        celery_client.get_client().execute_task('queue', task_id='task')
+        _, kwargs = self.celery.send_task.call_args
+        self.assertTrue(kwargs['retry'])
+        self.assertEqual(celery_client.PUBLISH_RETRY_POLICY,
+                         kwargs['retry_policy'])
+
+    def test_publish_stats(self):
+        client = celery_client.get_client()
+        self.assertEqual(0, client.publish_time_avg)
+        with patch('manager_rest.celery_client.time.time',
+                   side_effect=[10, 11, 20, 23]):
+            client.execute_task('queue', task_id='task1')
+            client.execute_task('queue', task_id='task2')
+        self.assertEqual(2, client.publish_count)
+        self.assertEqual(4, client.publish_time_total)
+        self.assertEqual(3, client.publish_time_max)
+        self.assertEqual(2, client.publish_time_avg)
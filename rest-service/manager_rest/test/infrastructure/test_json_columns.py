@@ -0,0 +1,80 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+import json
+import zlib
+
+from nose.plugins.attrib import attr
+from sqlalchemy import type_coerce
+from sqlalchemy.dialects import postgresql
+
+from manager_rest.test import base_test
+from manager_rest.storage import db, models
+from manager_rest.storage.models_base import json_value, CompressedJSONType
+
+
+@attr(client_min_version=1, client_max_version=base_test.LATEST_API_VERSION)
+class JSONColumnsTest(base_test.BaseServerTestCase):
+
+    def test_compressed_plan(self):
+        self.put_deployment()
+        stored_plan = db.session.query(
+            type_coerce(models.Blueprint.plan, db.LargeBinary)).scalar()
+        plan = json.loads(zlib.decompress(stored_plan))
+        self.assertEqual(self.sm.get(models.Blueprint, 'blueprint').plan,
+                         plan)
+
+    def test_runtime_properties(self):
+        self.put_deployment()
+        instance = self.sm.list(models.NodeInstance).items[0]
+        instance.runtime_properties = {'cloudify_agent': {'queue': 'q'},
+                                       'ip': '10.0.0.1'}
+        self.sm.update(instance)
+        instance_id = instance.id
+        # Reload the runtime properties from the DB. The session is expired
+        # rather than emptied, as the current user has to stay attached to it
+        db.session.expire_all()
+        instance = self.sm.get(models.NodeInstance, instance_id)
+        self.assertEqual({'cloudify_agent': {'queue': 'q'},
+                          'ip': '10.0.0.1'}, instance.runtime_properties)
+
+    def test_json_value(self):
+        column = models.NodeInstance.runtime_properties
+        query = json_value(column, 'cloudify_agent').compile(
+            dialect=postgresql.dialect())
+        self.assertIn('node_instances.runtime_properties -> ', str(query))
+        query = json_value(column, 'cloudify_agent', 'queue').compile(
+            dialect=postgresql.dialect())
+        self.assertIn('node_instances.runtime_properties #> ', str(query))
+
+    def test_serialization_round_trip(self):
+        """The payloads stored for the test blueprint, which used to be
+        pickled, are unchanged by the JSON columns
+        """
+        self.put_deployment()
+        deployment = self.sm.list(models.Deployment).items[0]
+        node = self.sm.list(models.Node).items[0]
+        payloads = [
+            self.sm.get(models.Blueprint, 'blueprint').plan,
+            deployment.workflows,
+            node.properties,
+            node.operations,
+        ]
+        compressed = CompressedJSONType()
+        for payload in payloads:
+            self.assertEqual(payload, json.loads(json.dumps(payload)))
+            serialized = compressed.process_bind_param(payload, None)
+            self.assertEqual(
+                payload, compressed.process_result_value(serialized, None))
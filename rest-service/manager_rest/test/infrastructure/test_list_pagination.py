@@ -13,8 +13,13 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 #
+from datetime import datetime
+
+from mock import patch
 from nose.plugins.attrib import attr
 
+from manager_rest import config
+from manager_rest.storage import models
 from manager_rest.test import base_test
 from manager_rest.test.infrastructure.base_list_test import BaseListTest
 
@@ -73,3 +78,99 @@ class ResourceListTestCase(BaseListTest):
     def test_snapshots_list_paginated(self):
         self._put_n_snapshots(3)
         self._test_pagination(self.client.snapshots.list, 3)
+
+    def _test_cursor_pagination(self, resource_path, size, sort='id'):
+        all_ids = [item['id'] for item in self.get(
+            resource_path, query_params={'_sort': sort}).json['items']]
+
+        cursor_ids = []
+        params = {'_sort': sort, '_size': size, '_cursor': '', '_count': False}
+        # Bounded, so that repeated items fail the test instead of looping
+        for _ in range(len(all_ids) + 1):
+            response = self.get(resource_path, query_params=params).json
+            pagination = response['metadata']['pagination']
+            self.assertIsNone(pagination['total'])
+            self.assertLessEqual(len(response['items']), size)
+            cursor_ids.extend(item['id'] for item in response['items'])
+            if not pagination['cursor']:
+                break
+            params['_cursor'] = pagination['cursor']
+        self.assertEqual(all_ids, cursor_ids)
+
+    def test_deployments_list_cursor(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=5)
+        self._test_cursor_pagination('/deployments', 2)
+
+    def test_node_instances_list_cursor(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=3)
+        self._test_cursor_pagination('/node-instances', 4)
+
+    def test_executions_list_cursor_by_timestamp(self):
+        # Timestamps are returned with a millisecond precision, but are
+        # stored (and sorted) with a microsecond one
+        deployment = self._add_deployment(self._add_blueprint())
+        for microsecond in range(1, 6):
+            execution = self._add_execution(deployment)
+            execution.created_at = datetime(2017, 1, 1, 0, 0, 0, microsecond)
+            self.sm.update(execution)
+        self._test_cursor_pagination('/executions', 2,
+                                     sort=['created_at', 'id'])
+        self._test_cursor_pagination('/executions', 2,
+                                     sort=['-created_at', 'id'])
+
+    def test_deployments_list_cursor_by_nullable_column(self):
+        # Rows with a NULL sort key are still returned, where the DB sorts
+        # them
+        self._put_n_deployments(id_prefix='test', number_of_deployments=5)
+        for index, deployment in enumerate(self.sm.list(models.Deployment)):
+            deployment.description = None if index % 2 else 'description'
+            self.sm.update(deployment)
+        self._test_cursor_pagination('/deployments', 2,
+                                     sort=['description', 'id'])
+        self._test_cursor_pagination('/deployments', 2,
+                                     sort=['-description', 'id'])
+
+    def test_cursor_default_size(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=3)
+        for params in ({'_cursor': ''}, {'_count': False}):
+            response = self.get('/deployments', query_params=params).json
+            self.assertEqual(3, len(response['items']))
+            self.assertEqual(self.server_configuration.default_page_size,
+                             response['metadata']['pagination']['size'])
+
+    def test_streamed_list(self):
+        # 6 node instances, fetched from the DB in batches of 2
+        self._put_n_deployments(id_prefix='test', number_of_deployments=3)
+        all_ids = sorted(i.id for i in self.sm.list(models.NodeInstance))
+        with patch.object(config.instance, 'list_stream_batch_size', 2):
+            response = self.get('/node-instances', query_params={
+                '_sort': 'id', '_size': 5, '_offset': 1})
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(all_ids[1:6],
+                             [item['id'] for item in response.json['items']])
+            self.assertEqual({'total': 6, 'size': 5, 'offset': 1},
+                             response.json['metadata']['pagination'])
+
+            # The cursor is only set once all the items were streamed
+            response = self.get('/node-instances', query_params={
+                '_sort': 'id', '_size': 5, '_cursor': ''})
+            pagination = response.json['metadata']['pagination']
+            self.assertEqual(all_ids[:5],
+                             [item['id'] for item in response.json['items']])
+            self.assertEqual(6, pagination['total'])
+            self.assertTrue(pagination['cursor'])
+            response = self.get('/node-instances', query_params={
+                '_sort': 'id', '_size': 5, '_cursor': pagination['cursor']})
+            pagination = response.json['metadata']['pagination']
+            self.assertEqual(all_ids[5:],
+                             [item['id'] for item in response.json['items']])
+            self.assertIsNone(pagination['cursor'])
+
+    def test_cursor_sort_mismatch(self):
+        self._put_n_deployments(id_prefix='test', number_of_deployments=3)
+        response = self.get('/deployments', query_params={
+            '_sort': 'id', '_size': 1, '_cursor': ''}).json
+        cursor = response['metadata']['pagination']['cursor']
+        response = self.get('/deployments', query_params={
+            '_sort': '-id', '_size': 1, '_cursor': cursor})
+        self.assertEqual(400, response.status_code)
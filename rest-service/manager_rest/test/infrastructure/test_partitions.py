@@ -0,0 +1,138 @@
+#########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#  * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  * See the License for the specific language governing permissions and
+#  * limitations under the License.
+
+from datetime import datetime
+from unittest import TestCase
+
+from mock import patch
+from nose.plugins.attrib import attr
+from sqlalchemy import text
+
+from manager_rest.storage import db, models, partitions
+from manager_rest.storage.event_counts import create_count_triggers
+from manager_rest.test.base_test import BaseServerTestCase, LATEST_API_VERSION
+
+
+@attr(client_min_version=1, client_max_version=LATEST_API_VERSION)
+class PartitionNamesTest(TestCase):
+
+    def test_partition_name(self):
+        self.assertEqual(
+            'events_y2017m03',
+            partitions.get_partition_name('events', datetime(2017, 3, 15)))
+
+    def test_month_range(self):
+        self.assertEqual(
+            (datetime(2017, 12, 1), datetime(2018, 1, 1)),
+            partitions.get_month_range(datetime(2017, 12, 31, 23, 59)))
+
+    def test_parse_partition_name(self):
+        self.assertEqual(
+            (datetime(2017, 3, 1), datetime(2017, 4, 1)),
+            partitions.parse_partition_name('logs', 'logs_y2017m03'))
+        self.assertIsNone(
+            partitions.parse_partition_name('logs', 'events_y2017m03'))
+        self.assertIsNone(
+            partitions.parse_partition_name('logs', 'logs_archive'))
+
+
+@attr(client_min_version=2, client_max_version=LATEST_API_VERSION)
+class PartitionsTest(BaseServerTestCase):
+
+    """Remove partitions, using the code paths that also run under SQLite.
+
+    SQLite has no table inheritance, so the partition is created by hand
+    (with the same counter triggers `create_partition` adds), and the rows
+    moved to it aren't returned by queries against the parent table.
+    """
+
+    partition = 'events_y2017m01'
+
+    def setUp(self):
+        super(PartitionsTest, self).setUp()
+        deployment = self._add_deployment(self._add_blueprint())
+        self.execution = self._add_execution(deployment)
+        for model, timestamp in [(models.Event, datetime(2017, 1, 1)),
+                                 (models.Event, datetime(2017, 1, 2)),
+                                 (models.Event, datetime(2017, 3, 1)),
+                                 (models.Log, datetime(2017, 3, 2))]:
+            self._add_event(model, timestamp)
+
+    def _add_event(self, model, timestamp):
+        # Events aren't connected to a tenant directly, so they're added to
+        # the session rather than with sm.put
+        event = model(timestamp=timestamp, message='message')
+        event.execution = self.execution
+        db.session.add(event)
+        db.session.commit()
+
+    def _create_partition(self):
+        connection = db.session.connection()
+        connection.execute('CREATE TABLE {0} AS SELECT * FROM events '
+                           'WHERE 0'.format(self.partition))
+        create_count_triggers(connection, self.partition, 'events')
+        start, end = partitions.get_month_range(datetime(2017, 1, 1))
+        params = {'start': start, 'end': end}
+        condition = 'WHERE "timestamp" >= :start AND "timestamp" < :end'
+        connection.execute(text('INSERT INTO {0} SELECT * FROM events {1}'
+                                .format(self.partition, condition)), params)
+        connection.execute(text('DELETE FROM events {0}'.format(condition)),
+                           params)
+        db.session.commit()
+
+    def _get_events(self):
+        response = self.get('/events', query_params={
+            'execution_id': self.execution.id,
+            'type': ['cloudify_event', 'cloudify_log'],
+        })
+        return (response.json['items'],
+                response.json['metadata']['pagination']['total'])
+
+    def _get_counts(self):
+        counts = models.EventCounts.query.all()
+        self.assertEqual(1, len(counts))
+        return counts[0].events, counts[0].logs
+
+    def test_create_partition(self):
+        """Moving rows to a partition keeps the counters unchanged."""
+        self._create_partition()
+        self.assertEqual((3, 1), self._get_counts())
+        partition_rows = db.session.execute(
+            'SELECT count(*) FROM {0}'.format(self.partition)).scalar()
+        self.assertEqual(2, partition_rows)
+
+    def test_drop_partition(self):
+        """Dropped rows are subtracted from the counters."""
+        self._create_partition()
+        with patch.object(partitions, 'get_partitions',
+                          return_value=[self.partition, 'events_archive']):
+            removed = partitions.remove_expired_partitions(
+                'events', retention_days=30)
+        self.assertEqual([self.partition], removed)
+        self.assertIsNone(db.session.execute(
+            text('SELECT name FROM sqlite_master WHERE name = :name'),
+            {'name': self.partition}).scalar())
+
+        self.assertEqual((1, 1), self._get_counts())
+        items, total = self._get_events()
+        self.assertEqual(2, total)
+        self.assertEqual(['2017-03-01T00:00:00.000Z',
+                          '2017-03-02T00:00:00.000Z'],
+                         sorted(item['timestamp'] for item in items))
+
+        # New events are still counted
+        self._add_event(models.Event, datetime(2017, 3, 3))
+        self.assertEqual((2, 1), self._get_counts())
+        self.assertEqual(3, self._get_events()[1])
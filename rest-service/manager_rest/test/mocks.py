@@ -19,7 +19,7 @@ import urllib
 
 from cloudify_rest_client.client import HTTPClient
 from cloudify_rest_client.executions import Execution
-from manager_rest.storage import get_storage_manager, models
+from manager_rest.resource_manager import get_resource_manager
 
 try:
     from cloudify_rest_client.client import \
@@ -154,11 +154,12 @@ def task_state():
 class MockCeleryClient(object):
 
     def execute_task(self, task_queue, task_id=None, kwargs=None):
-        sm = get_storage_manager()
-        execution = sm.get(models.Execution, task_id)
-        execution.status = task_state()
-        execution.error = ''
-        sm.update(execution)
+        # Update the status the way the workflow would, so that the steps
+        # following system workflows run right away
+        resource_manager = get_resource_manager()
+        execution = resource_manager.update_execution_status(
+            task_id, task_state(), '')
+        resource_manager.handle_execution_end(execution)
         return MockAsyncResult(task_id)
 
     def get_task_status(self, task_id):
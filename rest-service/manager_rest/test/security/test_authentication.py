@@ -16,7 +16,10 @@
 from nose.plugins.attrib import attr
 from base64 import urlsafe_b64encode
 
+from manager_rest.storage.models import User
 from manager_rest.test.base_test import LATEST_API_VERSION
+from manager_rest.security.token_cache import token_cache
+from manager_rest.security.login_tracker import login_tracker
 from manager_rest.utils import BASIC_AUTH_PREFIX, CLOUDIFY_AUTH_HEADER
 from manager_rest.constants import (ADMIN_ROLE,
                                     USER_ROLE,
@@ -68,6 +71,22 @@ class AuthenticationTests(SecurityTestBase):
             token = self.client.tokens.get()
         self._assert_user_authorized(token=token.value)
 
+    def test_token_cache(self):
+        token_cache.clear()
+        with self.use_secured_client(username='alice',
+                                     password='alice_password'):
+            token = self.client.tokens.get()
+        self._assert_user_authorized(token=token.value)
+        self.assertEqual(len(token_cache), 1)
+
+        hits = token_cache.hits
+        self._assert_user_authorized(token=token.value)
+        self.assertGreater(token_cache.hits, hits)
+
+        token_cache.clear()
+        self.assertEqual(len(token_cache), 0)
+        self._assert_user_authorized(token=token.value)
+
     def test_invalid_token_authentication(self):
         self._assert_user_unauthorized(token='wrong token')
 
@@ -108,3 +127,22 @@ class AuthenticationTests(SecurityTestBase):
             self.client._client.headers.pop(CLOUDIFY_TENANT_HEADER, None)
             token = self.client.tokens.get()
         self._assert_user_authorized(token=token.value)
+
+    def test_last_login_deferred(self):
+        login_tracker._last_recorded.clear()
+        login_tracker._pending.clear()
+        self._assert_user_authorized(username='alice',
+                                     password='alice_password')
+        alice = User.query.filter_by(username='alice').first()
+        self.assertIsNone(alice.last_login_at)
+        self.assertEqual(login_tracker.pending_flushes, 1)
+
+        # A second login within the granularity window isn't recorded
+        self._assert_user_authorized(username='alice',
+                                     password='alice_password')
+        self.assertEqual(login_tracker.pending_flushes, 1)
+
+        login_tracker.flush()
+        self.assertEqual(login_tracker.pending_flushes, 0)
+        self.sm.refresh(alice)
+        self.assertIsNotNone(alice.last_login_at)
@@ -16,6 +16,8 @@
 import unittest
 
 from os import path
+from mock import Mock, patch
+from flask import current_app
 from nose.plugins.attrib import attr
 
 from cloudify_rest_client.exceptions import UserUnauthorizedError
@@ -23,6 +25,8 @@ from cloudify_rest_client.exceptions import UserUnauthorizedError
 from manager_rest.storage import models
 from manager_rest.test.base_test import LATEST_API_VERSION
 from manager_rest.storage.models_states import ExecutionState
+from manager_rest.security.tenant_authorization import \
+    AUTHORIZATION_GENERATION
 
 from .test_base import SecurityTestBase
 
@@ -115,6 +119,40 @@ class AuthorizationTests(SecurityTestBase):
         self._test_blueprint_delete_with_token(admin_token_client,
                                                default_token_client)
 
+    def test_authorization_generation(self):
+        self.default_client.blueprints.list()
+
+        bob = models.User.query.filter_by(username='bob').first()
+        bob.tenants = []
+        self.sm.update(bob)
+
+        # The cached tenant association is used until the generation changes
+        self.default_client.blueprints.list()
+        models.Generation.bump(AUTHORIZATION_GENERATION)
+        self.assertRaises(UserUnauthorizedError,
+                          self.default_client.blueprints.list)
+
+    def test_ldap_update_invalidates_authorization(self):
+        def remove_tenants(user):
+            user.tenants = []
+            return user
+
+        ldap = Mock()
+        generation = models.Generation.get_value(AUTHORIZATION_GENERATION)
+        with patch.object(current_app._get_current_object(), 'ldap', ldap):
+            # Logging in without changes keeps the cached authorization
+            ldap.update_user.side_effect = lambda user: user
+            self._assert_user_authorized(username='bob',
+                                         password='bob_password')
+            self.assertEqual(generation, models.Generation.get_value(
+                AUTHORIZATION_GENERATION))
+
+            ldap.update_user.side_effect = remove_tenants
+            self._assert_user_unauthorized(username='bob',
+                                           password='bob_password')
+            self.assertGreater(models.Generation.get_value(
+                AUTHORIZATION_GENERATION), generation)
+
     @attr(client_min_version=2.1,
           client_max_version=LATEST_API_VERSION)
     # todo: mt: handle authorization
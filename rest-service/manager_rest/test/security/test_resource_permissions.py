@@ -19,7 +19,9 @@ from nose.plugins.attrib import attr
 
 from manager_rest.storage import models, user_datastore
 from manager_rest.test.base_test import LATEST_API_VERSION
-from manager_rest.constants import OWNER_PERMISSION, VIEWER_PERMISSION
+from manager_rest.constants import (OWNER_PERMISSION,
+                                    VIEWER_PERMISSION,
+                                    CREATOR_PERMISSION)
 
 from cloudify_rest_client.exceptions import CloudifyClientError
 
@@ -131,6 +133,28 @@ class ResourcePermissionTests(SecurityTestBase):
             client.deployments.remove_permission
         )
 
+    def test_list_permission(self):
+        blueprint_id = self._upload_blueprint()
+        with self.use_secured_client(username='bob',
+                                     password='bob_password'):
+            blueprints = self.client.blueprints.list()
+            self.assertEqual(blueprints[0]['permission'], CREATOR_PERMISSION)
+            self.client.blueprints.add_permission(
+                blueprint_id, ['dave'], VIEWER_PERMISSION)
+
+        with self.use_secured_client(username='dave',
+                                     password='dave_password'):
+            blueprints = self.client.blueprints.list()
+            self.assertEqual(blueprints[0]['permission'], VIEWER_PERMISSION)
+            blueprints = self.client.blueprints.list(
+                _include=['id', 'permission'])
+            self.assertEqual(blueprints[0]['permission'], VIEWER_PERMISSION)
+
+        with self.use_secured_client(username='alice',
+                                     password='alice_password'):
+            blueprints = self.client.blueprints.list()
+            self.assertEqual(blueprints[0]['permission'], '')
+
     def test_private_blueprint(self):
         blueprint_id = self._upload_blueprint(private=True)
 
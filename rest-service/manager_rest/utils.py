@@ -96,6 +96,25 @@ def write_dict_to_json_file(file_path, dictionary):
         json.dump(dictionary, f)
 
 
+def merge_patch(target, patch):
+    """Apply a JSON merge patch (RFC 7396) to `target`, and return the result
+
+    Keys set to None in `patch` are removed, dicts are merged recursively,
+    and any other value replaces the existing one. `target` isn't modified:
+    only the dicts along the patched paths are copied, and the rest are
+    shared with the result.
+    """
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.iteritems():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
 def is_bypass_maintenance_mode(request):
     bypass_maintenance_header = 'X-BYPASS-MAINTENANCE'
     return request.headers.get(bypass_maintenance_header)
@@ -152,6 +171,22 @@ class classproperty(object):
         return self.get_func(owner_cls)
 
 
+class memoized_classproperty(classproperty):
+    """A classproperty whose value is computed only once per class. The
+    returned value is shared, so it must not be modified by the caller
+    """
+    def __init__(self, get_func):
+        super(memoized_classproperty, self).__init__(get_func)
+        self._values = {}
+
+    def __get__(self, _, owner_cls):
+        try:
+            return self._values[owner_cls]
+        except KeyError:
+            value = self._values[owner_cls] = self.get_func(owner_cls)
+            return value
+
+
 def create_auth_header(username=None, password=None, token=None, tenant=None):
     """Create a valid authentication header either from username/password or
     a token if any were provided; return an empty dict otherwise
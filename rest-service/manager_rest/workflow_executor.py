@@ -28,7 +28,9 @@ def execute_workflow(name,
                      deployment_id,
                      execution_id,
                      execution_parameters=None,
-                     bypass_maintenance=None):
+                     bypass_maintenance=None,
+                     user=None,
+                     tenant=None):
     execution_parameters = execution_parameters or {}
     task_name = workflow['operation']
     task_queue = 'cloudify.management'
@@ -55,7 +57,9 @@ def execute_workflow(name,
     return _execute_task(task_queue=task_queue,
                          execution_id=execution_id,
                          execution_parameters=execution_parameters,
-                         context=context)
+                         context=context,
+                         user=user,
+                         tenant=tenant)
 
 
 def execute_system_workflow(wf_id,
@@ -88,14 +92,16 @@ def execute_system_workflow(wf_id,
                          context=context)
 
 
-def _execute_task(task_queue, execution_id, execution_parameters, context):
-    context['rest_token'] = current_user.get_auth_token()
-    context['tenant_name'] = current_app.config[CURRENT_TENANT_CONFIG].name
+def _execute_task(task_queue, execution_id, execution_parameters, context,
+                  user=None, tenant=None):
+    # Workflows run as the current user and tenant, unless they're started
+    # on behalf of others (e.g. queued executions)
+    user = user or current_user
+    tenant = tenant or current_app.config[CURRENT_TENANT_CONFIG]
+    context['rest_token'] = user.get_auth_token()
+    context['tenant_name'] = tenant.name
     execution_parameters['__cloudify_context'] = context
     celery = celery_client.get_client()
-    try:
-        return celery.execute_task(task_queue=task_queue,
-                                   task_id=execution_id,
-                                   kwargs=execution_parameters)
-    finally:
-        celery.close()
+    return celery.execute_task(task_queue=task_queue,
+                               task_id=execution_id,
+                               kwargs=execution_parameters)
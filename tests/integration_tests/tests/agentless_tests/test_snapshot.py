@@ -22,6 +22,7 @@ from collections import Counter
 
 from integration_tests.framework import utils
 from integration_tests import AgentlessTestCase
+from integration_tests.tests.utils import get_resource as resource
 
 from manager_rest.storage.models_states import ExecutionState
 from manager_rest.constants import ADMIN_ROLE, DEFAULT_TENANT_NAME
@@ -174,6 +175,42 @@ class TestSnapshot(AgentlessTestCase):
         self._assert_3_4_0_snapshot_restored(tenant_1_name)
         self._assert_3_3_1_snapshot_restored(tenant_2_name)
 
+    def test_snapshot_restores_event_totals(self):
+        deployment, _ = self.deploy_application(
+            resource('dsl/basic_event_and_log.yaml'))
+        totals = self._get_event_totals(deployment.id)
+
+        snapshot_id = 'events_snapshot'
+        execution = self.client.snapshots.create(snapshot_id=snapshot_id,
+                                                 include_metrics=False,
+                                                 include_credentials=False)
+        self.wait_for_execution_to_end(execution)
+        execution = self.client.snapshots.restore(
+            snapshot_id,
+            recreate_deployments_envs=False,
+            force=True
+        )
+        execution = self._wait_for_execution_to_end(execution)
+        self.assertEqual(Execution.TERMINATED, execution.status)
+
+        # The event counters are rebuilt from the restored events and logs
+        self.assertEqual(totals, self._get_event_totals(deployment.id))
+
+    def _get_event_totals(self, deployment_id):
+        """Return the number of events, and of events and logs, of each
+        execution of the deployment
+        """
+        totals = {}
+        for execution in self.client.executions.list(
+                deployment_id=deployment_id):
+            totals[execution.id] = tuple(
+                self.client.events.list(
+                    execution_id=execution.id,
+                    include_logs=include_logs
+                ).metadata.pagination.total
+                for include_logs in (False, True))
+        return totals
+
     def _assert_snapshot_restored(self,
                                   blueprint_id,
                                   deployment_id,
@@ -169,8 +169,12 @@ class Credentials(object):
         """
         query = self._get_node_properties_query(dep_node_id)
         result = postgres.run_query(query)
-        pickled_buffer = result['all'][0][0]
-        return pickle.loads(pickled_buffer)
+        properties = result['all'][0][0]
+        # JSONB values are decoded by psycopg2, but properties are still
+        # pickled in DBs that weren't migrated to JSON
+        if isinstance(properties, dict):
+            return properties
+        return pickle.loads(properties)
 
     @staticmethod
     def _get_node_properties_query(dep_node_id):
@@ -33,6 +33,13 @@ class Postgres(object):
     _POSTGRES_DUMP_FILENAME = 'pg_data'
     _TABLES_TO_KEEP = ['provider_context', 'roles']
     _TABLES_TO_RESTORE = ['users', 'tenants']
+    # Generations guarding data the REST service caches per worker (see
+    # manager_rest.storage.management_models.Generation)
+    _GENERATIONS = ['authorization']
+    # Tables partitioned by month (see manager_rest.storage.partitions). They
+    # are dumped through their parent tables, so that the restored rows are
+    # routed to the partitions that exist on the restoring manager
+    _PARTITIONED_TABLES = ['events', 'logs']
 
     def __init__(self, config):
         ctx.logger.debug('Init Postgres config: {0}'.format(config))
@@ -43,32 +50,83 @@ class Postgres(object):
         self._password = config.postgresql_password
         self._connection = None
 
-    def restore(self, tempdir):
+    def restore(self, tempdir, pickled_columns=False):
+        """Restore the DB from the postgres dump in `tempdir`
+
+        :param pickled_columns: Whether the dump holds the pickled values of
+        the columns that are now stored as JSONB. If so, those columns are
+        restored as bytea, and `migrate_json_columns` should be called once
+        the restore is done
+        """
         ctx.logger.info('Restoring DB from postgres dump')
         dump_file = os.path.join(tempdir, self._POSTGRES_DUMP_FILENAME)
 
         # Add to the beginning of the dump queries that recreate the schema
         clear_tables_queries = self._get_clear_tables_queries()
+        if pickled_columns:
+            clear_tables_queries.extend(self._get_pickled_columns_queries())
         dump_file = self._prepend_dump(dump_file, clear_tables_queries)
 
         # Add admin user, provider context and the current execution
         restore_admin_query = self._get_admin_user_update_query()
         self._append_dump(dump_file, restore_admin_query)
         self._append_dump(dump_file, self._get_execution_restore_query())
+        for query in self._get_generations_bump_queries():
+            self._append_dump(dump_file, query)
 
         self._restore_dump(dump_file)
         ctx.logger.debug('Postgres restored')
 
+    def has_json_columns(self):
+        """Whether the DB stores the formerly pickled columns as JSONB
+        """
+        return bool(self._get_json_columns())
+
+    @staticmethod
+    def migrate_json_columns():
+        """Convert the pickled columns restored from an older dump to JSON
+        (see manager_rest.storage.json_migration)
+        """
+        ctx.logger.info('Converting pickled DB columns to JSON')
+        python_bin = '/opt/manager/env/bin/python'
+        command = [python_bin, '-m', 'manager_rest.storage.json_migration']
+        result = run_shell(command)
+        if result and hasattr(result, 'aggr_stdout'):
+            ctx.logger.debug('Process result: \n{0}'
+                             .format(result.aggr_stdout))
+
     def dump(self, tempdir):
         destination_path = os.path.join(tempdir, self._POSTGRES_DUMP_FILENAME)
-        exclude_tables = ['snapshots', 'provider_context', 'roles']
+        # The event counters are left out, as the triggers on the events and
+        # logs tables rebuild them when the rows are restored
+        exclude_tables = ['snapshots', 'provider_context', 'roles',
+                          'event_counts']
+        for table in self._PARTITIONED_TABLES:
+            exclude_tables.extend([table, '{0}_y*'.format(table)])
         try:
             self._dump_to_file(destination_path, exclude_tables)
+            for table in self._PARTITIONED_TABLES:
+                self._dump_partitioned_table(destination_path, table)
         except Exception as ex:
             raise NonRecoverableError('Error during dumping Postgres data, '
                                       'exception: {0}'.format(ex))
         self._append_delete_current_execution(destination_path)
 
+    def _dump_partitioned_table(self, dump_file, table):
+        """Append to the dump file the rows of `table` and of its partitions,
+        as a COPY into the parent table
+        """
+        ctx.logger.debug('Dumping {0} through the parent table'.format(table))
+        columns = ', '.join('"{0}"'.format(column)
+                            for column in self._get_columns(table))
+        with open(dump_file, 'a') as f:
+            f.write('\nCOPY public.{0} ({1}) FROM stdin;\n'
+                    .format(table, columns))
+            with closing(self._connection.cursor()) as cur:
+                cur.copy_expert('COPY (SELECT {1} FROM public.{0}) TO STDOUT'
+                                .format(table, columns), f)
+            f.write('\\.\n')
+
     def _append_delete_current_execution(self, dump_file):
         """Append to the dump file a query that deletes the current execution
         """
@@ -98,13 +156,30 @@ class Postgres(object):
                "'started', 'restore_snapshot', 0, 0);"\
             .format(ctx.execution_id, record_creation_date)
 
+    def _get_generations_bump_queries(self):
+        """Return queries that set every generation past its current value,
+        so that the REST service workers drop the data (e.g. tenants and
+        tokens) they cached before the restore
+        """
+        response = self.run_query("SELECT id, value FROM generations;")
+        generations = dict.fromkeys(self._GENERATIONS, 0)
+        generations.update(response['all'] or [])
+        return ["INSERT INTO generations (id, value) "
+                "VALUES ('{0}', {1}) "
+                "ON CONFLICT (id) DO UPDATE "
+                "SET value = generations.value + {1};"
+                .format(generation_id, value + 1)
+                for generation_id, value in generations.items()]
+
     def clean_db(self):
         """Run a series of queries that recreate the schema and restore the
         admin user, the provider context and the current execution
         """
+        generations_queries = self._get_generations_bump_queries()
         queries = self._get_clear_tables_queries(preserve_defaults=True)
         queries.append(self._get_admin_user_update_query())
         queries.append(self._get_execution_restore_query())
+        queries.extend(generations_queries)
         # Make the admin user actually has the admin role
         queries.append("INSERT INTO users_roles (user_id, role_id)"
                        "VALUES (0, 1);")
@@ -248,6 +323,29 @@ class Postgres(object):
         queries.remove(self._TRUNCATE_QUERY.format('tenants'))
         queries.append('DELETE FROM tenants CASCADE WHERE id != 0;')
 
+    def _get_pickled_columns_queries(self):
+        """Return queries that turn the JSONB columns of the (truncated)
+        tables back into bytea, so that they can hold pickled values
+        """
+        return ["ALTER TABLE {0} ALTER COLUMN {1} TYPE bytea USING NULL;"
+                .format(table, column)
+                for table, column in self._get_json_columns()]
+
+    def _get_json_columns(self):
+        result = self.run_query("SELECT table_name, column_name "
+                                "FROM information_schema.columns "
+                                "WHERE table_schema = 'public' "
+                                "AND data_type = 'jsonb';")
+        return result['all'] or []
+
+    def _get_columns(self, table):
+        result = self.run_query("SELECT column_name "
+                                "FROM information_schema.columns "
+                                "WHERE table_schema = 'public' "
+                                "AND table_name = '{0}' "
+                                "ORDER BY ordinal_position;".format(table))
+        return [res[0] for res in result['all']]
+
     def _get_all_tables(self):
         result = self.run_query("SELECT tablename "
                                 "FROM pg_tables "
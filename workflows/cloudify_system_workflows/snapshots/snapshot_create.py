@@ -50,7 +50,7 @@ class SnapshotCreate(object):
             manager_version = utils.get_manager_version(self._client)
 
             self._dump_files()
-            self._dump_postgres()
+            self._dump_postgres(metadata)
             self._dump_influxdb()
             self._dump_credentials()
             self._dump_metadata(metadata, manager_version)
@@ -81,10 +81,12 @@ class SnapshotCreate(object):
             to_archive=True
         )
 
-    def _dump_postgres(self):
+    def _dump_postgres(self, metadata):
         ctx.logger.info('Dumping Postgres data')
         with Postgres(self._config) as postgres:
             postgres.dump(self._tempdir)
+            metadata[constants.M_HAS_JSON_COLUMNS] = \
+                postgres.has_json_columns()
 
     def _dump_influxdb(self):
         ctx.logger.info('Dumping InfluxDB data')
@@ -40,7 +40,7 @@ from .influxdb import InfluxDB
 from .postgres import Postgres
 from .credentials import Credentials
 from .es_snapshot import ElasticSearch
-from .constants import METADATA_FILENAME, M_VERSION
+from .constants import METADATA_FILENAME, M_VERSION, M_HAS_JSON_COLUMNS
 
 
 V_4_0_0 = ManagerVersion('4.0.0')
@@ -83,7 +83,7 @@ class SnapshotRestore(object):
             es = utils.get_es_client(self._config)
 
             with Postgres(self._config) as postgres:
-                self._restore_db(postgres)
+                self._restore_db(postgres, metadata)
                 self._restore_files_to_manager()
                 self._restore_events(es, metadata)
                 self._restore_plugins(existing_plugins)
@@ -119,10 +119,15 @@ class SnapshotRestore(object):
             new_tenant=new_tenant
         )
 
-    def _restore_db(self, postgres):
+    def _restore_db(self, postgres, metadata):
         ctx.logger.info('Restoring database')
         if self._snapshot_version >= V_4_0_0:
-            postgres.restore(self._tempdir)
+            # Snapshots of DBs that still had pickled columns are converted
+            # to JSON after they're restored
+            pickled_columns = not metadata.get(M_HAS_JSON_COLUMNS, False)
+            postgres.restore(self._tempdir, pickled_columns=pickled_columns)
+            if pickled_columns:
+                postgres.migrate_json_columns()
         else:
             if self._should_clean_old_db_for_3_x_snapshot():
                 postgres.clean_db()
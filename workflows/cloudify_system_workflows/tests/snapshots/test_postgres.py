@@ -0,0 +1,74 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import mock
+
+from cloudify_system_workflows.snapshots.postgres import Postgres
+
+
+class PostgresDumpTest(TestCase):
+    """Dumping the partitioned events and logs tables."""
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='postgres_dump_test_')
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        for target in ['ctx', 'run_shell']:
+            patcher = mock.patch(
+                'cloudify_system_workflows.snapshots.postgres.{0}'
+                .format(target))
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+
+        self.postgres = Postgres(mock.Mock(postgresql_bin_path='/usr/bin'))
+        self.postgres._connection = mock.Mock()
+        cursor = self.postgres._connection.cursor.return_value
+        cursor.copy_expert.side_effect = self._copy_expert
+        self.copied = []
+        self.postgres._get_columns = mock.Mock(
+            return_value=['_storage_id', 'message'])
+
+    def _copy_expert(self, query, f):
+        self.copied.append(query)
+        f.write('1\trow of {0}\n'.format(len(self.copied)))
+
+    def _dump(self):
+        self.postgres.dump(self.tempdir)
+        with open(os.path.join(self.tempdir, 'pg_data')) as f:
+            return f.read()
+
+    def test_partitions_excluded_from_pg_dump(self):
+        self._dump()
+        command = self.run_shell.call_args_list[0][0][0]
+        for table in ['events', 'events_y*', 'logs', 'logs_y*',
+                      'event_counts']:
+            self.assertIn('--exclude-table={0}'.format(table), command)
+
+    def test_dumped_through_parent_tables(self):
+        dump = self._dump()
+        self.assertEqual(
+            ['COPY (SELECT "_storage_id", "message" FROM public.events) '
+             'TO STDOUT',
+             'COPY (SELECT "_storage_id", "message" FROM public.logs) '
+             'TO STDOUT'],
+            self.copied)
+        self.assertIn('COPY public.events ("_storage_id", "message") '
+                      'FROM stdin;\n1\trow of 1\n\\.\n', dump)
+        self.assertIn('COPY public.logs ("_storage_id", "message") '
+                      'FROM stdin;\n1\trow of 2\n\\.\n', dump)